@@ -4,28 +4,60 @@ from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from flask_restx import Api
 from flask_migrate import Migrate
-from .config import Config
+from .config import get_config
+from .utils.cache import EntityCache
+from .utils.singleflight import SingleFlight
+from .utils.change_tracking import ChangeTracker, product_scopes
+from .utils.search import SearchIndex
+from .utils.autocomplete import Autocomplete
+from .utils.leaderboard import Leaderboard
+from .middlewares.metrics import Metrics
+from .middlewares.slow_queries import SlowQueryLog
+from .middlewares.profiler import Profiler
+from .utils.replicas import ReplicaRouter, RoutingSession
+from .utils.sharding import ShardRouter, ShopMovingError
 
 # Inicializamos las extensiones globalmente para luego asociarlas a la app en la función create_app
-db = SQLAlchemy()  # Para la interacción con la base de datos usando SQLAlchemy
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # Para la interacción con la base de datos usando SQLAlchemy (lecturas a réplicas)
 migrate = Migrate()  # Para gestionar las migraciones de la base de datos
 bcrypt = Bcrypt()  # Para el hash y verificación de contraseñas de los usuarios
 jwt = JWTManager()  # Para la gestión de tokens JWT en la autenticación
+singleflight = SingleFlight()  # Agrupa las lecturas idénticas concurrentes en una sola consulta
+cache = EntityCache()  # Caché de lectura de entidades por ID, invalidada en cada escritura
+change_tracker = ChangeTracker()  # Contadores de cambios por tabla y por tienda para los ETag de los listados
+search_index = SearchIndex()  # Índice invertido de términos para la búsqueda de productos
+autocomplete = Autocomplete()  # Índice en memoria de nombres de productos y tiendas para el autocompletado
+leaderboard = Leaderboard()  # Ranking en memoria de los productos más vendidos por ventanas de tiempo
+metrics = Metrics()  # Métricas de latencia y de SQL por solicitud, expuestas en /metrics
+slow_queries = SlowQueryLog()  # Registro de las sentencias SQL lentas con su plan de ejecución
+profiler = Profiler()  # Perfilado bajo demanda de solicitudes (cabecera X-Profile o muestreo al azar)
+replicas = ReplicaRouter()  # Enrutado de las lecturas a las réplicas y de las escrituras a la base principal
+shards = ShardRouter()  # Reparto de los productos y detalles de venta de cada tienda entre los shards
 
-def create_app():
-    """Función factory para crear la aplicación Flask y configurar sus componentes."""
+def create_app(profile=None):
+    """Función factory para crear la aplicación Flask y configurar sus componentes.
+
+    Args:
+        profile (str): Perfil de configuración ('dev', 'test' o 'prod'); por defecto el de `APP_PROFILE`.
+    """
     
     # Creamos una instancia de la aplicación Flask
     app = Flask(__name__)
     
-    # Cargamos la configuración de la aplicación desde el archivo de configuración
-    app.config.from_object(Config)
+    # Cargamos la configuración del perfil elegido desde el archivo de configuración
+    app.config.from_object(get_config(profile))
 
     # Inicializamos las extensiones con la aplicación
+    metrics.init_app(app)  # Primero, para que la latencia medida incluya el resto de hooks de la solicitud
+    slow_queries.init_app(app)  # Registrar las sentencias que superan SLOW_QUERY_THRESHOLD_MS
+    profiler.init_app(app)  # Perfilar las solicitudes que lo piden con X-Profile o las elegidas al azar
     db.init_app(app)  # Inicializar SQLAlchemy con la app
+    replicas.init_app(app, db)  # Detectar las réplicas de lectura (binds replica_*) configuradas
     bcrypt.init_app(app)  # Inicializar Bcrypt con la app
     jwt.init_app(app)  # Inicializar JWTManager con la app
     migrate.init_app(app, db)  # Inicializar Migrate con la app y la base de datos
+    singleflight.init_app(app)  # Inicializar el agrupador de lecturas concurrentes con la app
+    cache.init_app(app, db, singleflight)  # Inicializar la caché de entidades con la app y la base de datos
 
     # Autorizador JWT para integrar con la documentación Swagger
     authorizations = {
@@ -34,6 +66,12 @@ def create_app():
             'in': 'header',  # El token JWT se debe enviar en el encabezado de la solicitud HTTP
             'name': 'Authorization',  # Nombre del campo del encabezado HTTP para el token
             'description': 'JWT Bearer token. Ejemplo: "Bearer {token}"'  # Instrucción sobre cómo enviar el token
+        },
+        'AdminToken': {
+            'type': 'apiKey',  # Token estático para los endpoints de administración
+            'in': 'header',
+            'name': 'X-Admin-Token',
+            'description': 'Token de administración (ADMIN_TOKEN)'
         }
     }
 
@@ -47,17 +85,69 @@ def create_app():
         security='Bearer'  # Define que los endpoints por defecto usan el esquema de seguridad JWT
     )
 
+    # Las escrituras de una tienda que se está moviendo de shard se rechazan temporalmente
+    @api.errorhandler(ShopMovingError)
+    def handle_shop_moving(error):
+        return {'message': str(error)}, 503, {'Retry-After': str(app.config['SHARD_MAP_TTL'])}
+
     # Importamos los controladores y namespaces que organizan las rutas/endpoints de la API
     from .controllers.product_controller import product_ns  # Controlador para la gestión de productos
     from .controllers.shop_controller import shop_ns  # Controlador para la gestión de tiendas
     from .controllers.sale_controller import sale_ns  # Controlador para la gestión de ventas
     from .controllers.detail_controller import detail_ns  # Controlador para la gestión de detalles de ventas
+    from .controllers.autocomplete_controller import autocomplete_ns  # Controlador para el autocompletado de nombres
+    from .controllers.admin_controller import admin_ns  # Controlador para los endpoints de administración
 
     # Registramos cada namespace (grupo de rutas) en la API
     api.add_namespace(product_ns, path='/products')  # Registrar el namespace de productos en /product
     api.add_namespace(shop_ns, path='/shops')  # Registrar el namespace de tiendas en /shops
     api.add_namespace(sale_ns, path='/sales')  # Registrar el namespace de ventas en /sales
     api.add_namespace(detail_ns, path='/detail')  # Registrar el namespace de detalles de ventas ventas en /detail
+    api.add_namespace(autocomplete_ns, path='/autocomplete')  # Registrar el namespace de autocompletado en /autocomplete
+    api.add_namespace(admin_ns, path='/admin')  # Registrar el namespace de administración en /admin
+
+    # Importamos los modelos que registran las extensiones
+    from .models.product import Product
+    from .models.shop import Shop
+    from .models.sale import Sale
+    from .models.detail import SaleDetail
+    from .models.change_counter import ChangeCounter
+    from .models.product_token import ProductToken
+    from .models.shop_shard import ShopShard
+    from .models.id_sequence import IdSequence
+    from .models.sales_daily import SalesDaily
+    from .models.shop_sales_daily import ShopSalesDaily
+    from .models.shop_summary import ShopSummary
+    from .models.product_sales_bucket import ProductSalesBucket
+
+    # Detectamos los shards configurados (binds shard_*); los productos se buscan por ID en todos ellos
+    shards.init_app(app, db, ShopShard, IdSequence)
+    shards.register(Product, SaleDetail)
+
+    # Registramos los modelos cuyas lecturas por ID pasan por la caché de entidades
+    cache.register(Product, load=shards.get, load_many=shards.get_many)
+    cache.register(Shop)
+
+    # Registramos los modelos cuyas escrituras incrementan los contadores de cambios (ETag de los listados)
+    change_tracker.init_app(app, db, ChangeCounter)
+    change_tracker.register(Product, product_scopes)
+    change_tracker.register(Shop)
+    change_tracker.register(Sale)
+    change_tracker.register(SaleDetail)
+
+    # Registramos el índice de búsqueda de productos, actualizado en cada alta, modificación y baja
+    search_index.init_app(app, db, ProductToken)
+    search_index.register(Product)
+
+    # Construimos el índice de autocompletado (en segundo plano si AUTOCOMPLETE_PRELOAD está activo)
+    autocomplete.init_app(app, db, Product, Shop, SaleDetail, shards)
+
+    # Ranking de productos más vendidos, alimentado por las escrituras de detalles de venta
+    leaderboard.init_app(app, db, ProductSalesBucket)
+
+    # Registramos los comandos de la CLI (`flask products import ...`, `flask products reindex`, `flask shards ...`, `flask sales ...`, `flask shops ...`)
+    from .commands import register_commands
+    register_commands(app)
 
 
     # Retornamos la aplicación ya configurada
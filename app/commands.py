@@ -0,0 +1,101 @@
+import json
+import os
+
+import click
+from flask.cli import AppGroup
+
+from app import db, search_index, shards
+from app.services.product_import_service import IMPORT_FORMATS, MAX_IMPORT_BATCH_SIZE, ProductImportService
+from app.services.sales_report_service import SalesReportService
+from app.services.shard_service import ShardService
+from app.services.shop_summary_service import ShopSummaryService
+
+# Grupo de comandos `flask products ...`
+products_cli = AppGroup('products', help='Comandos de gestión del catálogo de productos.')
+
+# Grupo de comandos `flask sales ...`
+sales_cli = AppGroup('sales', help='Comandos de gestión de las ventas y sus informes.')
+
+# Grupo de comandos `flask shops ...`
+shops_cli = AppGroup('shops', help='Comandos de gestión de las tiendas y sus paneles.')
+
+# Grupo de comandos `flask shards ...`
+shards_cli = AppGroup('shards', help='Comandos de administración de los shards por tienda.')
+
+
+@products_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), help='Formato del archivo (por defecto según la extensión).')
+@click.option('--batch-size', type=click.IntRange(1, MAX_IMPORT_BATCH_SIZE), help='Filas por sentencia (por defecto IMPORT_BATCH_SIZE).')
+def import_products(path, fmt, batch_size):
+    """Importar (insertar o actualizar) productos desde un archivo CSV o NDJSON."""
+    fmt = fmt or ('csv' if os.path.splitext(path)[1].lower() == '.csv' else 'ndjson')
+    with open(path, 'rb') as stream:
+        report = ProductImportService.import_products(ProductImportService.read_records(stream, fmt), batch_size)
+    click.echo(json.dumps(report, indent=2))
+
+
+@products_cli.command('reindex')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Productos leídos por bloque.')
+def reindex_products(batch_size):
+    """Reconstruir el índice de búsqueda de productos (tras migrar o si quedó desincronizado)."""
+    count = 0
+    for _ in shards.each():  # El índice de cada shard contiene los productos de ese shard
+        count += search_index.rebuild(db.session, batch_size)
+    db.session.commit()
+    click.echo(f'Indexed {count} products')
+
+
+@sales_cli.command('rebuild-rollups')
+def rebuild_rollups():
+    """Reconstruir los resúmenes diarios de los informes de ventas (tras migrar o si quedaron desincronizados)."""
+    click.echo(json.dumps(SalesReportService.rebuild(), indent=2))
+
+
+@shops_cli.command('reconcile-summaries')
+@click.option('--dry-run', is_flag=True, help='Solo informar de las desviaciones, sin corregirlas.')
+def reconcile_summaries(dry_run):
+    """Comparar los resúmenes del panel de las tiendas con sus datos y corregir las desviaciones."""
+    click.echo(json.dumps(ShopSummaryService.reconcile(repair=not dry_run), indent=2))
+
+
+@shards_cli.command('init')
+def init_shards():
+    """Crear las tablas en los shards y fijar el shard de las tiendas existentes en el directorio."""
+    try:
+        counts = ShardService.init_shards()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps({'pinned': counts}, indent=2))
+
+
+@shards_cli.command('status')
+def shards_status():
+    """Mostrar los productos y las tiendas de cada shard."""
+    try:
+        status = ShardService.get_status()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(status, indent=2))
+
+
+@shards_cli.command('move')
+@click.argument('shop_id', type=int)
+@click.argument('target')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Productos copiados por transacción.')
+@click.option('--wait', type=float, help='Segundos de espera tras cada cambio del directorio (por defecto SHARD_MAP_TTL).')
+def move_shop(shop_id, target, batch_size, wait):
+    """Mover una tienda a otro shard sin detener la aplicación (sus escrituras se rechazan mientras tanto)."""
+    try:
+        result = ShardService.move_shop(shop_id, target, batch_size, wait, log=click.echo)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(result, indent=2))
+
+
+def register_commands(app):
+    """Registrar los comandos de la CLI de Flask en la aplicación."""
+    app.cli.add_command(products_cli)
+    app.cli.add_command(sales_cli)
+    app.cli.add_command(shops_cli)
+    app.cli.add_command(shards_cli)
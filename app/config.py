@@ -1,5 +1,8 @@
+import json
 import os
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
 
 # Cargar el archivo .env en las variables de entorno
 load_dotenv()
@@ -10,27 +13,258 @@ class Config:
     
     Carga las variables de entorno desde un archivo .env utilizando `dotenv` y
     configura las opciones de la base de datos, el sistema de autenticación JWT, 
-    y otras configuraciones esenciales de Flask.
+    y otras configuraciones esenciales de Flask. Es la base de los perfiles de desarrollo, pruebas y
+    producción (`PROFILES`), que se eligen con la variable de entorno `APP_PROFILE`.
 
     Atributos:
-        SQLALCHEMY_DATABASE_URI (str): URI para la conexión a la base de datos MySQL.
+        SQLALCHEMY_DATABASE_URI (str): URI para la conexión a la base de datos (`DATABASE_URL`, o MySQL con las variables `DB_*`).
+        DATABASE_REPLICA_URLS (list): URIs de las réplicas de lectura (variable separada por comas); cada una es un bind `replica_<n>`.
+        DATABASE_SHARD_URLS (list): URIs de los shards de los datos por tienda (variable separada por comas); cada una es un bind `shard_<n>`.
+        SQLALCHEMY_BINDS (dict): Binds adicionales de SQLAlchemy (las réplicas de lectura y los shards).
+        REPLICA_STICKY_SECONDS (int): Segundos tras una escritura durante los que el cliente lee de la base principal (0 desactiva).
+        REPLICA_STICKY_COOKIE (str): Cookie que marca hasta cuándo un cliente lee de la base principal.
+        REPLICA_CHECK_INTERVAL (int): Segundos entre comprobaciones de conexión de cada réplica.
+        REPLICA_RETRY_SECONDS (int): Segundos que una réplica caída queda fuera antes de volver a probarla.
+        SHARD_MAP (dict): Shard fijo de algunas tiendas (JSON `{"shop_id": "shard_<n>"}`); el resto va a `shop_id % número de shards`.
+        SHARD_MAP_TTL (int): Segundos durante los que cada proceso reutiliza el directorio de shards por tienda.
+        SHARD_FANOUT_WORKERS (int): Hilos con los que se consultan los shards en paralelo en los listados.
+        SHARD_ID_BLOCK (int): IDs globales que cada proceso reserva de una vez en la base global.
         SQLALCHEMY_TRACK_MODIFICATIONS (bool): Deshabilita el seguimiento de modificaciones de objetos en SQLAlchemy para optimizar el rendimiento.
-        SQLALCHEMY_ECHO (bool): Activa la impresión de todas las consultas SQL ejecutadas por la aplicación en la consola, útil para depuración.
+        SQLALCHEMY_ECHO (bool): Imprime todas las consultas SQL en la consola (solo para depuración; para encontrar consultas costosas usar el registro de consultas lentas).
         SECRET_KEY (str): Clave secreta para firmar cookies y otras funcionalidades de seguridad de Flask.
         JWT_SECRET_KEY (str): Clave secreta utilizada para generar y verificar tokens JWT.
+        ERROR_404_HELP (bool): Desactiva las sugerencias de rutas que Flask-RESTX añade a los mensajes de error 404 de la API.
+        PAGE_SIZE_DEFAULT (int): Tamaño de página por defecto de los endpoints de listado.
+        PAGE_SIZE_MAX (int): Tamaño de página máximo que puede solicitar un cliente.
+        STREAM_CHUNK_SIZE (int): Filas leídas y enviadas por bloque en las respuestas en streaming.
+        IMPORT_BATCH_SIZE (int): Filas por sentencia en la importación masiva de productos.
+        IMPORT_MAX_ERRORS (int): Número máximo de errores por fila que se detallan en el resultado de una importación.
+        CACHE_BACKEND (str): Caché de entidades: 'memory' (solo en el proceso), 'sqlite' (más un nivel compartido) o 'none'.
+        CACHE_MAXSIZE (int): Número máximo de entidades en la caché en memoria de cada proceso.
+        CACHE_TTL (int): Segundos de vida de una entrada en la caché en memoria.
+        CACHE_SHARED_TTL (int): Segundos de vida de una entrada en la caché compartida.
+        CACHE_SQLITE_PATH (str): Archivo de la caché compartida (por defecto `instance/cache.sqlite`).
+        SINGLEFLIGHT_TIMEOUT (float): Segundos que una lectura agrupada espera a la consulta en curso antes de hacer la suya.
+        SEARCH_BACKEND (str): Motor de la búsqueda de productos: 'index' (índice invertido propio) o 'fulltext' (índice FULLTEXT nativo de MySQL).
+        SEARCH_MIN_PREFIX (int): Longitud mínima del último término de búsqueda para buscarlo como prefijo.
+        SEARCH_MAX_EXPANSIONS (int): Número máximo de términos distintos a los que se expande un prefijo.
+        AUTOCOMPLETE_PRELOAD (bool): Construir el índice de autocompletado en segundo plano al arrancar (si no, en la primera consulta).
+        AUTOCOMPLETE_REFRESH (int): Segundos tras los que el índice de autocompletado se reconstruye para incorporar escrituras de otros procesos (0 desactiva).
+        AUTOCOMPLETE_LIMIT_MAX (int): Número máximo de sugerencias por consulta de autocompletado.
+        LEADERBOARD_REFRESH (int): Segundos tras los que el ranking de más vendidos relee los buckets recientes para incorporar las ventas de otros procesos (0 desactiva).
+        LOOKUP_MAX_IDS (int): Número máximo de IDs por búsqueda por lista de IDs (`?ids=` y `POST .../lookup`).
+        ADMIN_TOKEN (str): Token que deben enviar los endpoints de administración en la cabecera `X-Admin-Token`.
+        METRICS_ENABLED (bool): Registrar las métricas de latencia y de SQL por solicitud y exponerlas en `/metrics`.
+        SLOW_QUERY_THRESHOLD_MS (float): Duración a partir de la cual una sentencia SQL se registra como lenta (0 desactiva el registro).
+        SLOW_QUERY_BUFFER_SIZE (int): Número de muestras de consultas lentas que se conservan.
+        SLOW_QUERY_RATE (float): Muestras de consultas lentas que se registran por segundo como máximo.
+        SLOW_QUERY_EXPLAIN (bool): Obtener el plan de ejecución (EXPLAIN) de las consultas lentas.
+        SLOW_QUERY_EXPLAIN_TTL (int): Segundos durante los que se reutiliza el plan de una misma sentencia.
+        SLOW_QUERY_EXPLAIN_QUEUE (int): Planes pendientes como máximo; si la cola está llena, la muestra queda sin plan.
+        PROFILE_MAX_STORED (int): Número máximo de perfiles de solicitudes guardados (0 desactiva el perfilado).
+        PROFILE_DIR (str): Directorio de los perfiles (por defecto `instance/profiles`).
+        PROFILE_SAMPLE_RATE (float): Fracción de las solicitudes que se perfilan al azar con el muestreador (0 desactiva).
+        PROFILE_SAMPLE_INTERVAL_MS (float): Intervalo de muestreo de la pila de la solicitud.
     """
 
-    # URI de conexión a la base de datos MySQL, con las credenciales y el host tomados del archivo .env
-    SQLALCHEMY_DATABASE_URI = f"mysql://{os.environ.get('DB_USER')}:{os.environ.get('DB_PASS')}@{os.environ.get('DB_HOST')}/{os.environ.get('DB_NAME')}"
+    # URI de conexión a la base de datos: DATABASE_URL completa (p. ej. un SQLite local para los benchmarks)
+    # o MySQL con las credenciales y el host tomados del archivo .env
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f"mysql://{os.environ.get('DB_USER')}:{os.environ.get('DB_PASS')}@{os.environ.get('DB_HOST')}/{os.environ.get('DB_NAME')}"
     
+    # Réplicas de lectura: las solicitudes GET leen de ellas y las escrituras van a la base principal
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    REPLICA_STICKY_COOKIE = os.environ.get('REPLICA_STICKY_COOKIE', 'read_primary_until')
+    REPLICA_CHECK_INTERVAL = int(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+    REPLICA_RETRY_SECONDS = int(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+
+    # Shards por tienda: productos, términos de búsqueda y detalles de venta; la base principal queda como base global
+    DATABASE_SHARD_URLS = [url.strip() for url in os.environ.get('DATABASE_SHARD_URLS', '').split(',') if url.strip()]
+    SHARD_MAP = json.loads(os.environ.get('SHARD_MAP') or '{}')
+    SHARD_MAP_TTL = int(os.environ.get('SHARD_MAP_TTL', 30))
+    SHARD_FANOUT_WORKERS = int(os.environ.get('SHARD_FANOUT_WORKERS', 8))
+    SHARD_ID_BLOCK = int(os.environ.get('SHARD_ID_BLOCK', 1000))
+
+    SQLALCHEMY_BINDS = {
+        **{f'replica_{i}': url for i, url in enumerate(DATABASE_REPLICA_URLS)},
+        **{f'shard_{i}': url for i, url in enumerate(DATABASE_SHARD_URLS)},
+    }
+
     # Desactiva el rastreo de modificaciones para mejorar el rendimiento de la aplicación
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    # Activa el logging de las consultas SQL en la consola
-    SQLALCHEMY_ECHO = True
+    # Logging de todas las consultas SQL en la consola (síncrono y costoso: desactivado salvo que se pida)
+    SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', 'false').lower() in ('1', 'true', 'yes')
 
     # Clave secreta para funcionalidades de seguridad como sesiones y cookies
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'super_secret_key'
 
     # Clave secreta para la autenticación JWT, usada para generar tokens
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt_super_secret_key'
+
+    # Los 404 de recursos inexistentes (p. ej. "Shop not found") no deben incluir sugerencias de otras rutas
+    ERROR_404_HELP = False
+
+    # Tamaño de página por defecto y máximo de los listados paginados por cursor
+    PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+    PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 1000))
+
+    # Filas por bloque al transmitir listados completos (yield_per del cursor y tamaño de cada escritura)
+    STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 1000))
+
+    # Importación masiva de productos: filas por sentencia multi-fila y errores detallados como máximo
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 1000))
+
+    # Caché de entidades para las lecturas por ID (productos y tiendas)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_MAXSIZE = int(os.environ.get('CACHE_MAXSIZE', 10000))
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 60))
+    CACHE_SHARED_TTL = int(os.environ.get('CACHE_SHARED_TTL', 3600))
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH')
+
+    # Tiempo máximo que una lectura concurrente espera a la consulta idéntica en curso
+    SINGLEFLIGHT_TIMEOUT = float(os.environ.get('SINGLEFLIGHT_TIMEOUT', 5))
+
+    # Búsqueda de productos: motor, longitud mínima de los prefijos (los más cortos se buscan como palabra completa) y términos por prefijo
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'index')
+    SEARCH_MIN_PREFIX = int(os.environ.get('SEARCH_MIN_PREFIX', 2))
+    SEARCH_MAX_EXPANSIONS = int(os.environ.get('SEARCH_MAX_EXPANSIONS', 50))
+
+    # Autocompletado en memoria de nombres de productos y tiendas
+    AUTOCOMPLETE_PRELOAD = os.environ.get('AUTOCOMPLETE_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+    AUTOCOMPLETE_REFRESH = int(os.environ.get('AUTOCOMPLETE_REFRESH', 600))
+    AUTOCOMPLETE_LIMIT_MAX = int(os.environ.get('AUTOCOMPLETE_LIMIT_MAX', 50))
+
+    # Ranking de productos más vendidos: cada proceso lo sirve desde memoria y relee los buckets recientes
+    LEADERBOARD_REFRESH = int(os.environ.get('LEADERBOARD_REFRESH', 5))
+
+    # Búsquedas por lista de IDs: una consulta IN por cada bloque de IDs que no estén en caché
+    LOOKUP_MAX_IDS = int(os.environ.get('LOOKUP_MAX_IDS', 1000))
+
+    # Token de los endpoints de administración; si no se define, esos endpoints quedan deshabilitados
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+    # Métricas de la API en formato de Prometheus (latencia, códigos de estado y SQL por solicitud)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+    # Registro de consultas lentas: umbral, tamaño del buffer, ritmo máximo de muestras y captura del EXPLAIN
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', 500))
+    SLOW_QUERY_RATE = float(os.environ.get('SLOW_QUERY_RATE', 5))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_EXPLAIN_TTL = int(os.environ.get('SLOW_QUERY_EXPLAIN_TTL', 300))
+    SLOW_QUERY_EXPLAIN_QUEUE = int(os.environ.get('SLOW_QUERY_EXPLAIN_QUEUE', 20))
+
+    # Perfilado de solicitudes: bajo demanda (cabecera X-Profile con el token de administración) o al azar
+    PROFILE_MAX_STORED = int(os.environ.get('PROFILE_MAX_STORED', 50))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5))
+
+
+def statement_timeout_args(uri, timeout_ms, connect_timeout):
+    """Argumentos de conexión del driver que limitan la duración de las sentencias de cada conexión.
+
+    Args:
+        uri (str): URI de la base de datos.
+        timeout_ms (int): Duración máxima de una sentencia en milisegundos (0 sin límite).
+        connect_timeout (int): Segundos máximos para establecer la conexión.
+
+    Returns:
+        dict: `connect_args` para `create_engine` (vacío si el driver no admite estas opciones).
+    """
+    backend = make_url(uri).get_backend_name()
+    if backend == 'mysql':
+        # max_execution_time solo se aplica a los SELECT (MySQL 5.7.8 o superior)
+        args = {'connect_timeout': connect_timeout}
+        if timeout_ms:
+            args['init_command'] = f'SET SESSION max_execution_time={int(timeout_ms)}'
+        return args
+    if backend == 'postgresql':
+        args = {'connect_timeout': connect_timeout}
+        if timeout_ms:
+            args['options'] = f'-c statement_timeout={int(timeout_ms)}'
+        return args
+    return {}
+
+
+class DevelopmentConfig(Config):
+    """Perfil de desarrollo: la configuración base, con el pool por defecto de SQLAlchemy."""
+
+
+class TestingConfig(Config):
+    """Perfil de pruebas: SQLite en memoria compartido por todos los hilos y sin tareas en segundo plano.
+
+    Con `StaticPool` todas las sesiones usan la misma conexión, que es la que mantiene viva la base en
+    memoria. El registro de consultas lentas (su EXPLAIN usaría esa conexión desde otro hilo), el
+    autocompletado en segundo plano y el perfilado quedan desactivados.
+    """
+
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    SQLALCHEMY_BINDS = {}
+    SQLALCHEMY_ECHO = False
+    CACHE_BACKEND = 'memory'
+    AUTOCOMPLETE_PRELOAD = False
+    AUTOCOMPLETE_REFRESH = 0
+    LEADERBOARD_REFRESH = 0
+    SLOW_QUERY_THRESHOLD_MS = 0
+    PROFILE_MAX_STORED = 0
+
+
+class ProductionConfig(Config):
+    """Perfil de producción: pool de conexiones dimensionado, sin logging de SQL y con límite por sentencia.
+
+    Atributos:
+        DB_POOL_SIZE (int): Conexiones que el pool mantiene abiertas por proceso.
+        DB_MAX_OVERFLOW (int): Conexiones adicionales que se abren en los picos y se cierran al devolverlas.
+        DB_POOL_TIMEOUT (int): Segundos que una solicitud espera una conexión libre antes de fallar.
+        DB_POOL_RECYCLE (int): Segundos tras los que una conexión se reemplaza (por debajo del `wait_timeout`
+            del servidor y del corte de inactividad de los balanceadores).
+        DB_CONNECT_TIMEOUT (int): Segundos máximos para establecer una conexión.
+        DB_STATEMENT_TIMEOUT_MS (int): Duración máxima de una sentencia en el servidor (0 sin límite).
+    """
+
+    SQLALCHEMY_ECHO = False  # Nunca en producción: el logging de cada sentencia es síncrono
+
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+
+    # Las conexiones se reutilizan entre solicitudes; pool_pre_ping descarta las que el servidor cerró
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+        'connect_args': statement_timeout_args(Config.SQLALCHEMY_DATABASE_URI, DB_STATEMENT_TIMEOUT_MS, DB_CONNECT_TIMEOUT),
+    }
+
+
+# Perfiles de configuración por nombre (`APP_PROFILE` o el argumento de `create_app`)
+PROFILES = {
+    'dev': DevelopmentConfig,
+    'test': TestingConfig,
+    'prod': ProductionConfig,
+}
+
+
+def get_config(profile=None):
+    """Clase de configuración de un perfil.
+
+    Args:
+        profile (str): 'dev', 'test' o 'prod'; por defecto el de la variable de entorno `APP_PROFILE` o 'dev'.
+
+    Raises:
+        ValueError: Si el perfil no existe.
+    """
+    profile = profile or os.environ.get('APP_PROFILE', 'dev')
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown config profile: {profile} (expected one of {', '.join(PROFILES)})")
+    return PROFILES[profile]
@@ -0,0 +1,189 @@
+from flask import Response, send_file
+from flask_restx import Namespace, Resource, fields
+from app import cache, profiler, replicas, singleflight, slow_queries
+from app.utils.auth import admin_required
+
+# Namespace para los endpoints de administración (requieren la cabecera X-Admin-Token)
+admin_ns = Namespace('Admin', description='Operaciones de administración y diagnóstico')
+
+# Modelo de salida con los contadores de la caché de entidades
+cache_stats_model = admin_ns.model('CacheStats', {
+    'backend': fields.String(description='Backend de la caché (memory, sqlite o none)'),
+    'hits_local': fields.Integer(description='Aciertos en la caché en memoria del proceso'),
+    'hits_shared': fields.Integer(description='Aciertos en la caché compartida'),
+    'misses': fields.Integer(description='Fallos (lecturas servidas por la base de datos)'),
+    'invalidations': fields.Integer(description='Entradas invalidadas por escrituras'),
+    'local_size': fields.Integer(description='Entradas en la caché en memoria del proceso'),
+})
+
+# Modelo de salida con los contadores del agrupador de lecturas concurrentes
+singleflight_stats_model = admin_ns.model('SingleFlightStats', {
+    'leaders': fields.Integer(description='Lecturas ejecutadas contra la base de datos'),
+    'collapsed': fields.Integer(description='Solicitudes que reutilizaron una lectura en curso'),
+    'timeouts': fields.Integer(description='Solicitudes que dejaron de esperar y consultaron por su cuenta'),
+    'in_flight': fields.Integer(description='Lecturas en curso en este momento'),
+})
+
+# Modelo de salida de una consulta lenta registrada
+slow_query_model = admin_ns.model('SlowQuery', {
+    'id': fields.Integer(description='ID de la muestra'),
+    'recorded_at': fields.Float(description='Momento del registro (segundos desde la época Unix)'),
+    'duration_ms': fields.Float(description='Duración de la sentencia en milisegundos'),
+    'statement': fields.String(description='Sentencia SQL'),
+    'parameters': fields.String(description='Parámetros de la sentencia'),
+    'executemany': fields.Boolean(description='Si la sentencia se ejecutó con varios juegos de parámetros'),
+    'endpoint': fields.String(description='Método y ruta de la solicitud que la ejecutó'),
+    'origin': fields.String(description='Método de servicio que la originó'),
+    'plan': fields.List(fields.String, description='Plan de ejecución (EXPLAIN); vacío mientras se obtiene'),
+})
+
+# Modelo de salida del registro de consultas lentas
+slow_queries_model = admin_ns.model('SlowQueries', {
+    'threshold_ms': fields.Float(description='Umbral de duración de una consulta lenta'),
+    'recorded': fields.Integer(description='Muestras registradas'),
+    'rate_limited': fields.Integer(description='Consultas lentas descartadas por el límite de ritmo'),
+    'buffered': fields.Integer(description='Muestras en el buffer'),
+    'explained': fields.Integer(description='Planes obtenidos con EXPLAIN'),
+    'explain_reused': fields.Integer(description='Planes reutilizados de una misma sentencia'),
+    'explain_skipped': fields.Integer(description='Muestras sin plan por tener la cola llena'),
+    'explain_failed': fields.Integer(description='EXPLAIN fallidos'),
+    'samples': fields.List(fields.Nested(slow_query_model), description='Muestras, de la más reciente a la más antigua'),
+})
+
+# Parámetros de la consulta del registro de consultas lentas
+slow_queries_parser = admin_ns.parser()
+slow_queries_parser.add_argument('limit', type=int, location='args', help='Número máximo de muestras')
+slow_queries_parser.add_argument('min_ms', type=float, location='args', help='Duración mínima de las muestras (ms)')
+
+# Modelo de salida con el estado y los contadores del enrutado de lecturas a réplicas
+replica_stats_model = admin_ns.model('ReplicaStats', {
+    'replicas': fields.Raw(description='Estado de cada réplica (up o down)'),
+    'replica_sessions': fields.Integer(description='Sesiones cuyas lecturas se enviaron a una réplica'),
+    'sticky_reads': fields.Integer(description='Lecturas enviadas a la principal por una escritura reciente del cliente'),
+    'fallbacks': fields.Integer(description='Lecturas enviadas a la principal por no haber réplicas disponibles'),
+    'failures': fields.Integer(description='Fallos de conexión que dejaron una réplica fuera'),
+})
+
+# Modelo de salida de un perfil de solicitud guardado
+profile_model = admin_ns.model('Profile', {
+    'id': fields.String(description='ID del perfil'),
+    'created_at': fields.Float(description='Momento en que se guardó (segundos desde la época Unix)'),
+    'mode': fields.String(description='Modo: cprofile o sample'),
+    'method': fields.String(description='Método HTTP de la solicitud'),
+    'path': fields.String(description='Ruta y parámetros de la solicitud'),
+    'route': fields.String(description='Plantilla de la ruta'),
+    'status': fields.Integer(description='Código de estado de la respuesta'),
+    'duration_ms': fields.Float(description='Duración de la solicitud en milisegundos'),
+    'samples': fields.Integer(description='Muestras de la pila tomadas'),
+    'breakdown': fields.Raw(description='Porcentaje del tiempo por categoría (db, orm, sql, serialization, framework, app, other)'),
+    'files': fields.List(fields.String, description='Formatos disponibles: pstats y/o collapsed'),
+})
+
+# Parámetros de la descarga de un perfil
+profile_parser = admin_ns.parser()
+profile_parser.add_argument('format', choices=('json', 'pstats', 'collapsed', 'text'), default='json', location='args',
+                            help='json (metadatos), pstats, collapsed (pilas para flamegraph) o text (informe de pstats)')
+
+
+@admin_ns.route('/cache')
+class CacheStatsResource(Resource):
+    method_decorators = [admin_required]
+
+    @admin_ns.doc('get_cache_stats', security='AdminToken')
+    @admin_ns.marshal_with(cache_stats_model)
+    def get(self):
+        """Obtener los contadores de aciertos y fallos de la caché de entidades"""
+        return cache.get_stats(), 200
+
+    @admin_ns.doc('clear_cache', security='AdminToken')
+    def delete(self):
+        """Vaciar la caché de entidades"""
+        cache.clear()
+        return {'message': 'Cache cleared'}, 200
+
+
+@admin_ns.route('/singleflight')
+class SingleFlightStatsResource(Resource):
+    method_decorators = [admin_required]
+
+    @admin_ns.doc('get_singleflight_stats', security='AdminToken')
+    @admin_ns.marshal_with(singleflight_stats_model)
+    def get(self):
+        """Obtener cuántas lecturas concurrentes se agruparon en una sola consulta"""
+        return singleflight.get_stats(), 200
+
+
+@admin_ns.route('/replicas')
+class ReplicaStatsResource(Resource):
+    method_decorators = [admin_required]
+
+    @admin_ns.doc('get_replica_stats', security='AdminToken')
+    @admin_ns.marshal_with(replica_stats_model)
+    def get(self):
+        """Obtener el estado de las réplicas de lectura y cuántas lecturas se enviaron a ellas"""
+        return replicas.get_stats(), 200
+
+
+@admin_ns.route('/slow-queries')
+class SlowQueriesResource(Resource):
+    method_decorators = [admin_required]
+
+    @admin_ns.doc('get_slow_queries', security='AdminToken')
+    @admin_ns.expect(slow_queries_parser)
+    @admin_ns.marshal_with(slow_queries_model)
+    def get(self):
+        """Obtener las sentencias SQL lentas registradas, con su plan de ejecución"""
+        args = slow_queries_parser.parse_args()
+        return dict(slow_queries.get_stats(), samples=slow_queries.get_samples(args['limit'], args['min_ms'])), 200
+
+    @admin_ns.doc('clear_slow_queries', security='AdminToken')
+    def delete(self):
+        """Vaciar el registro de consultas lentas"""
+        slow_queries.clear()
+        return {'message': 'Slow query log cleared'}, 200
+
+
+@admin_ns.route('/profiles')
+class ProfileListResource(Resource):
+    method_decorators = [admin_required]
+
+    @admin_ns.doc('get_profiles', security='AdminToken')
+    @admin_ns.marshal_list_with(profile_model)
+    def get(self):
+        """Obtener los perfiles de solicitudes guardados, del más reciente al más antiguo"""
+        return profiler.list(), 200
+
+    @admin_ns.doc('clear_profiles', security='AdminToken')
+    def delete(self):
+        """Borrar todos los perfiles guardados"""
+        profiler.clear()
+        return {'message': 'Profiles cleared'}, 200
+
+
+@admin_ns.route('/profiles/<profile_id>')
+@admin_ns.param('profile_id', 'El ID del perfil (cabecera X-Profile-Id de la respuesta perfilada)')
+class ProfileResource(Resource):
+    method_decorators = [admin_required]
+
+    @admin_ns.doc('get_profile', security='AdminToken')
+    @admin_ns.expect(profile_parser)
+    @admin_ns.response(200, 'Success', profile_model)
+    @admin_ns.response(404, 'Perfil no encontrado')
+    def get(self, profile_id):
+        """Obtener un perfil: metadatos, archivo .pstats, pilas colapsadas o informe de texto"""
+        fmt = profile_parser.parse_args()['format']
+        meta = profiler.get(profile_id)
+        if meta is None:
+            admin_ns.abort(404, 'Profile not found')
+        if fmt == 'json':
+            return admin_ns.marshal(meta, profile_model), 200
+        if fmt == 'text':
+            report = profiler.report(profile_id)
+            if report is None:
+                admin_ns.abort(404, 'Profile has no pstats data')
+            return Response(report, mimetype='text/plain')
+        path = profiler.path(profile_id, fmt)
+        if path is None:
+            admin_ns.abort(404, f'Profile has no {fmt} data')
+        return send_file(path, mimetype='application/octet-stream' if fmt == 'pstats' else 'text/plain',
+                         as_attachment=True, download_name=f'{profile_id}.{fmt}')
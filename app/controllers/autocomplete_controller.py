@@ -0,0 +1,34 @@
+from flask import current_app
+from flask_restx import Namespace, Resource, fields
+from app import autocomplete
+from app.utils.autocomplete import KINDS
+
+# Crear un espacio de nombres (namespace) para el autocompletado
+autocomplete_ns = Namespace('Autocomplete', description='Sugerencias de nombres de productos y tiendas mientras se escribe')
+
+# Definir el modelo de salida de una sugerencia para la documentación de Swagger
+suggestion_model = autocomplete_ns.model('Suggestion', {
+    'type': fields.String(description='Tipo de la sugerencia (product o shop)'),
+    'id': fields.Integer(description='ID del producto o de la tienda'),
+    'name': fields.String(description='Nombre del producto o de la tienda'),
+    'score': fields.Integer(description='Popularidad (unidades vendidas)'),
+})
+
+# Parámetros del autocompletado
+autocomplete_parser = autocomplete_ns.parser()
+autocomplete_parser.add_argument('prefix', required=True, location='args', help='Texto escrito hasta el momento')
+autocomplete_parser.add_argument('limit', type=int, default=10, location='args', help='Número máximo de sugerencias')
+autocomplete_parser.add_argument('type', choices=KINDS, location='args', help='Sugerir solo productos o solo tiendas')
+
+
+# Controlador del autocompletado; se sirve desde memoria, sin consultar la base de datos
+@autocomplete_ns.route('')
+class AutocompleteResource(Resource):
+    @autocomplete_ns.doc('autocomplete')
+    @autocomplete_ns.expect(autocomplete_parser)
+    @autocomplete_ns.marshal_list_with(suggestion_model)
+    def get(self):
+        """Sugerir productos y tiendas cuyo nombre (o alguna de sus palabras) empieza por el prefijo"""
+        args = autocomplete_parser.parse_args()
+        limit = max(1, min(args['limit'], current_app.config['AUTOCOMPLETE_LIMIT_MAX']))
+        return autocomplete.lookup(args['prefix'], limit, args['type'])
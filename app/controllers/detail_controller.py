@@ -1,18 +1,19 @@
 from flask import request
 from flask_restx import Namespace, Resource, fields
+from app import change_tracker
 from app.services.detail_service import SaleDetailService
+from app.utils.pagination import next_link_headers, page_limit, pagination_parser
+from app.utils.etag import conditional, make_etag
+from app.utils.serializer import RowSerializer
+from app.utils.validation import schema_model, validate_body
+from app.schemas.detail import SaleDetailSchema
 from flask_jwt_extended import jwt_required
 
 # Namespace para Detalles de Ventas
 detail_ns = Namespace('Detalles_Venta', description='Operaciones con los detalles de ventas')
 
-# Modelo de entrada para detalles de ventas
-detail_model = detail_ns.model('SalesDetail', {
-    'qnt_prod_sale': fields.Integer(required=True, description='Cantidad de productos vendidos asociados al Id de producto'),
-    'sale_id': fields.Integer(required=True, description='IDs de las ventas asociadas'),
-    'product_id': fields.Integer(required=True, description='IDs de los productos asociados')
-    
-})
+# Modelo de entrada para detalles de ventas, generado a partir de su esquema de pydantic
+detail_model = schema_model(detail_ns, 'SalesDetail', SaleDetailSchema)
 
 # Modelo de salida para detalle de ventas (respuesta)
 detail_response_model = detail_ns.model('SalesDetailResponse', {
@@ -23,35 +24,57 @@ detail_response_model = detail_ns.model('SalesDetailResponse', {
     
 })
 
+# Serializador compilado del listado de detalles de ventas
+detail_serializer = RowSerializer(detail_response_model)
+
+# Parámetros de paginación y filtros del listado de detalles de ventas
+detail_list_parser = pagination_parser.copy()
+detail_list_parser.add_argument('sale_id', type=int, location='args', help='ID de la venta')
+detail_list_parser.add_argument('product_id', type=int, location='args', help='ID del producto')
+
+def details_etag():
+    """ETag del listado de detalles: contador de cambios de la tabla más los parámetros de la solicitud."""
+    return make_etag('Detalle_Venta', *change_tracker.versions('Detalle_Venta'), request.query_string)
+
 @detail_ns.route('/')
 class SaleDetailListResource(Resource):
     
-    @detail_ns.marshal_list_with(detail_response_model)  # Serialización automática de la lista de detalle de ventas
+    @detail_ns.expect(detail_list_parser)
+    @detail_ns.response(200, 'Success', [detail_response_model])
+    @detail_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @conditional(details_etag)
     def get(self):
-        """Obtener todas los detalles de ventas"""
-        details = SaleDetailService.get_all_saledetails()
-        return details, 200
+        """Obtener los detalles de ventas paginados por cursor (la siguiente página se indica en la cabecera Link)"""
+        args = detail_list_parser.parse_args()
+        try:
+            page = SaleDetailService.get_all_saledetails(
+                page_limit(args['limit']),
+                args['after'],
+                sale_id=args['sale_id'],
+                product_id=args['product_id'],
+                fields=detail_serializer.columns())
+        except ValueError as e:
+            detail_ns.abort(400, str(e))
+        return detail_serializer.dump(page.items), 200, next_link_headers(page.next_cursor)
 
-    @detail_ns.expect(detail_model, validate=True)
-    
+    @detail_ns.expect(detail_model)
+    @validate_body(SaleDetailSchema)
     @detail_ns.marshal_with(detail_response_model, code=201)  # Serialización automática del detalle de venta creado
-    def post(self):
+    def post(self, payload):
         """Crear un nuevo detalle de venta"""
-        data = request.get_json()
-        detail = SaleDetailService.create_detail(data['qnt_prod_sale'], data['sale_id'], data['product_id'])
+        detail = SaleDetailService.create_detail(payload.qnt_prod_sale, payload.sale_id, payload.product_id)
         return detail, 201 
 
 @detail_ns.route('/<int:id>')
 @detail_ns.param('id', 'El ID del detalle')
 class SaleDetailResource(Resource):
-    @detail_ns.expect(detail_model, validate=True)
+    @detail_ns.expect(detail_model)
+    @validate_body(SaleDetailSchema)
     @detail_ns.marshal_with(detail_response_model)
-    def put(self, id):
+    def put(self, id, payload):
         """Actualizar un detalle de venta por su ID"""
-        data = request.get_json()  # Obtiene los nuevos datos para el detalle de venta
-
         try:
-            detail = SaleDetailService.update_detail(id, data['qnt_prod_sale'], data['sale_id'], data['product_id'])  # Llama al servicio para actualizar
+            detail = SaleDetailService.update_detail(id, payload.qnt_prod_sale, payload.sale_id, payload.product_id)  # Llama al servicio para actualizar
 
             return detail, 200  # Retorna la venta actualizada con un código de estado 200 (OK)
         except ValueError as e:
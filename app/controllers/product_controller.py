@@ -1,19 +1,24 @@
-from flask import request, jsonify
-from flask_restx import Namespace, Resource, fields
-from app.services.product_service import ProductService
+from flask import current_app, request, jsonify
+from flask_restx import Namespace, Resource, fields, inputs
+from app import change_tracker
+from app.services.product_service import PRODUCT_SORTS, DuplicateProductError, ProductService
+from app.services.product_import_service import IMPORT_FORMATS, MAX_IMPORT_BATCH_SIZE, ProductImportService
+from app.utils.pagination import next_link_headers, page_limit, pagination_parser
+from app.utils.streaming import JSON_MIMETYPE, NDJSON_MIMETYPE, stream_response, wants_stream
+from app.utils.etag import conditional, make_etag
+from app.utils.leaderboard import TOP_K, WINDOWS
+from app.utils.lookup import check_ids, lookup_model, lookup_response, parse_ids
+from app.utils.projection import parse_fields
+from app.utils.serializer import RowSerializer
+from app.utils.validation import schema_model, validate_body
+from app.schemas.lookup import LookupSchema
+from app.schemas.product import ProductSchema
 
 # Crear un espacio de nombres (namespace) para Product (Productos)
 product_ns = Namespace('Products', description='Operaciones relacionadas con los productos')
 
-# Definir el modelo de entrada de product para la documentación de Swagger
-product_model = product_ns.model('Products', {
-    'name': fields.String(required=True, description='Nombre del Producto'),
-    'image': fields.String(required=True, description='Imagen del Producto'),
-    'description': fields.String(required=True, description='Descripción del Producto'),
-    'price': fields.Integer(required=True, description='Precio del Producto'),
-    'quantity': fields.Integer(required=True, description='Cantidad en existencia del Producto'),
-    'shop_id': fields.Integer(required=True, description='Id de la tienda a la que pertenece el Producto')
-})
+# Modelo de entrada de product para la documentación de Swagger, generado a partir de su esquema de pydantic
+product_model = schema_model(product_ns, 'Products', ProductSchema)
 
 # Definir el modelo de salida de product para la documentación de Swagger
 product_response_model = product_ns.model('ProductsResponse', {
@@ -26,39 +31,246 @@ product_response_model = product_ns.model('ProductsResponse', {
     'shop_id': fields.Integer(required=True, description='ID de la tienda')
 })
 
+# Serializador compilado de los listados de productos
+product_serializer = RowSerializer(product_response_model)
+
+# Parámetros de paginación y filtros del listado de productos
+product_list_parser = pagination_parser.copy()
+product_list_parser.add_argument('shop_id', type=int, location='args', help='ID de la tienda')
+product_list_parser.add_argument('min_price', type=int, location='args', help='Precio mínimo')
+product_list_parser.add_argument('max_price', type=int, location='args', help='Precio máximo')
+product_list_parser.add_argument('in_stock', type=inputs.boolean, location='args', help='Solo productos con (true) o sin (false) existencias')
+product_list_parser.add_argument('stream', type=inputs.boolean, location='args', help='Transmitir el listado completo sin paginar')
+product_list_parser.add_argument('fields', type=str, location='args', help='Campos a devolver, separados por comas (p. ej. id,name,price,quantity)')
+product_list_parser.add_argument('ids', type=str, location='args', help='Buscar estos IDs, separados por comas, en lugar de paginar (ver POST /products/lookup)')
+
+# Búsqueda por lista de IDs: parámetros y modelo de salida
+product_lookup_parser = product_ns.parser()
+product_lookup_parser.add_argument('fields', type=str, location='args', help='Campos a devolver, separados por comas (p. ej. id,name,price,quantity)')
+product_lookup_model = schema_model(product_ns, 'ProductsLookupRequest', LookupSchema)
+product_lookup_response_model = lookup_model(product_ns, 'Products', product_response_model)
+
+# Parámetros de la búsqueda de productos
+product_search_parser = product_ns.parser()
+product_search_parser.add_argument('q', required=True, location='args', help='Texto a buscar en el nombre y la descripción')
+product_search_parser.add_argument('limit', type=int, location='args', help='Número máximo de resultados')
+product_search_parser.add_argument('shop_id', type=int, location='args', help='ID de la tienda')
+product_search_parser.add_argument('min_price', type=int, location='args', help='Precio mínimo')
+product_search_parser.add_argument('max_price', type=int, location='args', help='Precio máximo')
+product_search_parser.add_argument('in_stock', type=inputs.boolean, location='args', help='Solo productos con (true) o sin (false) existencias')
+product_search_parser.add_argument('fields', type=str, location='args', help='Campos a devolver, separados por comas (p. ej. id,name,price,quantity)')
+
+# Parámetros del listado de productos de una tienda
+shop_products_parser = product_ns.parser()
+shop_products_parser.add_argument('sort', choices=[sort for sort in PRODUCT_SORTS if sort], location='args', help='Orden: price, name o newest (por defecto por ID)')
+
+# Parámetros del ranking de productos más vendidos
+top_products_parser = product_ns.parser()
+top_products_parser.add_argument('window', choices=list(WINDOWS), default='24h', location='args', help='Ventana de tiempo: 1h, 24h o 7d')
+top_products_parser.add_argument('shop_id', type=int, location='args', help='ID de la tienda')
+top_products_parser.add_argument('n', type=int, default=50, location='args', help=f'Número de productos (como mucho {TOP_K})')
+
+# Definir el modelo de salida de un producto del ranking
+top_product_model = product_ns.model('TopProduct', {
+    'product_id': fields.Integer(description='ID del Producto'),
+    'name': fields.String(description='Nombre del Producto'),
+    'shop_id': fields.Integer(description='ID de la tienda'),
+    'units_sold': fields.Integer(description='Unidades vendidas en la ventana'),
+})
+
+# Parámetros de la importación masiva de productos
+product_import_parser = product_ns.parser()
+product_import_parser.add_argument('format', choices=IMPORT_FORMATS, location='args', help='Formato del archivo (por defecto según Content-Type)')
+product_import_parser.add_argument('batch_size', type=inputs.int_range(1, MAX_IMPORT_BATCH_SIZE), location='args', help=f'Filas por sentencia (de 1 a {MAX_IMPORT_BATCH_SIZE})')
+
+# Modelo de salida de la importación masiva
+product_import_response_model = product_ns.model('ProductsImportResponse', {
+    'processed': fields.Integer(description='Filas leídas del archivo'),
+    'imported': fields.Integer(description='Filas insertadas o actualizadas'),
+    'failed': fields.Integer(description='Filas rechazadas'),
+    'errors': fields.List(fields.Nested(product_ns.model('ProductsImportError', {
+        'line': fields.Integer(description='Línea del archivo'),
+        'error': fields.String(description='Motivo del rechazo'),
+    })), description='Detalle de las filas rechazadas'),
+})
+
+
+def products_etag():
+    """ETag del listado de productos: contador de cambios de la tabla más los parámetros de la solicitud."""
+    return make_etag('Products', *change_tracker.versions('Products'), request.query_string, request.headers.get('Accept', ''))
+
+def product_etag(product_id):
+    """ETag de un producto: su ID y su versión de fila (leída a través de la caché de entidades)."""
+    product = ProductService.get_product_by_id(product_id)
+    return make_etag('Products', product.id, product.version) if product else None
+
+def shop_products_etag(shop_id):
+    """ETag de los productos de una tienda: contador de cambios de la tienda más los parámetros de la solicitud."""
+    return make_etag('Products:shop', shop_id, *change_tracker.versions(f'Products:shop:{shop_id}', 'Products:bulk'), request.query_string)
+
 
 # Controlador para manejar las operaciones CRUD de product
 @product_ns.route('/')
 class ProductListResource(Resource):
     # Método para obtener todos los productos registrados
     @product_ns.doc('get_products')
-    @product_ns.marshal_list_with(product_response_model)  # Decorador para definir el formato de la respuesta
+    @product_ns.expect(product_list_parser)
+    @product_ns.produces([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    @product_ns.response(200, 'Success', [product_response_model])
+    @product_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @conditional(products_etag)
     def get(self):
-        """Obtener todos los Productos"""
-        products = ProductService.get_all_products()
-        return products, 200
+        """Obtener los Productos paginados por cursor (la siguiente página se indica en la cabecera Link)
+
+        Con `?stream=1` o `Accept: application/x-ndjson` se transmite el listado completo por bloques.
+        """
+        args = product_list_parser.parse_args()
+        try:
+            # Con `?fields=` la consulta lee solo esas columnas y la respuesta contiene solo esos campos
+            field_names = parse_fields(args['fields'], product_response_model)
+        except ValueError as e:
+            product_ns.abort(400, str(e))
+
+        # Con `?ids=` se devuelven esos productos, en el orden pedido, en lugar de una página
+        if args['ids'] is not None:
+            try:
+                ids = parse_ids(args['ids'])
+            except ValueError as e:
+                product_ns.abort(400, str(e))
+            return lookup_response(ids, ProductService.get_products_by_ids(ids), product_serializer, field_names), 200
+
+        # Se leen solo las columnas de la respuesta, como filas que serializa el serializador compilado
+        filters = dict(
+            shop_id=args['shop_id'],
+            min_price=args['min_price'],
+            max_price=args['max_price'],
+            in_stock=args['in_stock'],
+            fields=product_serializer.columns(field_names))
+
+        # Modo streaming: recorrer la tabla con un cursor del servidor sin materializar la lista
+        if wants_stream(args['stream']):
+            products = ProductService.iter_products(current_app.config['STREAM_CHUNK_SIZE'], **filters)
+            return stream_response(products, product_serializer.dumper(field_names))
+
+        try:
+            page = ProductService.get_all_products(page_limit(args['limit']), args['after'], **filters)
+        except ValueError as e:
+            product_ns.abort(400, str(e))
+        return product_serializer.dump(page.items, field_names), 200, next_link_headers(page.next_cursor)
     # Método para crear un nuevo producto
     @product_ns.doc('create_product')
-    @product_ns.expect(product_model, validate=True)  # Decorador para esperar el modelo en la solicitud
+    @product_ns.expect(product_model)  # Decorador para esperar el modelo en la solicitud
+    @validate_body(ProductSchema)  # Validar y convertir el cuerpo de la solicitud
+    @product_ns.response(409, 'La tienda ya tiene un producto con ese nombre')
     @product_ns.marshal_with(product_response_model, code=201)  # Decorador para definir el formato de la respuesta
-    def post(self):
+    def post(self, payload):
         """Crear un nuevo Producto"""
-        data = request.get_json()  # Obtiene los datos en formato JSON del cuerpo de la solicitud
-
-        product = ProductService.create_product(
-            data['name'], 
-            data['image'], 
-            data['description'], 
-            data['price'], 
-            data['quantity'], 
-            data['shop_id'])
+        try:
+            product = ProductService.create_product(
+                payload.name, 
+                payload.image, 
+                payload.description, 
+                payload.price, 
+                payload.quantity, 
+                payload.shop_id)
+        except DuplicateProductError as e:
+            product_ns.abort(409, str(e))
+        except ValueError as e:
+            product_ns.abort(404, str(e))
         return product, 201
         # Usamos jsonify para asegurarnos de que la respuesta siga el formato JSON válido.
 
+@product_ns.route('/search')
+class ProductSearchResource(Resource):
+    # Método para buscar productos por texto, ordenados por relevancia
+    @product_ns.doc('search_products')
+    @product_ns.expect(product_search_parser)
+    @product_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @product_ns.response(200, 'Success', [product_response_model])
+    @conditional(products_etag)
+    def get(self):
+        """Buscar productos por nombre y descripción (el último término se busca como prefijo)"""
+        args = product_search_parser.parse_args()
+        try:
+            field_names = parse_fields(args['fields'], product_response_model)
+            products = ProductService.search_products(
+                args['q'],
+                page_limit(args['limit']),
+                shop_id=args['shop_id'],
+                min_price=args['min_price'],
+                max_price=args['max_price'],
+                in_stock=args['in_stock'],
+                fields=product_serializer.columns(field_names))
+        except ValueError as e:
+            product_ns.abort(400, str(e))
+        return product_serializer.dump(products, field_names), 200
+
+
+@product_ns.route('/lookup')
+class ProductLookupResource(Resource):
+    @product_ns.doc('lookup_products')
+    @product_ns.expect(product_lookup_model, product_lookup_parser)
+    @product_ns.response(200, 'Success', product_lookup_response_model)
+    @product_ns.response(400, 'Lista de IDs no válida')
+    @validate_body(LookupSchema)
+    def post(self, payload):
+        """Obtener varios productos por sus IDs, en el orden pedido (los que no existen se marcan con `found: false`)
+
+        Los productos en la caché de entidades se sirven desde ella y el resto se leen con una consulta IN
+        por bloque de IDs. Equivale a `GET /products?ids=...` para listas que no caben en la URL.
+        """
+        args = product_lookup_parser.parse_args()
+        try:
+            field_names = parse_fields(args['fields'], product_response_model)
+            ids = check_ids(payload.ids)
+        except ValueError as e:
+            product_ns.abort(400, str(e))
+        return lookup_response(ids, ProductService.get_products_by_ids(ids), product_serializer, field_names), 200
+
+
+@product_ns.route('/top')
+class TopProductsResource(Resource):
+    @product_ns.doc('top_products')
+    @product_ns.expect(top_products_parser)
+    @product_ns.marshal_list_with(top_product_model)
+    def get(self):
+        """Obtener los productos más vendidos en la última hora, día o semana (global o de una tienda)"""
+        args = top_products_parser.parse_args()
+        try:
+            return ProductService.get_top_products(args['window'], max(1, min(args['n'], TOP_K)), args['shop_id']), 200
+        except ValueError as e:
+            product_ns.abort(404, str(e))
+
+
+@product_ns.route('/import')
+class ProductImportResource(Resource):
+    @product_ns.doc('import_products')
+    @product_ns.expect(product_import_parser)
+    @product_ns.marshal_with(product_import_response_model)
+    def post(self):
+        """Importar (insertar o actualizar por tienda y nombre) productos desde un archivo CSV o NDJSON
+
+        El archivo se envía como cuerpo de la solicitud (`Content-Type: text/csv` o `application/x-ndjson`)
+        o como campo `file` de un formulario multipart.
+        """
+        args = product_import_parser.parse_args()
+        upload = request.files.get('file')
+        if upload is not None:
+            stream = upload.stream
+            fmt = args['format'] or ('csv' if (upload.filename or '').lower().endswith('.csv') else 'ndjson')
+        else:
+            stream = request.stream
+            fmt = args['format'] or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+
+        records = ProductImportService.read_records(stream, fmt)
+        return ProductImportService.import_products(records, args['batch_size']), 200
+
 @product_ns.route('/<int:product_id>')
 @product_ns.param('product_id', 'El ID del Producto')
 class ProductResource(Resource):
     @product_ns.doc('get_product_by_id')
+    @product_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @conditional(product_etag)
     @product_ns.marshal_with(product_response_model)
     def get(self, product_id):
         """Obtener un Producto por su ID"""
@@ -68,14 +280,17 @@ class ProductResource(Resource):
         return product, 200
 
     @product_ns.doc('update_product')
-    @product_ns.expect(product_model, validate=True)  # Esperar los nuevos datos del producto
+    @product_ns.expect(product_model)  # Esperar los nuevos datos del producto
+    @validate_body(ProductSchema)
+    @product_ns.response(409, 'La tienda ya tiene un producto con ese nombre')
     @product_ns.marshal_with(product_response_model)
-    def put(self, product_id):
+    def put(self, product_id, payload):
         """Actualizar un producto por su ID"""
-        data = request.get_json()
         try:
-            product = ProductService.update_product(product_id, data['name'], data['image'], data['description'], data['price'], data['quantity'])
+            product = ProductService.update_product(product_id, payload.name, payload.image, payload.description, payload.price, payload.quantity)
             return product, 200
+        except DuplicateProductError as e:
+            product_ns.abort(409, str(e))
         except ValueError as e:
             return {'message': str(e)}, 404
 
@@ -93,12 +308,17 @@ class ProductResource(Resource):
 @product_ns.param('shop_id', 'El ID de la Tienda')
 class ShopProductResource(Resource):
     @product_ns.doc('get_product_by_shop')
-    @product_ns.marshal_list_with(product_response_model)
+    @product_ns.expect(shop_products_parser)
+    @product_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @product_ns.response(404, 'Tienda no encontrada')
+    @product_ns.response(200, 'Success', [product_response_model])
+    @conditional(shop_products_etag)
     def get(self, shop_id):
         """Obtener todos los productos que están asignados a una tienda específica"""
+        args = shop_products_parser.parse_args()
         try:
-            products = ProductService.get_products_by_shop(shop_id)
-            return products, 200
+            products = ProductService.get_products_by_shop(shop_id, args['sort'])
+            return product_serializer.dump(products), 200
         except ValueError as e:
-            return {'message': str(e)}, 404
+            product_ns.abort(404, str(e))
 
@@ -1,29 +1,129 @@
 from flask import request
-from flask_restx import Namespace, Resource, fields
-from app.services.sale_service import SaleService
+from flask_restx import Namespace, Resource, fields, inputs
+from app import change_tracker
+from app.services.sale_service import InsufficientStockError, SaleService
+from app.services.sales_report_service import GRANULARITIES, SalesReportService
+from app.utils.pagination import next_link_headers, page_limit, pagination_parser
+from app.utils.etag import conditional, make_etag
+from app.utils.lookup import check_ids, lookup_model, lookup_response, parse_ids
+from app.utils.projection import parse_expand, parse_fields
+from app.utils.serializer import Label, RowSerializer
+from app.utils.validation import schema_model, validate_body
+from app.schemas.lookup import LookupSchema
+from app.schemas.sale import CheckoutSchema, SaleSchema
 from app.models.sale import StateEnum
 from flask_jwt_extended import jwt_required
 
 # Namespace para Ventas
 sale_ns = Namespace('Ventas', description='Operaciones con las ventas')
 
-# Modelo de entrada para ventas
-sale_model = sale_ns.model('Sales', {
-    'date': fields.Date(required=True, description='Fecha de la Venta'),
-    'total': fields.Integer(description='Valor total de la Venta'),
-    'status': fields.Integer(description='Estado de la Venta (0: en proceso, 1: registrada, 2: pagada, 3: anulada)'),
-   
-})
+# Modelo de entrada para ventas, generado a partir de su esquema de pydantic
+sale_model = schema_model(sale_ns, 'Sales', SaleSchema)
 
-# Modelo de salida para ventas (respuesta)
+# Etiquetas de los estados de una venta en las respuestas
+STATUS_LABELS = {
+    StateEnum.IN_PROGRESS: "En proceso",
+    StateEnum.REGISTERED: "Registrada",
+    StateEnum.PAID: "Pagada",
+    StateEnum.NULLED: "Anulada"
+}
+
+# Modelo de salida para ventas (respuesta): el estado se traduce al serializar, sin modificar la venta
 sale_response_model = sale_ns.model('SalesResponse', {
     'id': fields.Integer(description='ID de la venta'),
     'date': fields.Date(description='Fecha de la Venta'),
     'total': fields.Integer(description='Valor total de la Venta'),
-    'status': fields.String(description='Estado de la Venta (en proceso, registrada, pagada, anulada)'),
+    'status': Label(STATUS_LABELS, "Desconocido", description='Estado de la Venta (en proceso, registrada, pagada, anulada)'),
     
 })
 
+# Serializador compilado del listado de ventas
+sale_serializer = RowSerializer(sale_response_model)
+
+# Relaciones que puede incluir la consulta de una venta (`?expand=`)
+SALE_EXPANSIONS = ('details', 'details.product')
+
+# Modelos de salida de una venta con sus detalles y, opcionalmente, los productos de estos
+sale_detail_model = sale_ns.model('SaleDetail', {
+    'id': fields.Integer(description='ID del detalle de venta'),
+    'product_id': fields.Integer(description='ID del producto'),
+    'qnt_prod_sale': fields.Integer(description='Cantidad de unidades vendidas'),
+})
+sale_detail_product_model = sale_ns.inherit('SaleDetailWithProduct', sale_detail_model, {
+    'product': fields.Nested(sale_ns.model('SaleDetailProduct', {
+        'id': fields.Integer(description='ID del Producto'),
+        'name': fields.String(description='Nombre del Producto'),
+        'image': fields.String(description='Imagen del Producto'),
+        'price': fields.Integer(description='Precio actual del Producto'),
+        'shop_id': fields.Integer(description='ID de la tienda'),
+    }), description='Producto del detalle'),
+})
+
+# Modelo de salida de cada combinación de relaciones incluidas (la venta sola no carga sus detalles)
+sale_expand_models = {
+    frozenset(): sale_response_model,
+    frozenset({'details'}): sale_ns.inherit('SaleWithDetails', sale_response_model, {
+        'details': fields.List(fields.Nested(sale_detail_model), attribute='Detalle_Venta', description='Detalles de la Venta'),
+    }),
+    frozenset(SALE_EXPANSIONS): sale_ns.inherit('SaleWithDetailsAndProducts', sale_response_model, {
+        'details': fields.List(fields.Nested(sale_detail_product_model), attribute='Detalle_Venta', description='Detalles de la Venta con sus productos'),
+    }),
+}
+
+# Parámetros de la consulta de una venta
+sale_expand_parser = sale_ns.parser()
+sale_expand_parser.add_argument('expand', type=str, location='args', help='Relaciones a incluir, separadas por comas: details, details.product')
+
+# Modelo de entrada para el checkout (venta completa con sus líneas), generado a partir de su esquema de pydantic
+checkout_model = schema_model(sale_ns, 'Checkout', CheckoutSchema)
+
+# Modelo de salida para el checkout: la venta creada junto con sus detalles
+checkout_response_model = sale_ns.model('CheckoutResponse', {
+    'id': fields.Integer(description='ID de la venta'),
+    'date': fields.Date(description='Fecha de la Venta'),
+    'total': fields.Integer(description='Valor total de la Venta'),
+    'status': Label(STATUS_LABELS, "Desconocido", description='Estado de la Venta'),
+    'details': fields.List(fields.Nested(sale_ns.model('CheckoutDetail', {
+        'id': fields.Integer(description='ID del detalle de venta'),
+        'product_id': fields.Integer(description='ID del producto'),
+        'qnt_prod_sale': fields.Integer(description='Cantidad de unidades vendidas'),
+    })), attribute='Detalle_Venta', description='Detalles de la Venta'),
+})
+
+# Parámetros de paginación y filtros del listado de ventas
+sale_list_parser = pagination_parser.copy()
+sale_list_parser.add_argument('status', type=int, location='args', help='Estado de la Venta (0, 1, 2, 3)')
+sale_list_parser.add_argument('date_from', type=inputs.date_from_iso8601, location='args', help='Fecha mínima (YYYY-MM-DD)')
+sale_list_parser.add_argument('date_to', type=inputs.date_from_iso8601, location='args', help='Fecha máxima (YYYY-MM-DD)')
+sale_list_parser.add_argument('fields', type=str, location='args', help='Campos a devolver, separados por comas (p. ej. id,total,status)')
+sale_list_parser.add_argument('ids', type=str, location='args', help='Buscar estos IDs, separados por comas, en lugar de paginar (ver POST /sales/lookup)')
+
+# Búsqueda por lista de IDs: parámetros y modelos de entrada y salida
+sale_lookup_parser = sale_ns.parser()
+sale_lookup_parser.add_argument('fields', type=str, location='args', help='Campos a devolver, separados por comas (p. ej. id,total,status)')
+sale_lookup_model = schema_model(sale_ns, 'SalesLookupRequest', LookupSchema)
+sale_lookup_response_model = lookup_model(sale_ns, 'Sales', sale_response_model)
+
+
+# Modelo de salida de una fila de los informes de ventas; las dimensiones y métricas que no aplican se omiten
+sale_report_model = sale_ns.model('SalesReportRow', {
+    'period': fields.String(description='Periodo: día (YYYY-MM-DD), mes (YYYY-MM) o año (YYYY)'),
+    'status': Label(STATUS_LABELS, "Desconocido", description='Estado de las ventas (con group_by=status)'),
+    'shop_id': fields.Integer(description='ID de la tienda (con group_by=shop)'),
+    'sales': fields.Integer(description='Número de ventas (informes sin desglose por tienda)'),
+    'lines': fields.Integer(description='Número de detalles de venta (informes por tienda)'),
+    'units': fields.Integer(description='Unidades vendidas (informes por tienda)'),
+    'revenue': fields.Integer(description='Importe de las ventas'),
+})
+
+# Parámetros de los informes de ventas
+sale_report_parser = sale_ns.parser()
+sale_report_parser.add_argument('granularity', choices=list(GRANULARITIES), default='day', location='args', help='Periodo de agregación: day, month o year')
+sale_report_parser.add_argument('date_from', type=inputs.date_from_iso8601, location='args', help='Fecha mínima (YYYY-MM-DD)')
+sale_report_parser.add_argument('date_to', type=inputs.date_from_iso8601, location='args', help='Fecha máxima (YYYY-MM-DD)')
+sale_report_parser.add_argument('status', type=int, location='args', help='Estado de la Venta (0, 1, 2, 3)')
+sale_report_parser.add_argument('shop_id', type=int, location='args', help='ID de la tienda (informe de lo vendido por esa tienda)')
+sale_report_parser.add_argument('group_by', type=str, location='args', help='Desglose además del periodo, separado por comas: status, shop')
 
 def map_status_to_enum(status_int):
     """Mapea un valor entero a su correspondiente valor del enum StateEnum."""
@@ -34,64 +134,172 @@ def map_status_to_enum(status_int):
 
 def map_enum_to_status(enum_value):
     """Mapea el enum a su representación como cadena."""
-    status_map = {
-        StateEnum.IN_PROGRESS: "En proceso",
-        StateEnum.REGISTERED: "Registrada",
-        StateEnum.PAID: "Pagada",
-        StateEnum.NULLED: "Anulada"
-    }
-    return status_map.get(enum_value, "Desconocido")
+    return STATUS_LABELS.get(enum_value, "Desconocido")
+
+def sales_etag():
+    """ETag del listado de ventas: contador de cambios de la tabla más los parámetros de la solicitud."""
+    return make_etag('Ventas', *change_tracker.versions('Ventas'), request.query_string)
+
+def sale_etag(sale_id):
+    """ETag de una venta: su ID y su versión de fila, más los contadores de detalles y productos si se incluyen."""
+    try:
+        expand = parse_expand(request.args.get('expand'), SALE_EXPANSIONS)
+    except ValueError:
+        return None
+    sale = SaleService.get_sale_by_id(sale_id)
+    if sale is None:
+        return None
+    parts = ('Ventas', sale.id, sale.version)
+    if expand:
+        scopes = ['Detalle_Venta'] + (['Products'] if 'details.product' in expand else [])
+        parts += (*sorted(expand), *change_tracker.versions(*scopes))
+    return make_etag(*parts)
 
 @sale_ns.route('/')
 class SaleListResource(Resource):
     #@jwt_required()
-    @sale_ns.marshal_list_with(sale_response_model)  # Serialización automática de la lista de ventas
+    @sale_ns.expect(sale_list_parser)
+    @sale_ns.response(200, 'Success', [sale_response_model])
+    @sale_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @conditional(sales_etag)
     def get(self):
-        """Obtener todas las ventas"""
-        sales = SaleService.get_all_sales()
-                # Mapeo de status de enum a cadena para la respuesta
-        for sale in sales:
-            sale.status = map_enum_to_status(sale.status)
-        return sales, 200
-
-    @sale_ns.expect(sale_model, validate=True)
+        """Obtener las ventas paginadas por cursor sobre (fecha, ID) (la siguiente página se indica en la cabecera Link)"""
+        args = sale_list_parser.parse_args()
+        try:
+            # Con `?fields=` la consulta lee solo esas columnas y la respuesta contiene solo esos campos
+            field_names = parse_fields(args['fields'], sale_response_model)
+            if args['ids'] is not None:
+                # Con `?ids=` se devuelven esas ventas, en el orden pedido, en lugar de una página
+                ids = parse_ids(args['ids'])
+                return lookup_response(ids, SaleService.get_sales_by_ids(ids), sale_serializer, field_names), 200
+            page = SaleService.get_all_sales(
+                page_limit(args['limit']),
+                args['after'],
+                status=args['status'],
+                date_from=args['date_from'],
+                date_to=args['date_to'],
+                fields=sale_serializer.columns(field_names))
+        except ValueError as e:
+            sale_ns.abort(400, str(e))
+        return sale_serializer.dump(page.items, field_names), 200, next_link_headers(page.next_cursor)
+
+    @sale_ns.expect(sale_model)
+    @validate_body(SaleSchema)  # Validar el cuerpo y convertir la fecha a `datetime.date`
     #@jwt_required()
     @sale_ns.marshal_with(sale_response_model, code=201)  # Serialización automática de la venta creada
-    def post(self):
+    def post(self, payload):
         """Crear una nueva venta"""
-        data = request.get_json()
-
     # Convertir el status a enum
         try:
-            status_enum = map_status_to_enum(data['status'])
+            status_enum = map_status_to_enum(payload.status)
         except ValueError as e:
             return {'message': str(e)}, 400
     # Crear la venta
-        sale = SaleService.create_sale(data['date'], data['total'], status_enum)
-    
-     # Mapeo de status para la respuesta
-        sale.status = map_enum_to_status(sale.status)
+        sale = SaleService.create_sale(payload.date, payload.total, status_enum)
 
         return sale, 201 
 
+def sales_report_etag():
+    """ETag de los informes: contadores de cambios de las ventas y sus detalles más los parámetros de la solicitud."""
+    return make_etag('SalesReports', *change_tracker.versions('Ventas', 'Detalle_Venta'), request.query_string)
+
+@sale_ns.route('/lookup')
+class SaleLookupResource(Resource):
+    @sale_ns.expect(sale_lookup_model, sale_lookup_parser)
+    @sale_ns.response(200, 'Success', sale_lookup_response_model)
+    @sale_ns.response(400, 'Lista de IDs no válida')
+    @validate_body(LookupSchema)
+    def post(self, payload):
+        """Obtener varias ventas por sus IDs, en el orden pedido (las que no existen se marcan con `found: false`)
+
+        Las ventas se leen con una consulta IN por bloque de IDs. Equivale a `GET /sales?ids=...` para
+        listas que no caben en la URL.
+        """
+        args = sale_lookup_parser.parse_args()
+        try:
+            field_names = parse_fields(args['fields'], sale_response_model)
+            ids = check_ids(payload.ids)
+        except ValueError as e:
+            sale_ns.abort(400, str(e))
+        return lookup_response(ids, SaleService.get_sales_by_ids(ids), sale_serializer, field_names), 200
+
+@sale_ns.route('/reports')
+class SaleReportResource(Resource):
+    @sale_ns.expect(sale_report_parser)
+    @sale_ns.response(400, 'Parámetros no válidos')
+    @sale_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @conditional(sales_report_etag)
+    @sale_ns.marshal_list_with(sale_report_model, skip_none=True)
+    def get(self):
+        """Ventas e importes por día, mes o año, opcionalmente por estado y por tienda (desde los resúmenes diarios)"""
+        args = sale_report_parser.parse_args()
+        group_by = [part.strip() for part in (args['group_by'] or '').split(',') if part.strip()]
+        try:
+            return SalesReportService.get_report(
+                args['granularity'],
+                date_from=args['date_from'],
+                date_to=args['date_to'],
+                status=args['status'],
+                shop_id=args['shop_id'],
+                group_by=group_by)
+        except ValueError as e:
+            sale_ns.abort(400, str(e))
+
+@sale_ns.route('/checkout')
+class SaleCheckoutResource(Resource):
+    @sale_ns.expect(checkout_model)
+    @validate_body(CheckoutSchema)
+    @sale_ns.response(400, 'Carrito no válido')
+    @sale_ns.response(409, 'Existencias insuficientes')
+    @sale_ns.marshal_with(checkout_response_model, code=201)
+    def post(self, payload):
+        """Registrar una compra completa (venta, detalles y descuento de existencias) en una sola transacción"""
+        try:
+            status_enum = map_status_to_enum(payload.status)
+        except ValueError as e:
+            sale_ns.abort(400, str(e))
+
+        try:
+            sale = SaleService.checkout(payload.date, [item.model_dump() for item in payload.items], status_enum)
+        except InsufficientStockError as e:
+            sale_ns.abort(409, str(e))
+        except ValueError as e:
+            sale_ns.abort(400, str(e))
+        return sale, 201
+
 @sale_ns.route('/<int:sale_id>')
 @sale_ns.param('sale_id', 'El ID de la Venta')
 class SaleResource(Resource):
-    @sale_ns.expect(sale_model, validate=True)
+    @sale_ns.doc('get_sale_by_id')
+    @sale_ns.expect(sale_expand_parser)
+    @sale_ns.response(200, 'Success', sale_expand_models[frozenset(SALE_EXPANSIONS)])
+    @sale_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @sale_ns.response(404, 'Venta no encontrada')
+    @conditional(sale_etag)
+    def get(self, sale_id):
+        """Obtener una venta por su ID; con `expand=details.product`, también sus detalles y sus productos"""
+        args = sale_expand_parser.parse_args()
+        try:
+            expand = parse_expand(args['expand'], SALE_EXPANSIONS)
+        except ValueError as e:
+            sale_ns.abort(400, str(e))
+        sale = SaleService.get_sale_by_id(sale_id, expand)
+        if not sale:
+            return {'message': 'Sale not found'}, 404
+        return sale_ns.marshal(sale, sale_expand_models[expand]), 200
+
+    @sale_ns.expect(sale_model)
+    @validate_body(SaleSchema)
     @sale_ns.marshal_with(sale_response_model)
-    def put(self, sale_id):
+    def put(self, sale_id, payload):
         """Actualizar una venta por su ID"""
-        data = request.get_json()  # Obtiene los nuevos datos para la venta
-
  # Convertir el status a enum
         try:
-            status_enum = map_status_to_enum(data['status'])
+            status_enum = map_status_to_enum(payload.status)
         except ValueError as e:
             return {'message': str(e)}, 400
 
-        sale = SaleService.update_sale(sale_id, data['date'], data['total'], status_enum)  # Llama al servicio para actualizar
-        # Mapeo de status para la respuesta
-        sale.status = map_enum_to_status(sale.status)
+        sale = SaleService.update_sale(sale_id, payload.date, payload.total, status_enum)  # Llama al servicio para actualizar
         return sale, 200  # Retorna la venta actualizada con un código de estado 200 (OK)
 
     
@@ -1,19 +1,23 @@
-from flask import request, jsonify
-from flask_restx import Namespace, Resource, fields
+from flask import current_app, request, jsonify
+from flask_restx import Namespace, Resource, fields, inputs
+from app import change_tracker
 from app.services.shop_service import ShopService
+from app.services.shop_summary_service import ShopSummaryService
+from app.utils.pagination import next_link_headers, page_limit, pagination_parser
+from app.utils.streaming import JSON_MIMETYPE, NDJSON_MIMETYPE, stream_response, wants_stream
+from app.utils.etag import conditional, make_etag
+from app.utils.lookup import check_ids, lookup_model, lookup_response, parse_ids
+from app.utils.projection import parse_expand, parse_fields
+from app.utils.serializer import RowSerializer
+from app.utils.validation import schema_model, validate_body
+from app.schemas.lookup import LookupSchema
+from app.schemas.shop import ShopSchema
 
 # Crear un espacio de nombres (namespace) para Shop (Tiendas)
 shop_ns = Namespace('Shops', description='Operaciones relacionadas con las tiendas')
 
-# Definir el modelo de entrada de shop para la documentación de Swagger
-shop_model = shop_ns.model('Shop', {
-    'name': fields.String(required=True, description='Nombre de la Tienda'),
-    'logo': fields.String(required=True, description='Logo de la Tienda'),
-    'description': fields.String(required=True, description='Descripción de la Tienda'),
-    'phone': fields.String(required=True, description='Teléfono de la Tienda'),
-    'address': fields.String(required=True, description='Dirección de la Tienda'),
-    'email': fields.String(required=True, description='Correo Electrónico de la Tienda')
-})
+# Modelo de entrada de shop para la documentación de Swagger, generado a partir de su esquema de pydantic
+shop_model = schema_model(shop_ns, 'Shop', ShopSchema)
 
 # Definir el modelo de salida de shop para la documentación de Swagger
 shop_response_model = shop_ns.model('ShopResponse', {
@@ -31,48 +35,176 @@ product_response_model = shop_ns.model('ProductResponse', {
     'name': fields.String(description='Nombre del Producto')
 })
 
+# Relaciones que puede incluir la consulta de una tienda (`?expand=`)
+SHOP_EXPANSIONS = ('products',)
+
+# Modelo de salida de cada combinación de relaciones incluidas (la tienda sola no carga sus productos)
+shop_expand_models = {
+    frozenset(): shop_response_model,
+    frozenset({'products'}): shop_ns.inherit('ShopWithProducts', shop_response_model, {
+        'products': fields.List(fields.Nested(shop_ns.model('ShopProduct', {
+            'id': fields.Integer(description='ID del Producto'),
+            'name': fields.String(description='Nombre del Producto'),
+            'image': fields.String(description='Imagen del Producto'),
+            'description': fields.String(description='Descripción del Producto'),
+            'price': fields.Integer(description='Precio del Producto'),
+            'quantity': fields.Integer(description='Cantidad en existencia del Producto'),
+        })), attribute='Products', description='Productos de la Tienda'),
+    }),
+}
+
+# Parámetros de la consulta de una tienda
+shop_expand_parser = shop_ns.parser()
+shop_expand_parser.add_argument('expand', type=str, location='args', help='Relaciones a incluir: products')
+
+# Modelo de salida del resumen del panel de una tienda
+shop_summary_model = shop_ns.model('ShopSummary', {
+    'shop_id': fields.Integer(description='ID de la Tienda'),
+    'products': fields.Integer(description='Número de productos'),
+    'stock_units': fields.Integer(description='Unidades en existencia'),
+    'inventory_value': fields.Integer(description='Valor del inventario (precio por existencias)'),
+    'units_sold': fields.Integer(description='Unidades vendidas'),
+    'revenue': fields.Integer(description='Importe de lo vendido'),
+})
+
+# Serializador compilado del listado de tiendas
+shop_serializer = RowSerializer(shop_response_model)
+
+# Parámetros de paginación y filtros del listado de tiendas
+shop_list_parser = pagination_parser.copy()
+shop_list_parser.add_argument('name', type=str, location='args', help='Prefijo del nombre de la Tienda')
+shop_list_parser.add_argument('stream', type=inputs.boolean, location='args', help='Transmitir el listado completo sin paginar')
+shop_list_parser.add_argument('fields', type=str, location='args', help='Campos a devolver, separados por comas (p. ej. id,name,logo)')
+shop_list_parser.add_argument('ids', type=str, location='args', help='Buscar estos IDs, separados por comas, en lugar de paginar (ver POST /shops/lookup)')
+
+# Búsqueda por lista de IDs: parámetros y modelos de entrada y salida
+shop_lookup_parser = shop_ns.parser()
+shop_lookup_parser.add_argument('fields', type=str, location='args', help='Campos a devolver, separados por comas (p. ej. id,name,logo)')
+shop_lookup_model = schema_model(shop_ns, 'ShopLookupRequest', LookupSchema)
+shop_lookup_response_model = lookup_model(shop_ns, 'Shop', shop_response_model)
+
+def shops_etag():
+    """ETag del listado de tiendas: contador de cambios de la tabla más los parámetros de la solicitud."""
+    return make_etag('Shops', *change_tracker.versions('Shops'), request.query_string, request.headers.get('Accept', ''))
+
+def shop_etag(shop_id):
+    """ETag de una tienda: su ID y su versión de fila (leída a través de la caché de entidades), más el
+    contador de cambios de sus productos si se incluyen."""
+    try:
+        expand = parse_expand(request.args.get('expand'), SHOP_EXPANSIONS)
+    except ValueError:
+        return None
+    shop = ShopService.get_shop_by_id(shop_id)
+    if not shop:
+        return None
+    if 'products' in expand:
+        return make_etag('Shops', shop.id, shop.version, 'products', *change_tracker.versions(f'Products:shop:{shop_id}', 'Products:bulk'))
+    return make_etag('Shops', shop.id, shop.version)
+
 # Controlador para manejar las operaciones CRUD de shop
 @shop_ns.route('/')
 class ShopListResource(Resource):
     @shop_ns.doc('get_shops')
-    @shop_ns.marshal_list_with(shop_response_model)  # Decorador para definir el formato de la respuesta
+    @shop_ns.expect(shop_list_parser)
+    @shop_ns.produces([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    @shop_ns.response(200, 'Success', [shop_response_model])
+    @shop_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @conditional(shops_etag)
     def get(self):
-        """Obtener todas las Tiendas"""
-        shops = ShopService.get_all_shops()
-        return shops, 200
+        """Obtener las Tiendas paginadas por cursor (la siguiente página se indica en la cabecera Link)
+
+        Con `?stream=1` o `Accept: application/x-ndjson` se transmite el listado completo por bloques.
+        """
+        args = shop_list_parser.parse_args()
+        try:
+            # Con `?fields=` la consulta lee solo esas columnas y la respuesta contiene solo esos campos
+            field_names = parse_fields(args['fields'], shop_response_model)
+        except ValueError as e:
+            shop_ns.abort(400, str(e))
+
+        # Con `?ids=` se devuelven esas Tiendas, en el orden pedido, en lugar de una página
+        if args['ids'] is not None:
+            try:
+                ids = parse_ids(args['ids'])
+            except ValueError as e:
+                shop_ns.abort(400, str(e))
+            return lookup_response(ids, ShopService.get_shops_by_ids(ids), shop_serializer, field_names), 200
+
+        columns = shop_serializer.columns(field_names)
+
+        # Modo streaming: recorrer la tabla con un cursor del servidor sin materializar la lista
+        if wants_stream(args['stream']):
+            shops = ShopService.iter_shops(current_app.config['STREAM_CHUNK_SIZE'], name=args['name'], fields=columns)
+            return stream_response(shops, shop_serializer.dumper(field_names))
+
+        try:
+            page = ShopService.get_all_shops(page_limit(args['limit']), args['after'], name=args['name'], fields=columns)
+        except ValueError as e:
+            shop_ns.abort(400, str(e))
+        return shop_serializer.dump(page.items, field_names), 200, next_link_headers(page.next_cursor)
 
     @shop_ns.doc('create_shop')
-    @shop_ns.expect(shop_model, validate=True)  # Decorador para esperar el modelo en la solicitud
+    @shop_ns.expect(shop_model)  # Decorador para esperar el modelo en la solicitud
+    @validate_body(ShopSchema)  # Validar y convertir el cuerpo de la solicitud
     @shop_ns.marshal_with(shop_response_model, code=201)  # Decorador para definir el formato de la respuesta
-    def post(self):
+    def post(self, payload):
         """Crear una nueva Tienda"""
-        data = request.get_json()
         try:
-            shop = ShopService.create_shop(data['name'], data['logo'], data['description'], data['phone'], data['address'], data['email'])
+            shop = ShopService.create_shop(payload.name, payload.logo, payload.description, payload.phone, payload.address, payload.email)
             return shop, 201
         except ValueError as e:
             return {'message': str(e)}, 400
 
+@shop_ns.route('/lookup')
+class ShopLookupResource(Resource):
+    @shop_ns.doc('lookup_shops')
+    @shop_ns.expect(shop_lookup_model, shop_lookup_parser)
+    @shop_ns.response(200, 'Success', shop_lookup_response_model)
+    @shop_ns.response(400, 'Lista de IDs no válida')
+    @validate_body(LookupSchema)
+    def post(self, payload):
+        """Obtener varias Tiendas por sus IDs, en el orden pedido (las que no existen se marcan con `found: false`)
+
+        Las Tiendas en la caché de entidades se sirven desde ella y el resto se leen con una consulta IN
+        por bloque de IDs. Equivale a `GET /shops?ids=...` para listas que no caben en la URL.
+        """
+        args = shop_lookup_parser.parse_args()
+        try:
+            field_names = parse_fields(args['fields'], shop_response_model)
+            ids = check_ids(payload.ids)
+        except ValueError as e:
+            shop_ns.abort(400, str(e))
+        return lookup_response(ids, ShopService.get_shops_by_ids(ids), shop_serializer, field_names), 200
+
+
 @shop_ns.route('/<int:shop_id>')
 @shop_ns.param('shop_id', 'El ID de la Tienda')
 class ShopResource(Resource):
     @shop_ns.doc('get_shop_by_id')
-    @shop_ns.marshal_with(shop_response_model)
+    @shop_ns.expect(shop_expand_parser)
+    @shop_ns.response(200, 'Success', shop_expand_models[frozenset(SHOP_EXPANSIONS)])
+    @shop_ns.response(304, 'Sin cambios respecto al ETag enviado en If-None-Match')
+    @conditional(shop_etag)
     def get(self, shop_id):
-        """Obtener una Tienda por su ID"""
-        shop = ShopService.get_shop_by_id(shop_id)
+        """Obtener una Tienda por su ID; con `expand=products`, también sus productos"""
+        args = shop_expand_parser.parse_args()
+        try:
+            expand = parse_expand(args['expand'], SHOP_EXPANSIONS)
+        except ValueError as e:
+            shop_ns.abort(400, str(e))
+        shop = ShopService.get_shop_by_id(shop_id, expand)
         if not shop:
             return {'message': 'Shop not found'}, 404
-        return shop, 200
+        return shop_ns.marshal(shop, shop_expand_models[expand]), 200
 
     @shop_ns.doc('update_shop')
-    @shop_ns.expect(shop_model, validate=True)  # Esperar los nuevos datos de la tienda
+    @shop_ns.expect(shop_model)  # Esperar los nuevos datos de la tienda
+    @validate_body(ShopSchema)
     @shop_ns.marshal_with(shop_response_model)
-    def put(self, shop_id):
+    def put(self, shop_id, payload):
         """Actualizar una tienda por su ID"""
-        data = request.get_json()
         try:
-            shop = ShopService.update_shop(shop_id, data['name'])
+            shop = ShopService.update_shop(shop_id, payload.name)
             return shop, 200
         except ValueError as e:
             return {'message': str(e)}, 404
@@ -87,3 +219,15 @@ class ShopResource(Resource):
             return {'message': str(e)}, 404
 
 
+@shop_ns.route('/<int:shop_id>/summary')
+@shop_ns.param('shop_id', 'El ID de la Tienda')
+class ShopSummaryResource(Resource):
+    @shop_ns.doc('get_shop_summary')
+    @shop_ns.response(404, 'Tienda no encontrada')
+    @shop_ns.marshal_with(shop_summary_model)
+    def get(self, shop_id):
+        """Obtener el resumen del panel de una Tienda: productos, existencias, valor del inventario y ventas"""
+        try:
+            return ShopSummaryService.get_summary(shop_id), 200
+        except ValueError as e:
+            shop_ns.abort(404, str(e))
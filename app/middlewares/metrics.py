@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Límites superiores de los intervalos de los histogramas
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class _Shard:
+    """Contadores de un hilo. Solo los modifica su hilo; la exportación los lee y los suma."""
+
+    def __init__(self):
+        self.requests = {}  # (método, ruta, estado) -> solicitudes
+        self.latency = {}  # (método, ruta) -> [recuentos por intervalo..., suma, total]
+        self.statements = {}  # (método, ruta) -> histograma de sentencias SQL por solicitud
+        self.sql_time = {}  # (método, ruta) -> histograma de segundos de SQL por solicitud
+        self.in_flight = 0
+        self.sql_statements_total = 0
+        self.sql_seconds_total = 0.0
+
+
+def _observe(histograms, key, buckets, value):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = [0] * (len(buckets) + 3)
+    histogram[bisect_left(buckets, value)] += 1
+    histogram[-2] += value
+    histogram[-1] += 1
+
+
+class Metrics:
+    """Métricas de la API en formato de texto de Prometheus, expuestas en `/metrics`.
+
+    Registra por ruta y método la latencia, las respuestas por código de estado, las solicitudes en
+    curso y el número y tiempo de las sentencias SQL de cada solicitud (medidos con los eventos
+    `before_cursor_execute`/`after_cursor_execute` de SQLAlchemy). Cada hilo acumula en sus propios
+    contadores, sin bloqueos en el camino de la solicitud; la exportación suma los de todos los hilos.
+
+    Los contadores de los hilos que ya terminaron (el servidor de desarrollo crea uno por solicitud) se
+    acumulan en cada exportación en un total retenido y se descartan, así que la memoria y el coste de
+    la exportación dependen de los hilos vivos y no del número de solicitudes atendidas.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = {}  # ID del hilo -> contadores del hilo
+        self._retained = _Shard()  # Contadores acumulados de los hilos que ya terminaron
+        self._lock = threading.Lock()  # Protege el registro de los hilos y el total retenido (no las solicitudes)
+
+    def init_app(self, app):
+        """Registrar los hooks de la solicitud, los eventos de SQLAlchemy y el endpoint `/metrics`.
+
+        Args:
+            app (Flask): Aplicación.
+        """
+        if not app.config['METRICS_ENABLED']:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self._export)
+
+        # Los eventos se registran en la clase Engine para cubrir todos los motores de la aplicación
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            ident = threading.get_ident()
+            with self._lock:
+                # El ID de un hilo terminado puede reutilizarse: sus contadores se conservan en el total retenido
+                previous = self._shards.get(ident)
+                if previous is not None:
+                    _merge(self._retained, previous)
+                self._shards[ident] = shard
+        return shard
+
+    # Hooks de la solicitud
+
+    def _before_request(self):
+        self._shard().in_flight += 1
+        self._local.sql = [0, 0.0]  # Sentencias y segundos de SQL de la solicitud en curso
+        g.metrics_started = time.perf_counter()
+
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        statements, sql_seconds = self._local.sql
+        self._local.sql = None
+
+        shard = self._shard()
+        shard.in_flight -= 1
+        rule = request.url_rule
+        key = (request.method, rule.rule if rule is not None else 'unmatched')
+        status = g.pop('metrics_status', 500)
+        shard.requests[key + (status,)] = shard.requests.get(key + (status,), 0) + 1
+        _observe(shard.latency, key, LATENCY_BUCKETS, elapsed)
+        _observe(shard.statements, key, STATEMENT_BUCKETS, statements)
+        _observe(shard.sql_time, key, LATENCY_BUCKETS, sql_seconds)
+
+    # Eventos de SQLAlchemy
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('metrics_query_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        shard = self._shard()
+        shard.sql_statements_total += 1
+        shard.sql_seconds_total += elapsed
+        current = getattr(self._local, 'sql', None)
+        if current is not None:
+            current[0] += 1
+            current[1] += elapsed
+
+    # Exportación
+
+    def collect(self):
+        """Sumar los contadores de todos los hilos, pasando al total retenido los de los hilos terminados.
+
+        Returns:
+            dict: Contadores agregados, con las mismas claves que los de cada hilo.
+        """
+        with self._lock:
+            # Hilos vivos leídos con el bloqueo tomado: un hilo que ya registró su contador (quizá con el ID
+            # de uno terminado) figura como vivo y su contador no se pasa al total retenido
+            alive = {thread.ident for thread in threading.enumerate()}
+            for ident in [ident for ident in self._shards if ident not in alive]:
+                _merge(self._retained, self._shards.pop(ident))
+            total = _Shard()
+            _merge(total, self._retained)
+            shards = list(self._shards.values())
+        for shard in shards:
+            _merge(total, shard)
+        return vars(total)
+
+    def render(self):
+        """Texto de las métricas en el formato de exposición de Prometheus."""
+        data = self.collect()
+        lines = []
+
+        lines.append('# HELP http_requests_total Solicitudes atendidas por método, ruta y código de estado.')
+        lines.append('# TYPE http_requests_total counter')
+        for (method, route, status), value in sorted(data['requests'].items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {value}')
+
+        lines.append('# HELP http_requests_in_flight Solicitudes en curso.')
+        lines.append('# TYPE http_requests_in_flight gauge')
+        lines.append(f'http_requests_in_flight {data["in_flight"]}')
+
+        _histogram(lines, 'http_request_duration_seconds', 'Latencia de las solicitudes.', LATENCY_BUCKETS, data['latency'])
+        _histogram(lines, 'db_statements_per_request', 'Sentencias SQL ejecutadas por solicitud.', STATEMENT_BUCKETS, data['statements'])
+        _histogram(lines, 'db_seconds_per_request', 'Tiempo de SQL por solicitud.', LATENCY_BUCKETS, data['sql_time'])
+
+        lines.append('# HELP db_statements_total Sentencias SQL ejecutadas (también fuera de las solicitudes).')
+        lines.append('# TYPE db_statements_total counter')
+        lines.append(f'db_statements_total {data["sql_statements_total"]}')
+        lines.append('# HELP db_statement_seconds_total Tiempo total de las sentencias SQL.')
+        lines.append('# TYPE db_statement_seconds_total counter')
+        lines.append(f'db_statement_seconds_total {data["sql_seconds_total"]}')
+        return '\n'.join(lines) + '\n'
+
+    def _export(self):
+        return Response(self.render(), content_type=CONTENT_TYPE)
+
+
+def _merge(total, shard):
+    """Sumar los contadores de un hilo a un total."""
+    # copy() es atómico respecto a las escrituras del hilo dueño de los contadores
+    for key, value in shard.requests.copy().items():
+        total.requests[key] = total.requests.get(key, 0) + value
+    for name in ('latency', 'statements', 'sql_time'):
+        merged = getattr(total, name)
+        for key, histogram in getattr(shard, name).copy().items():
+            current = merged.setdefault(key, [0] * len(histogram))
+            for i, value in enumerate(list(histogram)):
+                current[i] += value
+    total.in_flight += shard.in_flight
+    total.sql_statements_total += shard.sql_statements_total
+    total.sql_seconds_total += shard.sql_seconds_total
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_started'] = time.perf_counter()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram(lines, name, help_text, buckets, histograms):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for (method, route), histogram in sorted(histograms.items()):
+        labels = f'method="{method}",route="{_escape(route)}"'
+        cumulative = 0
+        for bound, count in zip(buckets, histogram):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram[-3] + cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram[-2]}')
+        lines.append(f'{name}_count{{{labels}}} {histogram[-1]}')
@@ -0,0 +1,299 @@
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+
+from flask import g, request
+
+from app.utils.auth import is_admin_request
+
+# Modos de perfilado que se pueden pedir en la cabecera
+MODES = ('cprofile', 'sample')
+
+# Categorías del desglose del tiempo, en el orden en que se comprueban desde la función más interna
+CATEGORIES = ('db', 'orm', 'sql', 'serialization', 'framework', 'app', 'other')
+_DB_DRIVERS = ('sqlite3', 'MySQLdb', '_mysql', 'pymysql', 'psycopg2')
+_DB_CALLS = ('do_execute', 'do_executemany', 'do_execute_no_params', 'fetchall', 'fetchmany', 'fetchone')
+_SERIALIZATION = ('flask_restx.marshalling', 'flask_restx.fields', 'app.utils.serializer', 'app.utils.streaming', 'json')
+_FRAMEWORK = ('flask', 'werkzeug', 'flask_restx', 'flask_sqlalchemy', 'flask_jwt_extended')
+
+
+class Profiler:
+    """Perfilado bajo demanda de solicitudes individuales.
+
+    Una solicitud se perfila si trae la cabecera `X-Profile` (con el token de administración) o, con
+    probabilidad `PROFILE_SAMPLE_RATE`, al azar. Con `X-Profile: cprofile` se ejecuta bajo `cProfile`
+    y se guarda un archivo `.pstats`; en ambos modos un hilo muestrea la pila de la solicitud cada
+    `PROFILE_SAMPLE_INTERVAL_MS` y guarda las pilas colapsadas (`.collapsed`, el formato de entrada de
+    flamegraph.pl y speedscope). El modo `sample`, el de las solicitudes elegidas al azar, solo tiene el
+    coste del muestreo.
+
+    Cada perfil incluye un desglose aproximado del tiempo entre base de datos (`db`), hidratación del ORM
+    (`orm`), SQLAlchemy Core (`sql`), serialización, framework, código de la aplicación y el resto
+    (biblioteca estándar y funciones nativas no clasificadas). Los perfiles se
+    guardan en `PROFILE_DIR`, compartido por todos los procesos, hasta un máximo de `PROFILE_MAX_STORED`.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self._sample_rate = 0.0
+        self._interval = 0.005
+        self._max_stored = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Registrar los hooks de la solicitud que inician y terminan el perfilado.
+
+        Args:
+            app (Flask): Aplicación.
+        """
+        self._max_stored = app.config['PROFILE_MAX_STORED']
+        if not self._max_stored:
+            return
+        self.directory = app.config['PROFILE_DIR'] or os.path.join(app.instance_path, 'profiles')
+        self._sample_rate = app.config['PROFILE_SAMPLE_RATE']
+        self._interval = app.config['PROFILE_SAMPLE_INTERVAL_MS'] / 1000
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    # Hooks de la solicitud
+
+    def _before_request(self):
+        mode = self._requested_mode()
+        if mode is None:
+            return
+        profile = None
+        if mode == 'cprofile':
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Ya hay otro perfilador activo en el hilo: se sigue solo con el muestreo
+                profile, mode = None, 'sample'
+        g.profile = {
+            'id': uuid.uuid4().hex[:16],
+            'mode': mode,
+            'profile': profile,
+            'sampler': _Sampler(threading.get_ident(), self._interval),
+            'started': time.perf_counter(),
+        }
+
+    def _requested_mode(self):
+        header = request.headers.get('X-Profile')
+        if header is not None:
+            if not is_admin_request():
+                return None
+            return header.lower() if header.lower() in MODES else 'cprofile'
+        if self._sample_rate and random.random() < self._sample_rate:
+            return 'sample'
+        return None
+
+    def _after_request(self, response):
+        state = g.get('profile')
+        if state is not None:
+            state['status'] = response.status_code
+            response.headers['X-Profile-Id'] = state['id']
+        return response
+
+    def _teardown_request(self, exc):
+        state = g.pop('profile', None)
+        if state is None:
+            return
+        duration = time.perf_counter() - state['started']
+        if state['profile'] is not None:
+            state['profile'].disable()
+        stacks = state['sampler'].stop()
+        try:
+            self._save(state, duration, stacks)
+        except OSError:
+            pass  # Un perfil que no se puede guardar no debe afectar a la solicitud
+
+    # Almacenamiento
+
+    def _save(self, state, duration, stacks):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, state['id'])
+        files = ['collapsed']
+        breakdown = _breakdown_from_stacks(stacks)
+
+        with open(base + '.collapsed', 'w') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f'{stack} {count}\n')
+        if state['profile'] is not None:
+            state['profile'].dump_stats(base + '.pstats')
+            files.append('pstats')
+            # Con cProfile el desglose sale del tiempo propio de cada función, más preciso que el muestreo
+            breakdown = _breakdown_from_pstats(pstats.Stats(state['profile']))
+
+        meta = {
+            'id': state['id'],
+            'created_at': time.time(),
+            'mode': state['mode'],
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'route': request.url_rule.rule if request.url_rule else None,
+            'status': state.get('status', 500),
+            'duration_ms': round(duration * 1000, 3),
+            'samples': sum(stacks.values()),
+            'breakdown': breakdown,
+            'files': files,
+        }
+        with open(base + '.json', 'w') as f:
+            json.dump(meta, f)
+        self._enforce_cap()
+
+    def _enforce_cap(self):
+        """Borrar los perfiles más antiguos por encima de `PROFILE_MAX_STORED`."""
+        with self._lock:
+            metas = sorted(glob.glob(os.path.join(self.directory, '*.json')), key=_mtime)
+            for path in metas[:max(0, len(metas) - self._max_stored)]:
+                self._remove(os.path.basename(path)[:-len('.json')])
+
+    def _remove(self, profile_id):
+        for extension in ('.json', '.pstats', '.collapsed'):
+            try:
+                os.remove(os.path.join(self.directory, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+    def list(self):
+        """Metadatos de los perfiles guardados, del más reciente al más antiguo."""
+        if not self.directory:
+            return []
+        profiles = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.json')), key=_mtime, reverse=True):
+            try:
+                with open(path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # Perfil borrado o a medio escribir
+        return profiles
+
+    def get(self, profile_id):
+        """Metadatos de un perfil, o None si no existe."""
+        if not self.directory or not _valid_id(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def path(self, profile_id, kind):
+        """Ruta del archivo `pstats` o `collapsed` de un perfil, o None si no existe."""
+        if not self.directory or not _valid_id(profile_id) or kind not in ('pstats', 'collapsed'):
+            return None
+        path = os.path.join(self.directory, f'{profile_id}.{kind}')
+        return path if os.path.exists(path) else None
+
+    def report(self, profile_id, sort='cumulative', limit=40):
+        """Informe de texto de pstats de un perfil de cProfile, o None si no tiene `.pstats`."""
+        path = self.path(profile_id, 'pstats')
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def clear(self):
+        """Borrar todos los perfiles guardados."""
+        for meta in self.list():
+            self._remove(meta['id'])
+
+
+class _Sampler:
+    """Hilo que muestrea la pila de otro hilo a intervalos fijos y cuenta las pilas colapsadas."""
+
+    def __init__(self, thread_id, interval):
+        self.stacks = {}
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{frame.f_globals.get("__name__", "?")}:{getattr(code, "co_qualname", code.co_name)}')
+                frame = frame.f_back
+            stack = ';'.join(reversed(names))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def _category(module, function):
+    """Categoría de una función a partir de su módulo y su nombre, o None si no es concluyente."""
+    if module.split('.')[0] in _DB_DRIVERS or any(driver in function for driver in _DB_DRIVERS):
+        return 'db'
+    if module.startswith('sqlalchemy.'):
+        if function.split('.')[-1] in _DB_CALLS:
+            return 'db'
+        return 'orm' if module.startswith('sqlalchemy.orm') else 'sql'
+    if module.startswith(_SERIALIZATION):
+        return 'serialization'
+    if module.startswith(_FRAMEWORK):
+        return 'framework'
+    if module.startswith('app.'):
+        return 'app'
+    return None
+
+
+def _breakdown(totals):
+    total = sum(totals.values()) or 1
+    return {category: round(100 * totals.get(category, 0) / total, 1) for category in CATEGORIES}
+
+
+def _breakdown_from_stacks(stacks):
+    """Porcentaje de muestras por categoría, según la función más interna con categoría concluyente."""
+    totals = {}
+    for stack, count in stacks.items():
+        category = 'other'
+        for frame in reversed(stack.split(';')):
+            module, _, function = frame.partition(':')
+            found = _category(module, function)
+            if found is not None:
+                category = found
+                break
+        totals[category] = totals.get(category, 0) + count
+    return _breakdown(totals)
+
+
+def _breakdown_from_pstats(stats):
+    """Porcentaje del tiempo propio (tottime) de las funciones por categoría."""
+    modules = {os.path.abspath(path): name for name, module in list(sys.modules.items())
+               for path in [getattr(module, '__file__', None)] if path}
+    totals = {}
+    for (filename, _, function), (_, _, tottime, _, _) in stats.stats.items():
+        module = modules.get(os.path.abspath(filename), '') if filename != '~' else ''
+        category = _category(module, function) or 'other'
+        totals[category] = totals.get(category, 0) + tottime
+    return _breakdown(totals)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def _valid_id(profile_id):
+    return len(profile_id) == 16 and all(c in '0123456789abcdef' for c in profile_id)
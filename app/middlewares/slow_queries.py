@@ -0,0 +1,216 @@
+import itertools
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Longitud máxima con la que se guardan la sentencia y sus parámetros
+MAX_STATEMENT_LENGTH = 4000
+MAX_PARAMETERS_LENGTH = 1000
+
+# Planes recientes por texto de sentencia, para no repetir el EXPLAIN de la misma consulta
+EXPLAIN_CACHE_SIZE = 256
+
+
+class SlowQueryLog:
+    """Registro de las sentencias SQL que superan un umbral de duración, con su plan de ejecución.
+
+    Cada muestra guarda la sentencia, sus parámetros, la duración, la ruta de la solicitud y el método
+    de servicio que la originó. El EXPLAIN se obtiene en un hilo aparte, con su propia conexión, a
+    partir de una cola acotada; el plan de una misma sentencia se reutiliza durante `SLOW_QUERY_EXPLAIN_TTL`.
+    Las muestras se guardan en un buffer circular y su ritmo está limitado (`SLOW_QUERY_RATE` por
+    segundo), de modo que una avalancha de consultas lentas no genera a su vez más carga.
+    """
+
+    def __init__(self):
+        self.threshold = None
+        self._samples = deque()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._rate = 0.0
+        self._tokens = 0.0
+        self._refilled = 0.0
+        self._explain = False
+        self._explain_ttl = 0
+        self._plans = OrderedDict()  # sentencia -> (momento, plan)
+        self._queue = None
+        self._worker = None
+        self.stats = {'recorded': 0, 'rate_limited': 0, 'explained': 0, 'explain_reused': 0, 'explain_skipped': 0, 'explain_failed': 0}
+
+    def init_app(self, app):
+        """Registrar los eventos de SQLAlchemy que miden cada sentencia.
+
+        Args:
+            app (Flask): Aplicación.
+        """
+        threshold = app.config['SLOW_QUERY_THRESHOLD_MS']
+        if not threshold:
+            return
+        self.threshold = threshold / 1000
+        self._samples = deque(maxlen=app.config['SLOW_QUERY_BUFFER_SIZE'])
+        self._rate = self._tokens = float(app.config['SLOW_QUERY_RATE'])
+        self._refilled = time.monotonic()
+        self._explain = app.config['SLOW_QUERY_EXPLAIN']
+        self._explain_ttl = app.config['SLOW_QUERY_EXPLAIN_TTL']
+        self._queue = queue.Queue(maxsize=app.config['SLOW_QUERY_EXPLAIN_QUEUE'])
+
+        # Los eventos se registran en la clase Engine para cubrir todos los motores de la aplicación
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def get_samples(self, limit=None, min_ms=None):
+        """Muestras registradas, de la más reciente a la más antigua.
+
+        Args:
+            limit (int): Número máximo de muestras a devolver.
+            min_ms (float): Devolver solo las muestras de al menos esta duración.
+        """
+        with self._lock:
+            samples = [dict(sample) for sample in reversed(self._samples)]
+        if min_ms is not None:
+            samples = [sample for sample in samples if sample['duration_ms'] >= min_ms]
+        return samples[:limit] if limit else samples
+
+    def get_stats(self):
+        """Contadores de muestras registradas, descartadas por el límite de ritmo y planes obtenidos."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['buffered'] = len(self._samples)
+        stats['threshold_ms'] = self.threshold * 1000 if self.threshold else None
+        return stats
+
+    def clear(self):
+        """Vaciar el buffer de muestras y los planes guardados."""
+        with self._lock:
+            self._samples.clear()
+            self._plans.clear()
+
+    # Eventos de SQLAlchemy
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('slow_query_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold:
+            return
+        self._record(conn.engine, statement, parameters, executemany, elapsed)
+
+    def _record(self, engine, statement, parameters, executemany, elapsed):
+        with self._lock:
+            if not self._take_token():
+                self.stats['rate_limited'] += 1
+                return
+            self.stats['recorded'] += 1
+
+        sample = {
+            'id': next(self._ids),
+            'recorded_at': time.time(),
+            'duration_ms': round(elapsed * 1000, 3),
+            'statement': statement[:MAX_STATEMENT_LENGTH],
+            'parameters': repr(parameters)[:MAX_PARAMETERS_LENGTH],
+            'executemany': executemany,
+            'endpoint': f'{request.method} {request.url_rule.rule}' if has_request_context() and request.url_rule else None,
+            'origin': _origin(),
+            'plan': None,
+        }
+        with self._lock:
+            self._samples.append(sample)
+
+        if self._explain and not executemany and statement.lstrip()[:6].upper() == 'SELECT':
+            self._request_plan(engine, statement, parameters, sample)
+
+    def _take_token(self):
+        """Cubo de fichas: `SLOW_QUERY_RATE` muestras por segundo, con ráfagas del mismo tamaño."""
+        now = time.monotonic()
+        self._tokens = min(self._rate, self._tokens + (now - self._refilled) * self._rate)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    # Planes de ejecución
+
+    def _request_plan(self, engine, statement, parameters, sample):
+        with self._lock:
+            cached = self._plans.get(statement)
+            if cached is not None and time.monotonic() - cached[0] < self._explain_ttl:
+                sample['plan'] = cached[1]
+                self.stats['explain_reused'] += 1
+                return
+        try:
+            self._queue.put_nowait((engine, statement, parameters, sample))
+        except queue.Full:
+            with self._lock:
+                self.stats['explain_skipped'] += 1
+            return
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._explain_worker, name='slow-query-explain', daemon=True)
+                    self._worker.start()
+
+    def _explain_worker(self):
+        while True:
+            engine, statement, parameters, sample = self._queue.get()
+            try:
+                plan = explain(engine, statement, parameters)
+            except Exception as e:
+                with self._lock:
+                    sample['plan'] = [f'EXPLAIN failed: {e}']
+                    self.stats['explain_failed'] += 1
+                continue
+            finally:
+                self._queue.task_done()
+            with self._lock:
+                sample['plan'] = plan
+                self.stats['explained'] += 1
+                self._plans[statement] = (time.monotonic(), plan)
+                self._plans.move_to_end(statement)
+                while len(self._plans) > EXPLAIN_CACHE_SIZE:
+                    self._plans.popitem(last=False)
+
+
+def explain(engine, statement, parameters):
+    """Obtener el plan de ejecución de una sentencia con su propia conexión, sin ejecutarla.
+
+    Returns:
+        list: Una línea de texto por fila del resultado del EXPLAIN.
+    """
+    prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    with engine.connect() as conn:
+        # El EXPLAIN no vuelve a pasar por el registro (la marca se retira antes de devolver la conexión al pool)
+        conn.info['slow_query_skip'] = True
+        try:
+            result = conn.exec_driver_sql(prefix + statement, parameters)
+            return [' | '.join('' if value is None else str(value) for value in row) for row in result]
+        finally:
+            conn.info.pop('slow_query_skip', None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not conn.info.get('slow_query_skip'):
+        conn.info['slow_query_started'] = time.perf_counter()
+
+
+def _origin():
+    """Método de la capa de servicios que originó la sentencia (o el primer marco de la aplicación)."""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('app.'):
+            name = f'{module}.{getattr(frame.f_code, "co_qualname", frame.f_code.co_name)}'
+            if module.startswith('app.services.'):
+                return name
+            if fallback is None and not module.startswith('app.middlewares.'):
+                fallback = name
+        frame = frame.f_back
+    return fallback
@@ -0,0 +1,31 @@
+from app import db
+
+
+class ChangeCounter(db.Model):
+    """
+    Modelo que representa un contador de cambios de un ámbito (una tabla o los productos de una tienda).
+
+    Cada escritura sobre el ámbito incrementa su contador en la misma transacción, lo que permite
+    calcular el ETag de un listado leyendo una sola fila en lugar de los registros del listado.
+
+    Atributos:
+        scope (str): Ámbito del contador, por ejemplo 'Products' o 'Products:shop:3' (clave primaria).
+        value (int): Número de cambios confirmados en el ámbito.
+    """
+
+    __tablename__ = 'ChangeCounters'  # Nombre de la tabla en la base de datos
+
+    # Definición de columnas de la tabla
+    scope = db.Column(db.String(64), primary_key=True)  # Ámbito del contador
+    value = db.Column(db.BigInteger, nullable=False, default=0)  # Número de cambios del ámbito
+
+    def __init__(self, scope, value=0):
+        """
+        Constructor de la clase ChangeCounter.
+
+        Args:
+            scope (str): Ámbito del contador.
+            value (int): Valor inicial del contador.
+        """
+        self.scope = scope
+        self.value = value
@@ -5,14 +5,22 @@ from app.models.product import Product
 # Tabla intermedia para la relación de muchos a muchos entre Ventas y Productos
 class SaleDetail(db.Model):
     __tablename__='Detalle_Venta'
+    __table_args__ = (
+        db.Index('ix_detalle_venta_sale_id', 'sale_id'),  # Detalles de una venta
+        db.Index('ix_detalle_venta_product_id', 'product_id'),  # Ventas de un producto (popularidad, informes)
+    )
 
     # Columnas no foráneas
     id = db.Column(db.Integer, primary_key=True)  # Clave primaria de la tabla
     qnt_prod_sale = db.Column(db.Integer, nullable=False)  # Cantidad vendida de un producto, no nulo
+    unit_price = db.Column(db.Integer, nullable=False)  # Precio del producto al registrar el detalle (importes de los resúmenes)
 
     # Columnas foráneas
     sale_id = db.Column(db.Integer, db.ForeignKey('Ventas.id'), nullable=False)  # Referencia a la tabla 'sale'
     product_id = db.Column(db.Integer, db.ForeignKey('Products.id'), nullable=False)  # Referencia a la tabla 'product'
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # Versión de la fila, se incrementa en cada actualización (ETag)
+
+    __mapper_args__ = {'version_id_col': version}  # El ORM incrementa la versión y la comprueba al actualizar
     
    
     # Relación muchos a muchos con productos usando la tabla intermedia 'sale_detail'
@@ -20,15 +28,17 @@ class SaleDetail(db.Model):
     sale = db.relationship('Sale', backref=db.backref('Detalle_Venta', lazy=True))  # Permite acceso inverso desde ventas a productos
 
 
-    def __init__(self, qnt_prod_sale, sale_id, product_id):
+    def __init__(self, qnt_prod_sale, sale_id, product_id, unit_price):
         """
         Constructor de la clase SaleDetail.
         
         Args:
             qnt_prod_sale (int): Cantidad de producto vendido.
+            unit_price (int): Precio del producto en el momento de la venta.
 
         """
         self.qnt_prod_sale = qnt_prod_sale
         self.sale_id = sale_id
         self.product_id = product_id
+        self.unit_price = unit_price
         
@@ -0,0 +1,31 @@
+from app import db
+
+
+class IdSequence(db.Model):
+    """
+    Modelo que representa la secuencia de IDs globales de una tabla repartida entre shards.
+
+    Con varios shards la base de datos no puede asignar los IDs de productos y detalles de venta sin
+    repetirlos entre shards: cada proceso reserva aquí bloques de IDs consecutivos.
+
+    Atributos:
+        name (str): Nombre de la tabla (clave primaria).
+        next_value (int): Primer ID aún no reservado.
+    """
+
+    __tablename__ = 'IdSequences'  # Nombre de la tabla en la base de datos
+
+    # Definición de columnas de la tabla
+    name = db.Column(db.String(64), primary_key=True)  # Tabla de la secuencia
+    next_value = db.Column(db.BigInteger, nullable=False)  # Primer ID libre
+
+    def __init__(self, name, next_value):
+        """
+        Constructor de la clase IdSequence.
+
+        Args:
+            name (str): Nombre de la tabla.
+            next_value (int): Primer ID libre.
+        """
+        self.name = name
+        self.next_value = next_value
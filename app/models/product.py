@@ -19,6 +19,13 @@ class Product(db.Model):
     """
     
     __tablename__ = 'Products'  # Especifica el nombre de la tabla en la base de datos
+    __table_args__ = (
+        db.UniqueConstraint('shop_id', 'name', name='uq_products_shop_name'),  # Clave natural usada por la importación masiva (y orden por nombre de una tienda)
+        db.Index('ix_products_shop_id_price', 'shop_id', 'price'),  # Productos de una tienda por precio, filtros de precio por tienda
+        db.Index('ix_products_shop_id_id', 'shop_id', 'id'),  # Productos de una tienda por ID (más recientes primero)
+        db.Index('ix_products_name', 'name'),  # Búsqueda exacta por nombre
+        db.Index('ft_products_name_description', 'name', 'description', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),  # Búsqueda nativa (SEARCH_BACKEND=fulltext)
+    )
 
     # Definición de columnas de la tabla
     id = db.Column(db.Integer, primary_key=True)  # Clave primaria de la tabla
@@ -28,6 +35,9 @@ class Product(db.Model):
     price = db.Column(db.Integer, nullable=False)  # Precio del producto, no nulo
     quantity = db.Column(db.Integer, nullable=False)  # Cantidad en existencia del producto, no nulo
     shop_id = db.Column(db.Integer, db.ForeignKey('Shops.id'), nullable=False)  # Clave foránea hacia la tabla 'Shop'
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # Versión de la fila, se incrementa en cada actualización (ETag)
+
+    __mapper_args__ = {'version_id_col': version}  # El ORM incrementa la versión y la comprueba al actualizar
 
     # Relación con el modelo Shops
     shop = db.relationship('Shop', backref='Products')  # Define la relación con el modelo Shops y permite acceso inverso desde Shops a Products
@@ -0,0 +1,45 @@
+from app import db
+
+
+class ProductSalesBucket(db.Model):
+    """
+    Modelo que representa las unidades vendidas de un producto en un intervalo de tiempo (bucket).
+
+    Alimenta el ranking de productos más vendidos (`Leaderboard`): cada alta, cambio o baja de un detalle
+    de venta suma sus unidades al bucket del momento en que se registra, en cada resolución (minutos para
+    la ventana de una hora, horas para las de un día y una semana). Los buckets que quedan fuera de todas
+    las ventanas se eliminan.
+
+    Atributos:
+        resolution (int): Duración del bucket en segundos (clave primaria junto con el resto de la clave).
+        bucket (int): Número del bucket: segundos desde la época divididos entre la resolución.
+        shop_id (int): ID de la tienda del producto.
+        product_id (int): ID del producto.
+        units (int): Unidades vendidas en el intervalo (las bajas y correcciones restan).
+    """
+
+    __tablename__ = 'ProductSalesBuckets'  # Nombre de la tabla en la base de datos
+
+    # Definición de columnas de la tabla
+    resolution = db.Column(db.Integer, primary_key=True)  # Duración del bucket en segundos
+    bucket = db.Column(db.BigInteger, primary_key=True)  # Intervalo: segundos desde la época // resolución
+    shop_id = db.Column(db.Integer, primary_key=True)  # Tienda del producto
+    product_id = db.Column(db.Integer, primary_key=True)  # Producto vendido
+    units = db.Column(db.BigInteger, nullable=False, default=0)  # Unidades vendidas en el intervalo
+
+    def __init__(self, resolution, bucket, shop_id, product_id, units=0):
+        """
+        Constructor de la clase ProductSalesBucket.
+
+        Args:
+            resolution (int): Duración del bucket en segundos.
+            bucket (int): Número del bucket.
+            shop_id (int): ID de la tienda del producto.
+            product_id (int): ID del producto.
+            units (int): Unidades vendidas en el intervalo.
+        """
+        self.resolution = resolution
+        self.bucket = bucket
+        self.shop_id = shop_id
+        self.product_id = product_id
+        self.units = units
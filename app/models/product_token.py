@@ -0,0 +1,40 @@
+from app import db
+
+
+class ProductToken(db.Model):
+    """
+    Modelo que representa una entrada del índice invertido de búsqueda de productos.
+
+    Cada fila asocia un término normalizado (en minúsculas y sin acentos) del nombre o la descripción
+    de un producto con ese producto. El índice se mantiene automáticamente en cada alta, modificación
+    y baja de productos.
+
+    Atributos:
+        token (str): Término normalizado (parte de la clave primaria).
+        product_id (int): Producto que contiene el término (parte de la clave primaria).
+        weight (int): Peso del término en el producto, mayor si aparece en el nombre.
+    """
+
+    __tablename__ = 'ProductTokens'  # Nombre de la tabla en la base de datos
+    __table_args__ = (
+        db.Index('ix_product_tokens_product_id', 'product_id'),  # Borrado de los términos de un producto
+        {'sqlite_with_rowid': False},  # En SQLite, tabla agrupada por la clave primaria como en InnoDB (índice cubriente)
+    )
+
+    # Definición de columnas de la tabla; la clave primaria (token, product_id) resuelve las búsquedas por prefijo
+    token = db.Column(db.String(64), primary_key=True)  # Término normalizado
+    product_id = db.Column(db.Integer, db.ForeignKey('Products.id', ondelete='CASCADE'), primary_key=True)  # Producto que lo contiene
+    weight = db.Column(db.SmallInteger, nullable=False)  # Peso del término en el producto
+
+    def __init__(self, token, product_id, weight):
+        """
+        Constructor de la clase ProductToken.
+
+        Args:
+            token (str): Término normalizado.
+            product_id (int): ID del producto.
+            weight (int): Peso del término en el producto.
+        """
+        self.token = token
+        self.product_id = product_id
+        self.weight = weight
@@ -23,12 +23,19 @@ class Sale(db.Model):
     """
     
     __tablename__ = 'Ventas'  # Nombre de la tabla en la base de datos
+    __table_args__ = (
+        db.Index('ix_ventas_date_id', 'date', 'id'),  # Paginación por (fecha, ID) y rangos de fechas
+        db.Index('ix_ventas_status_date', 'status', 'date'),  # Filtro por estado con rango de fechas
+    )
 
     # Definición de columnas de la tabla
     id = db.Column(db.Integer, primary_key=True)  # Clave primaria de la tabla
     date = db.Column(db.Date, nullable=False)  # Fecha de la venta, no puede ser nulo
     total = db.Column(db.Integer, nullable=False) # Valor total de la venta, no puede ser nulo (en caso de ser anulada el valor es cero)
     status = db.Column(db.Enum(StateEnum), nullable=False) # Estado de la Transacción con las opciones: en proceso, registrado, pagado
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # Versión de la fila, se incrementa en cada actualización (ETag)
+
+    __mapper_args__ = {'version_id_col': version}  # El ORM incrementa la versión y la comprueba al actualizar
 
     # Relación muchos a muchos con productos usando la tabla intermedia 'sale_detail'
     # product = db.relationship('Product', back_populates='Detalle_Venta')  # Permite acceso inverso desde ventas a productos
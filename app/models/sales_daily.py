@@ -0,0 +1,41 @@
+from app import db
+from app.models.sale import StateEnum
+
+
+class SalesDaily(db.Model):
+    """
+    Modelo que representa el resumen diario de las ventas de un estado (en la base global).
+
+    Se mantiene de forma incremental en la misma transacción que las escrituras de las ventas, de modo
+    que los informes leen una fila por día y estado en lugar de recorrer las ventas. Se reconstruye desde
+    cero con `flask sales rebuild-rollups`.
+
+    Atributos:
+        day (date): Fecha de las ventas (clave primaria junto con el estado).
+        status (enum): Estado de las ventas.
+        sales (int): Número de ventas.
+        revenue (int): Suma del total de las ventas.
+    """
+
+    __tablename__ = 'SalesDaily'  # Nombre de la tabla en la base de datos
+
+    # Definición de columnas de la tabla
+    day = db.Column(db.Date, primary_key=True)  # Fecha de las ventas
+    status = db.Column(db.Enum(StateEnum), primary_key=True)  # Estado de las ventas
+    sales = db.Column(db.Integer, nullable=False, default=0)  # Número de ventas
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)  # Suma del total de las ventas
+
+    def __init__(self, day, status, sales=0, revenue=0):
+        """
+        Constructor de la clase SalesDaily.
+
+        Args:
+            day (date): Fecha de las ventas.
+            status (enum): Estado de las ventas.
+            sales (int): Número de ventas.
+            revenue (int): Suma del total de las ventas.
+        """
+        self.day = day
+        self.status = status
+        self.sales = sales
+        self.revenue = revenue
@@ -26,6 +26,9 @@ class Shop(db.Model): # Se crea modelo de la tabla Tiendas
     phone = db.Column(db.String(12), unique=True, nullable=False)  # Teléfono de la Tienda, debe ser único y no nulo
     address = db.Column(db.String(100), unique=True, nullable=False)  # Dirección de la Tienda, debe ser único y no nulo
     email = db.Column(db.String(100), unique=True, nullable=False)  # Email de la Tienda, debe ser único y no nulo
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # Versión de la fila, se incrementa en cada actualización (ETag)
+
+    __mapper_args__ = {'version_id_col': version}  # El ORM incrementa la versión y la comprueba al actualizar
 
     def __init__(self, name, logo, description, phone, address, email):
 
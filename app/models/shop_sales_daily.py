@@ -0,0 +1,52 @@
+from app import db
+from app.models.sale import StateEnum
+
+
+class ShopSalesDaily(db.Model):
+    """
+    Modelo que representa el resumen diario de lo vendido por una tienda en las ventas de un estado.
+
+    Se obtiene de los detalles de venta a través de la tienda de su producto y se mantiene de forma
+    incremental, como `SalesDaily`. Los detalles no guardan el precio de venta: el importe se calcula con
+    el precio del producto al registrar cada cambio (y con el precio actual al reconstruir el resumen).
+
+    Atributos:
+        day (date): Fecha de las ventas (clave primaria junto con el estado y la tienda).
+        status (enum): Estado de las ventas.
+        shop_id (int): ID de la tienda.
+        lines (int): Número de detalles de venta.
+        units (int): Unidades vendidas.
+        revenue (int): Importe de las unidades vendidas.
+    """
+
+    __tablename__ = 'ShopSalesDaily'  # Nombre de la tabla en la base de datos
+    __table_args__ = (
+        db.Index('ix_shop_sales_daily_shop_day', 'shop_id', 'day'),  # Informes de una tienda por rango de fechas
+    )
+
+    # Definición de columnas de la tabla
+    day = db.Column(db.Date, primary_key=True)  # Fecha de las ventas
+    status = db.Column(db.Enum(StateEnum), primary_key=True)  # Estado de las ventas
+    shop_id = db.Column(db.Integer, primary_key=True)  # Tienda de los productos vendidos
+    lines = db.Column(db.Integer, nullable=False, default=0)  # Número de detalles de venta
+    units = db.Column(db.BigInteger, nullable=False, default=0)  # Unidades vendidas
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)  # Importe de las unidades vendidas
+
+    def __init__(self, day, status, shop_id, lines=0, units=0, revenue=0):
+        """
+        Constructor de la clase ShopSalesDaily.
+
+        Args:
+            day (date): Fecha de las ventas.
+            status (enum): Estado de las ventas.
+            shop_id (int): ID de la tienda.
+            lines (int): Número de detalles de venta.
+            units (int): Unidades vendidas.
+            revenue (int): Importe de las unidades vendidas.
+        """
+        self.day = day
+        self.status = status
+        self.shop_id = shop_id
+        self.lines = lines
+        self.units = units
+        self.revenue = revenue
@@ -0,0 +1,36 @@
+from app import db
+
+
+class ShopShard(db.Model):
+    """
+    Modelo que representa la fila del directorio de shards de una tienda (en la base global).
+
+    Fija el shard que contiene los productos y detalles de venta de la tienda. Las tiendas sin fila
+    usan el shard por defecto (`SHARD_MAP` o `shop_id % número de shards`). Mientras una tienda se
+    mueve de shard (`flask shards move`) sus escrituras se rechazan.
+
+    Atributos:
+        shop_id (int): ID de la tienda (clave primaria).
+        shard (str): Bind del shard que contiene sus datos, por ejemplo 'shard_1'.
+        moving (bool): Si la tienda se está moviendo a otro shard.
+    """
+
+    __tablename__ = 'ShopShards'  # Nombre de la tabla en la base de datos
+
+    # Definición de columnas de la tabla
+    shop_id = db.Column(db.Integer, primary_key=True)  # ID de la tienda
+    shard = db.Column(db.String(32), nullable=False)  # Bind del shard de la tienda
+    moving = db.Column(db.Boolean, nullable=False, default=False)  # Escrituras bloqueadas durante un movimiento
+
+    def __init__(self, shop_id, shard, moving=False):
+        """
+        Constructor de la clase ShopShard.
+
+        Args:
+            shop_id (int): ID de la tienda.
+            shard (str): Bind del shard de la tienda.
+            moving (bool): Si la tienda se está moviendo a otro shard.
+        """
+        self.shop_id = shop_id
+        self.shard = shard
+        self.moving = moving
@@ -0,0 +1,48 @@
+from app import db
+
+
+class ShopSummary(db.Model):
+    """
+    Modelo que representa el resumen del panel de una tienda (en la base global).
+
+    Se mantiene de forma incremental en la misma transacción que las escrituras de productos y detalles
+    de venta, así que el panel se sirve con una lectura por clave primaria. `flask shops
+    reconcile-summaries` lo compara con los datos de origen y corrige las diferencias.
+
+    Atributos:
+        shop_id (int): ID de la tienda (clave primaria).
+        products (int): Número de productos.
+        stock_units (int): Unidades en existencia de todos sus productos.
+        inventory_value (int): Valor del inventario (precio por existencias).
+        units_sold (int): Unidades vendidas de sus productos.
+        revenue (int): Importe de lo vendido, con el precio de cada producto al registrar la venta.
+    """
+
+    __tablename__ = 'ShopSummaries'  # Nombre de la tabla en la base de datos
+
+    # Definición de columnas de la tabla
+    shop_id = db.Column(db.Integer, primary_key=True)  # ID de la tienda
+    products = db.Column(db.Integer, nullable=False, default=0)  # Número de productos
+    stock_units = db.Column(db.BigInteger, nullable=False, default=0)  # Unidades en existencia
+    inventory_value = db.Column(db.BigInteger, nullable=False, default=0)  # Suma de precio por existencias
+    units_sold = db.Column(db.BigInteger, nullable=False, default=0)  # Unidades vendidas
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)  # Importe de lo vendido
+
+    def __init__(self, shop_id, products=0, stock_units=0, inventory_value=0, units_sold=0, revenue=0):
+        """
+        Constructor de la clase ShopSummary.
+
+        Args:
+            shop_id (int): ID de la tienda.
+            products (int): Número de productos.
+            stock_units (int): Unidades en existencia.
+            inventory_value (int): Valor del inventario.
+            units_sold (int): Unidades vendidas.
+            revenue (int): Importe de lo vendido.
+        """
+        self.shop_id = shop_id
+        self.products = products
+        self.stock_units = stock_units
+        self.inventory_value = inventory_value
+        self.units_sold = units_sold
+        self.revenue = revenue
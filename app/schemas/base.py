@@ -0,0 +1,12 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class Schema(BaseModel):
+    """Base de los esquemas de entrada de la API.
+
+    Se validan en modo estricto directamente sobre el cuerpo JSON: los números deben ser números y las
+    fechas se aceptan como cadenas ISO 8601 (YYYY-MM-DD), que se convierten en `datetime.date`.
+    Los campos desconocidos se ignoran.
+    """
+
+    model_config = ConfigDict(strict=True)
@@ -0,0 +1,11 @@
+from pydantic import Field
+
+from app.schemas.base import Schema
+
+
+class SaleDetailSchema(Schema):
+    """Datos de entrada para crear o actualizar un detalle de venta."""
+
+    qnt_prod_sale: int = Field(description='Cantidad de productos vendidos asociados al Id de producto')
+    sale_id: int = Field(description='IDs de las ventas asociadas')
+    product_id: int = Field(description='IDs de los productos asociados')
@@ -0,0 +1,11 @@
+from typing import List
+
+from pydantic import Field
+
+from app.schemas.base import Schema
+
+
+class LookupSchema(Schema):
+    """Datos de entrada de una búsqueda por lista de IDs."""
+
+    ids: List[int] = Field(min_length=1, description='IDs buscados; la respuesta sigue su orden')
@@ -0,0 +1,14 @@
+from pydantic import Field
+
+from app.schemas.base import Schema
+
+
+class ProductSchema(Schema):
+    """Datos de entrada para crear o actualizar un producto."""
+
+    name: str = Field(description='Nombre del Producto')
+    image: str = Field(description='Imagen del Producto')
+    description: str = Field(description='Descripción del Producto')
+    price: int = Field(description='Precio del Producto')
+    quantity: int = Field(description='Cantidad en existencia del Producto')
+    shop_id: int = Field(description='Id de la tienda a la que pertenece el Producto')
@@ -0,0 +1,29 @@
+import datetime
+from typing import List, Optional
+
+from pydantic import Field
+
+from app.schemas.base import Schema
+
+
+class SaleSchema(Schema):
+    """Datos de entrada para crear o actualizar una venta."""
+
+    date: datetime.date = Field(description='Fecha de la Venta')
+    total: Optional[int] = Field(None, description='Valor total de la Venta')
+    status: Optional[int] = Field(None, description='Estado de la Venta (0: en proceso, 1: registrada, 2: pagada, 3: anulada)')
+
+
+class CheckoutItemSchema(Schema):
+    """Una línea del carrito en el checkout."""
+
+    product_id: int = Field(description='ID del producto')
+    qnt_prod_sale: int = Field(ge=1, description='Cantidad de unidades del producto')
+
+
+class CheckoutSchema(Schema):
+    """Datos de entrada del checkout: la venta completa con sus líneas."""
+
+    date: datetime.date = Field(description='Fecha de la Venta')
+    status: int = Field(1, description='Estado de la Venta (por defecto 1: registrada)')
+    items: List[CheckoutItemSchema] = Field(min_length=1, description='Líneas del carrito')
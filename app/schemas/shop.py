@@ -0,0 +1,14 @@
+from pydantic import Field
+
+from app.schemas.base import Schema
+
+
+class ShopSchema(Schema):
+    """Datos de entrada para crear o actualizar una tienda."""
+
+    name: str = Field(description='Nombre de la Tienda')
+    logo: str = Field(description='Logo de la Tienda')
+    description: str = Field(description='Descripción de la Tienda')
+    phone: str = Field(description='Teléfono de la Tienda')
+    address: str = Field(description='Dirección de la Tienda')
+    email: str = Field(description='Correo Electrónico de la Tienda')
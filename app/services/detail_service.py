@@ -1,7 +1,13 @@
-from app import db
+from app import autocomplete, db, leaderboard, shards
 from app.models.sale import Sale
 from app.models.product import Product
 from app.models.detail import SaleDetail
+from app.services.sales_report_service import SalesReportService
+from app.services.shop_summary_service import ShopSummaryService
+from app.utils.pagination import decode_cursor, keyset_page, merge_pages
+from app.utils.projection import project_query
+from app.utils.replicas import replica_read
+from sqlalchemy import select
 
 class SaleDetailService:
     """Servicio para manejar las operaciones CRUD y lógicas de los detalles de ventas."""
@@ -20,12 +26,14 @@ class SaleDetailService:
 
         Raises:
             ValueError: Si los productos o las ventas especificados no existen.
+            ShopMovingError: Si la tienda del producto se está moviendo de shard.
         """
-        # Buscar el producto asociado al Detalle por su ID
-        product = Product.query.filter_by(id=product_id).first()
+        # Buscar el producto asociado al Detalle por su ID (el detalle se guarda en el shard del producto)
+        shard, product = shards.locate(Product, product_id)
         if not product:
             # Si no se encuentra el producto, lanzar una excepción
             raise ValueError('Product not found')
+        shards.check_writable(product.shop_id)
 
         # Buscar la venta asociada al Detalle por su ID
         sale = Sale.query.filter_by(id=sale_id).first()
@@ -34,7 +42,7 @@ class SaleDetailService:
             raise ValueError('Sale not found')
 
         # Crear una nueva instancia de Detail con el id de producto, cantidad de producto vendido, id de venta
-        new_detail = SaleDetail(qnt_prod_sale=qnt_prod_sale, sale_id=sale.id, product_id=product.id)
+        new_detail = SaleDetail(qnt_prod_sale=qnt_prod_sale, sale_id=sale.id, product_id=product.id, unit_price=product.price)
         
         # Asociar los productos al detalle de venta
         new_detail.product = product
@@ -42,11 +50,20 @@ class SaleDetailService:
         # Asociar la Venta al detalle de venta
         new_detail.sale = sale
 
-        # Agregar el nuevo detalle de venta a la sesión de base de datos
+        # Agregar el nuevo detalle de venta a la sesión de base de datos, con un ID global si hay shards
+        shards.assign_ids(SaleDetail, [new_detail])
         db.session.add(new_detail)
+        SalesReportService.record_details(sale, [(product.shop_id, qnt_prod_sale, product.price)])
+        ShopSummaryService.record([ShopSummaryService.sales_delta(product.shop_id, qnt_prod_sale, product.price)])
+        leaderboard.record(db.session, [(product.shop_id, product.id, qnt_prod_sale)])
+        sold = ({product.id: qnt_prod_sale}, {product.id: product.shop_id})
         
         # Confirmar los cambios y guardar la nueva venta en la base de datos
-        db.session.commit()
+        with shards.use(shard):
+            db.session.commit()
+
+        # Sumar las unidades vendidas a la popularidad del producto y su tienda en el autocompletado
+        autocomplete.record_sale(*sold)
         
         return new_detail
 
@@ -64,14 +81,19 @@ class SaleDetailService:
             Detail: El detalle de Venta actualizado.
 
         Raises:
-            ValueError: Si el detalle de venta no se encuentra.
+            ValueError: Si el detalle de venta no se encuentra, o si el nuevo producto está en otro shard.
+            ShopMovingError: Si la tienda del producto se está moviendo de shard.
         """
-        # Buscar el detalle de venta por su ID
-        saledetail = SaleDetail.query.get(id)
+        # Buscar el detalle de venta por su ID (en todos los shards, si los hay)
+        shard, saledetail = shards.locate(SaleDetail, id)
         
         # Si el detalle de venta no existe, lanzar un error
         if not saledetail:
             raise ValueError('SaleDetail not found')
+        SaleDetailService._check_writable(shard, saledetail)
+        with shards.use(shard):
+            sale, product = saledetail.sale, saledetail.product
+        before = (sale, product, saledetail.qnt_prod_sale, saledetail.unit_price)
         
         # Si se proporcionó una nueva cantidad de producto, actualizarla
         if qnt_prod_sale:
@@ -79,10 +101,16 @@ class SaleDetailService:
     
         # Si se proporcionaron nuevos productos, actualizarlos
         if product_id:
-            product = Product.query.filter_by(id=product_id).first()
+            product_shard, product = shards.locate(Product, product_id)
             if not product:
                 raise ValueError('Product not found')
-            saledetail.product_id = product.id
+            if product_shard != shard:
+                # El detalle tendría que cambiar de base de datos: se da de baja y se crea otro en su lugar
+                raise ValueError('Product is in another shard')
+            if product.id != saledetail.product_id:
+                # Otro producto: la línea pasa a valer su precio actual
+                saledetail.product_id = product.id
+                saledetail.unit_price = product.price
 
         # Si se proporcionaron nuevas ventas, actualizarlas
         if sale_id:
@@ -91,8 +119,26 @@ class SaleDetailService:
                 raise ValueError('Sale not found')
             saledetail.sale_id = sale.id
 
+        # Mover el detalle en el resumen diario, en el panel de las tiendas y en el ranking de más vendidos
+        # (sin efecto si nada cambió), con el precio guardado en el detalle: la resta cancela lo sumado al crearlo
+        SalesReportService.record_detail_change(before, (sale, product, saledetail.qnt_prod_sale, saledetail.unit_price))
+        ShopSummaryService.record([
+            ShopSummaryService.sales_delta(before[1].shop_id, before[2], before[3], -1),
+            ShopSummaryService.sales_delta(product.shop_id, saledetail.qnt_prod_sale, saledetail.unit_price),
+        ])
+        leaderboard.record(db.session, [
+            (before[1].shop_id, before[1].id, -before[2]),
+            (product.shop_id, product.id, saledetail.qnt_prod_sale),
+        ])
+        # Unidades a mover en la popularidad del autocompletado (del producto anterior al nuevo, si cambió)
+        quantities = {before[1].id: -before[2]}
+        quantities[product.id] = quantities.get(product.id, 0) + saledetail.qnt_prod_sale
+        sold = (quantities, {before[1].id: before[1].shop_id, product.id: product.shop_id})
+
         # Confirmar los cambios y actualizar el detalle de venta en la base de datos
-        db.session.commit()
+        with shards.use(shard):
+            db.session.commit()
+        autocomplete.record_sale(*sold)
         
         return saledetail
 
@@ -105,27 +151,75 @@ class SaleDetailService:
 
         Raises:
             ValueError: Si el detalle de venta no se encuentra.
+            ShopMovingError: Si la tienda del producto se está moviendo de shard.
         """
-        # Buscar el detalle de venta por su ID
-        saledetail = SaleDetail.query.get(id)
+        # Buscar el detalle de venta por su ID (en todos los shards, si los hay)
+        shard, saledetail = shards.locate(SaleDetail, id)
         
         # Si el detalle de venta no existe, lanzar un error
         if not saledetail:
             raise ValueError('SaleDetail not found')
+        SaleDetailService._check_writable(shard, saledetail)
         
-        # Eliminar el detalle de Venta de la base de datos
-        db.session.delete(saledetail)
-        
-        # Confirmar los cambios
-        db.session.commit()
+        # Restar el detalle del resumen diario, del panel de su tienda y del ranking de más vendidos
+        with shards.use(shard):
+            sale, product = saledetail.sale, saledetail.product
+        SalesReportService.record_details(sale, [(product.shop_id, saledetail.qnt_prod_sale, saledetail.unit_price)], -1)
+        ShopSummaryService.record([ShopSummaryService.sales_delta(product.shop_id, saledetail.qnt_prod_sale, saledetail.unit_price, -1)])
+        leaderboard.record(db.session, [(product.shop_id, product.id, -saledetail.qnt_prod_sale)])
+        sold = ({product.id: -saledetail.qnt_prod_sale}, {product.id: product.shop_id})
+
+        # Eliminar el detalle de Venta de la base de datos y confirmar los cambios en su shard
+        with shards.use(shard):
+            db.session.delete(saledetail)
+            db.session.commit()
+
+        # Restar las unidades de la popularidad del producto y su tienda en el autocompletado
+        autocomplete.record_sale(*sold)
+
+    @staticmethod
+    def _check_writable(shard, saledetail):
+        """Rechazar la escritura de un detalle cuyo producto pertenece a una tienda que se está moviendo de shard."""
+        if shards.enabled:
+            with shards.use(shard):
+                shop_id = db.session.scalar(select(Product.shop_id).where(Product.id == saledetail.product_id))
+            shards.check_writable(shop_id)
 
     @staticmethod
-    def get_all_saledetails():
-        """Obtener todos los detalles de ventas existentes.
+    @replica_read
+    def get_all_saledetails(limit, after=None, sale_id=None, product_id=None, fields=None):
+        """Obtener una página de detalles de ventas ordenados por ID.
         
+        Args:
+            limit (int): Número máximo de detalles de la página.
+            after (str): Cursor opaco de la página anterior, o None para la primera página.
+            sale_id (int): Filtrar por la venta asociada.
+            product_id (int): Filtrar por el producto asociado.
+            fields (list): Leer solo estas columnas (filas en lugar de instancias), o None para todas.
+
         Returns:
-            List[Details]: Lista de todos los detalles de ventas en la base de datos.
+            Page: Detalles de la página y cursor de la siguiente página (combinando los shards, si los hay).
+
+        Raises:
+            ValueError: Si el cursor no es válido.
         """
-        # Devolver todos los detalles de ventas almacenados
-        return SaleDetail.query.all()
+        # Continuar a partir del último ID entregado
+        after = decode_cursor(after, int) if after else None
+
+        def page():
+            query = SaleDetail.query
+
+            # Aplicar los filtros opcionales
+            if sale_id is not None:
+                query = query.filter(SaleDetail.sale_id == sale_id)
+            if product_id is not None:
+                query = query.filter(SaleDetail.product_id == product_id)
+            hidden = shards.hidden_shops()
+            if hidden:
+                # Ignorar la copia de los detalles de las tiendas que se están moviendo a este shard
+                query = query.filter(SaleDetail.product_id.notin_(select(Product.id).where(Product.shop_id.in_(hidden))))
+            query = project_query(query, SaleDetail, fields)
+            return keyset_page(query, [SaleDetail.id], limit, after)
+
+        return merge_pages(shards.fan_out(page), [SaleDetail.id], limit)
 
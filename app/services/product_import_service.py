@@ -0,0 +1,239 @@
+import csv
+import io
+import json
+
+from flask import current_app
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import autocomplete, db, search_index, shards
+from app.models.product import Product
+from app.models.shop import Shop
+from app.services.shop_summary_service import ShopSummaryService
+from app.utils.sharding import ShopMovingError
+from app.utils.upsert import upsert
+
+# Formatos de archivo soportados por la importación masiva
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Máximo de filas por sentencia que puede pedir un cliente
+MAX_IMPORT_BATCH_SIZE = 5000
+
+# Campos de texto con su longitud máxima (la de las columnas de Products) y si son obligatorios
+_STRING_FIELDS = (('name', 100, True), ('image', 255, True), ('description', 255, False))
+_INTEGER_FIELDS = ('price', 'quantity', 'shop_id')
+
+
+def _decode_line(line, line_no):
+    """Decodificar una línea de un archivo binario como UTF-8, descartando la marca BOM de la primera."""
+    return line.decode('utf-8-sig' if line_no == 1 else 'utf-8')
+
+
+def _decode_lines(stream):
+    """Decodificar un flujo binario línea a línea, para situar los errores de codificación en su línea."""
+    for line_no, line in enumerate(stream, start=1):
+        yield _decode_line(line, line_no)
+
+
+class ProductImportService:
+    """Servicio para la importación masiva (upsert) de catálogos de productos desde CSV o NDJSON."""
+
+    @staticmethod
+    def read_records(stream, fmt):
+        """Leer un archivo de productos fila a fila sin cargarlo completo en memoria.
+
+        Args:
+            stream (file): Flujo binario o de texto con el contenido del archivo.
+            fmt (str): Formato del archivo, 'csv' (con cabecera) o 'ndjson' (un objeto JSON por línea).
+
+        Returns:
+            Iterator[tuple]: Pares (número de línea, diccionario con los valores o mensaje de error).
+            En CSV, una línea que no es UTF-8 o no es CSV válido trae el error y el resto del archivo no se lee.
+
+        Raises:
+            ValueError: Si el formato no está soportado.
+        """
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f'Unsupported format: {fmt}')
+        text = isinstance(stream, io.TextIOBase)
+
+        if fmt == 'csv':
+            reader = csv.DictReader(stream if text else _decode_lines(stream))
+            try:
+                for record in reader:
+                    yield reader.line_num, record
+            except UnicodeDecodeError:
+                yield reader.line_num + 1, 'Invalid encoding: expected UTF-8; the rest of the file was not read'
+            except csv.Error as e:
+                yield reader.line_num, f'Invalid CSV: {e}; the rest of the file was not read'
+            return
+
+        for line_no, line in enumerate(stream, start=1):
+            if not text:
+                try:
+                    line = _decode_line(line, line_no)
+                except UnicodeDecodeError:
+                    yield line_no, 'Invalid encoding: expected UTF-8'
+                    continue
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, 'Invalid JSON'
+                continue
+            yield line_no, record if isinstance(record, dict) else 'Expected a JSON object'
+
+    @staticmethod
+    def import_products(records, batch_size=None):
+        """Insertar o actualizar productos por lotes, usando (shop_id, name) como clave natural.
+
+        Cada lote se escribe con un único upsert (executemany) y se confirma por separado. Las filas
+        no válidas se informan en el resultado sin detener la importación del resto del lote.
+
+        Args:
+            records (iterable): Pares (número de línea, diccionario de valores o mensaje de error).
+            batch_size (int): Filas por sentencia (al menos 1); por defecto `IMPORT_BATCH_SIZE`.
+
+        Returns:
+            dict: Resumen con las filas procesadas, importadas, fallidas y el detalle de los errores.
+
+        Raises:
+            ValueError: Si `batch_size` es menor que 1.
+        """
+        if batch_size is None:
+            batch_size = current_app.config['IMPORT_BATCH_SIZE']
+        if batch_size < 1:
+            raise ValueError('Batch size must be at least 1')
+        max_errors = current_app.config['IMPORT_MAX_ERRORS']
+        report = {'processed': 0, 'imported': 0, 'failed': 0, 'errors': []}
+        known_shops = {}  # shop_id -> existe, para validar cada tienda una sola vez
+
+        def add_error(line_no, message):
+            report['failed'] += 1
+            if len(report['errors']) < max_errors:
+                report['errors'].append({'line': line_no, 'error': message})
+
+        batch = []
+        for line_no, record in records:
+            report['processed'] += 1
+            if isinstance(record, str):
+                add_error(line_no, record)
+                continue
+            try:
+                batch.append((line_no, ProductImportService._clean(record)))
+            except ValueError as e:
+                add_error(line_no, str(e))
+                continue
+            if len(batch) >= batch_size:
+                ProductImportService._write_batch(batch, known_shops, report, add_error)
+                batch = []
+        if batch:
+            ProductImportService._write_batch(batch, known_shops, report, add_error)
+
+        return report
+
+    @staticmethod
+    def _clean(record):
+        """Validar y normalizar los valores de una fila.
+
+        Raises:
+            ValueError: Si falta algún campo obligatorio o tiene un valor no válido.
+        """
+        values = {}
+        for field, max_length, required in _STRING_FIELDS:
+            value = record.get(field)
+            if value is None or value == '':
+                if required:
+                    raise ValueError(f'Missing field: {field}')
+                values[field] = None
+                continue
+            value = str(value)
+            if len(value) > max_length:
+                raise ValueError(f'Field {field} exceeds {max_length} characters')
+            values[field] = value
+        for field in _INTEGER_FIELDS:
+            value = record.get(field)
+            if value is None or value == '':
+                raise ValueError(f'Missing field: {field}')
+            try:
+                values[field] = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid integer for field {field}: {value!r}')
+        if values['price'] < 0 or values['quantity'] < 0:
+            raise ValueError('Price and quantity must not be negative')
+        return values
+
+    @staticmethod
+    def _write_batch(batch, known_shops, report, add_error):
+        """Validar las tiendas de un lote y escribirlo con un único upsert (uno por shard, si hay shards).
+
+        Si el lote falla en la base de datos, sus filas se reintentan una a una para informar solo de las que fallan.
+        """
+        # Consultar solo las tiendas que aún no se han validado, con una consulta IN por lote
+        unknown = {values['shop_id'] for _, values in batch} - known_shops.keys()
+        if unknown:
+            found = set(db.session.scalars(select(Shop.id).where(Shop.id.in_(unknown))))
+            known_shops.update((shop_id, shop_id in found) for shop_id in unknown)
+
+        # Descartar filas de tiendas inexistentes o en movimiento y quedarse con la última aparición de cada clave del lote
+        rows = {}
+        valid = []
+        for line_no, values in batch:
+            if not known_shops[values['shop_id']]:
+                add_error(line_no, 'Shop not found')
+                continue
+            try:
+                shards.check_writable(values['shop_id'])
+            except ShopMovingError as e:
+                add_error(line_no, str(e))
+                continue
+            rows[(values['shop_id'], values['name'])] = values
+            valid.append((line_no, values))
+        if not rows:
+            return
+
+        # Con shards, las filas se agrupan por el shard de su tienda
+        by_shard = {}
+        for key, values in rows.items():
+            by_shard.setdefault(shards.shard_for_shop(key[0]) if shards.enabled else None, {})[key] = values
+
+        try:
+            written = []
+            for shard, part in by_shard.items():
+                # Los IDs globales solo se usan en las filas nuevas: las existentes conservan el suyo
+                part_rows = shards.assign_ids(Product, [dict(values, version=1) for values in part.values()])
+                with shards.use(shard):
+                    # Precio y existencias previos de las filas que ya existen, para el resumen de sus tiendas
+                    existing = {(row.shop_id, row.name): (row.price, row.quantity) for row in db.session.execute(
+                        select(Product.shop_id, Product.name, Product.price, Product.quantity)
+                        .where(tuple_(Product.shop_id, Product.name).in_(list(part))))}
+                    ShopSummaryService.record([
+                        ShopSummaryService.inventory_delta(key[0], existing.get(key), (values['price'], values['quantity']))
+                        for key, values in part.items()])
+                    upsert(
+                        db.session,
+                        Product,
+                        part_rows,
+                        index_elements=['shop_id', 'name'],
+                        update=['image', 'description', 'price', 'quantity'],
+                        increment=['version'],
+                        change_scopes={f'Products:shop:{shop_id}' for shop_id, _ in part})
+
+                    # El upsert no pasa por la unidad de trabajo: actualizar el índice de búsqueda de las filas del lote
+                    shard_written = db.session.execute(
+                        select(Product.id, Product.name, Product.description)
+                        .where(tuple_(Product.shop_id, Product.name).in_(list(part)))).all()
+                    search_index.reindex(db.session, shard_written)
+                written += shard_written
+            db.session.commit()
+            report['imported'] += len(valid)
+            autocomplete.add_many('product', [(product_id, name) for product_id, name, _ in written])
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            if len(valid) == 1:
+                add_error(valid[0][0], f'Database error: {e.__class__.__name__}')
+                return
+            # Reintentar fila a fila: las válidas se importan y solo las que fallan quedan en el informe
+            for entry in valid:
+                ProductImportService._write_batch([entry], known_shops, report, add_error)
@@ -1,6 +1,30 @@
-from app import db
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from app import autocomplete, cache, db, leaderboard, search_index, shards, singleflight
 from app.models.product import Product
 from app.models.shop import Shop
+from app.services.shop_summary_service import ShopSummaryService
+from app.utils.leaderboard import WINDOWS
+from app.utils.pagination import decode_cursor, keyset_page, merge_pages
+from app.utils.projection import project_query
+from app.utils.replicas import replica_read
+from app.utils.search import MAX_QUERY_TERMS, tokenize
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+# Órdenes disponibles para los productos de una Tienda (todos servidos por índices que empiezan por shop_id)
+PRODUCT_SORTS = {
+    None: (Product.id,),
+    'price': (Product.price, Product.id),  # ix_products_shop_id_price
+    'name': (Product.name,),  # uq_products_shop_name
+    'newest': (Product.id.desc(),),  # ix_products_shop_id_id
+}
+
+class DuplicateProductError(ValueError):
+    """Error lanzado cuando la tienda ya tiene otro producto con el mismo nombre."""
+
 
 class ProductService:
     @staticmethod
@@ -21,6 +45,8 @@ class ProductService:
         
         Raises:
             ValueError: Si la tienda no se encuentra.
+            DuplicateProductError: Si la tienda ya tiene un producto con ese nombre.
+            ShopMovingError: Si la tienda se está moviendo de shard.
         """
         # Buscar la tienda asociada al producto por su ID
         shop = Shop.query.filter_by(id=shop_id).first()
@@ -32,24 +58,143 @@ class ProductService:
         # Crear un nuevo objeto Product para la tienda asociada
         product = Product(name=name, image=image, description=description, price=price, quantity=quantity, shop_id=shop.id)
         
-        # Añadir el nuevo producto a la base de datos
-        db.session.add(product)
-        db.session.commit()
+        # Añadir el nuevo producto a la base de datos (al shard de la tienda, con un ID global si hay shards)
+        with shards.for_shop(shop.id, write=True):
+            shards.assign_ids(Product, [product])
+            db.session.add(product)
+            ShopSummaryService.record([ShopSummaryService.inventory_delta(shop.id, None, (price, quantity))])
+            _commit_product()
+
+        # Añadir el nombre al índice de autocompletado
+        autocomplete.add('product', product.id, product.name)
         
         return product  # Retornar el producto recién creado
     
     @staticmethod
-    def get_all_products():
+    @replica_read
+    def get_all_products(limit, after=None, shop_id=None, min_price=None, max_price=None, in_stock=None, fields=None):
         """
-        Obtener todos los productos de la base de datos.
+        Obtener una página de productos ordenados por ID, con filtros opcionales.
+
+        Con shards y sin `shop_id`, la página se pide a todos los shards en paralelo y se combina por ID.
+        
+        Args:
+            limit (int): Número máximo de productos de la página.
+            after (str): Cursor opaco de la página anterior, o None para la primera página.
+            shop_id (int): Filtrar por la tienda a la que pertenecen los productos.
+            min_price (int): Precio mínimo de los productos.
+            max_price (int): Precio máximo de los productos.
+            in_stock (bool): Si es True solo productos con existencias, si es False solo agotados.
+            fields (list): Leer solo estas columnas (filas en lugar de instancias), o None para todas.
         
         Returns:
-            List[Product]: Lista de todos los productos en la base de datos.
+            Page: Productos de la página y cursor de la siguiente página.
+
+        Raises:
+            ValueError: Si el cursor no es válido.
         """
-        # Recuperar todos los registros de la tabla Product
-        return Product.query.all()
+        # Continuar a partir del último ID entregado
+        after = decode_cursor(after, int) if after else None
+
+        def page():
+            query = ProductService._filter_products(Product.query, shop_id, min_price, max_price, in_stock)
+            query = project_query(query, Product, fields)
+            return keyset_page(query, [Product.id], limit, after)
+
+        if shop_id is not None:
+            with shards.for_shop(shop_id):
+                return page()
+        return merge_pages(shards.fan_out(page), [Product.id], limit)
+
+    @staticmethod
+    def iter_products(chunk_size, shop_id=None, min_price=None, max_price=None, in_stock=None, fields=None):
+        """
+        Recorrer todos los productos con un cursor del lado del servidor, leyendo en bloques.
+        
+        Args:
+            chunk_size (int): Número de filas que se leen de la base de datos en cada bloque.
+            shop_id (int): Filtrar por la tienda a la que pertenecen los productos.
+            min_price (int): Precio mínimo de los productos.
+            max_price (int): Precio máximo de los productos.
+            in_stock (bool): Si es True solo productos con existencias, si es False solo agotados.
+            fields (list): Leer solo estas columnas (filas en lugar de instancias), o None para todas.
+        
+        Returns:
+            Iterator[Product]: Iterador perezoso de productos ordenados por ID (combinando los shards, si los hay).
+        """
+        def query():
+            query = ProductService._filter_products(Product.query, shop_id, min_price, max_price, in_stock)
+            query = project_query(query, Product, fields)
+            return query.order_by(Product.id).yield_per(chunk_size)
+
+        return shards.iter_merged(query, attrgetter('id'), shop_id=shop_id)
+
+    @staticmethod
+    def _filter_products(query, shop_id, min_price, max_price, in_stock):
+        """Aplicar a la consulta los filtros opcionales del listado de productos."""
+        if shop_id is not None:
+            query = query.filter(Product.shop_id == shop_id)
+        else:
+            # Durante el movimiento de una tienda sus productos están en dos shards: se ignora la copia
+            hidden = shards.hidden_shops()
+            if hidden:
+                query = query.filter(Product.shop_id.notin_(hidden))
+        if min_price is not None:
+            query = query.filter(Product.price >= min_price)
+        if max_price is not None:
+            query = query.filter(Product.price <= max_price)
+        if in_stock is not None:
+            query = query.filter(Product.quantity > 0 if in_stock else Product.quantity <= 0)
+        return query
+
+    @staticmethod
+    @replica_read
+    def search_products(q, limit, shop_id=None, min_price=None, max_price=None, in_stock=None, fields=None):
+        """
+        Buscar productos por los términos de su nombre y descripción, ordenados por relevancia.
+        
+        Los términos se comparan sin distinguir mayúsculas ni acentos y el último se busca como prefijo.
+        
+        Args:
+            q (str): Texto de la búsqueda.
+            limit (int): Número máximo de productos a devolver.
+            shop_id (int): Filtrar por la tienda a la que pertenecen los productos.
+            min_price (int): Precio mínimo de los productos.
+            max_price (int): Precio máximo de los productos.
+            in_stock (bool): Si es True solo productos con existencias, si es False solo agotados.
+            fields (list): Leer solo estas columnas (filas en lugar de instancias), o None para todas.
+        
+        Returns:
+            List[Product]: Productos que contienen todos los términos, de más a menos relevante.
+
+        Raises:
+            ValueError: Si la búsqueda no contiene ningún término.
+        """
+        terms = list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TERMS]
+        if not terms:
+            raise ValueError('Search query has no terms')
+        fan_out = shards.enabled and shop_id is None
+        if fan_out and fields is None:
+            fields = [attr.key for attr in Product.__mapper__.column_attrs]  # Filas, para combinar los shards
+
+        def search():
+            # Unir los productos con las coincidencias del índice y aplicar los filtros del listado
+            matches = search_index.match(terms)
+            query = Product.query.join(matches, matches.c.product_id == Product.id)
+            query = ProductService._filter_products(query, shop_id, min_price, max_price, in_stock)
+            query = project_query(query, Product, fields)
+            if fan_out:
+                query = query.add_columns(matches.c.score.label('score'))  # Para combinar los shards por relevancia
+            return query.order_by(matches.c.score.desc(), Product.id).limit(limit).all()
+
+        if not fan_out:
+            with shards.for_shop(shop_id):
+                return search()
+        results = heapq.merge(*shards.fan_out(search), key=lambda row: (-row.score, row.id))
+        return list(islice(results, limit))
 
     @staticmethod
+    @replica_read
     def get_product_by_name(name):
         """
         Obtener un producto por su nombre.
@@ -60,10 +205,15 @@ class ProductService:
         Returns:
             Product: El producto encontrado o None si no existe.
         """
-        # Filtrar productos por su nombre (name)
-        return Product.query.filter_by(name=name).first()
+        # Filtrar productos por su nombre (name), shard a shard si los hay
+        for _ in shards.each():
+            product = Product.query.filter_by(name=name).first()
+            if product is not None:
+                return product
+        return None
 
     @staticmethod
+    @replica_read
     def get_product_by_id(product_id):
         """
         Obtener un producto por su id.
@@ -74,8 +224,23 @@ class ProductService:
         Returns:
             Product: El producto encontrado o None si no existe.
         """
-        # Buscar productos por su ID (product_id)
-        return Product.query.get(product_id)
+        # Buscar productos por su ID (product_id), pasando por la caché de entidades
+        return cache.get(Product, product_id)
+
+    @staticmethod
+    @replica_read
+    def get_products_by_ids(product_ids):
+        """Obtener varios productos por sus IDs, pasando por la caché de entidades.
+
+        Los que no están en caché se leen con una consulta IN por bloque de IDs (y por shard, si los hay).
+
+        Args:
+            product_ids (list): IDs de los productos a buscar.
+
+        Returns:
+            dict: ID -> Product, solo de los productos que existen.
+        """
+        return cache.get_many(Product, product_ids)
 
     @staticmethod
     def update_product(product_id, name=None, image=None, description=None, price=None, quantity=None):
@@ -94,13 +259,17 @@ class ProductService:
         
         Raises:
             ValueError: Si el producto no es encontrado.
+            DuplicateProductError: Si el nuevo nombre ya lo tiene otro producto de la tienda.
+            ShopMovingError: Si la tienda del producto se está moviendo de shard.
         """
-        # Buscar el producto por su ID
-        product = Product.query.get(product_id)
+        # Buscar el producto por su ID (en todos los shards, si los hay)
+        shard, product = shards.locate(Product, product_id)
         
         # Si el producto no existe, lanzar un error
         if not product:
             raise ValueError('Product not found')
+        shards.check_writable(product.shop_id)
+        before = (product.price, product.quantity)
         
         # Si se proporcionó un nuevo nombre, actualizarlo
         if name:
@@ -121,9 +290,19 @@ class ProductService:
         # Si se proporcionó una nueva cantidad, actualizarla
         if quantity:
             product.quantity = quantity
+
+        # Actualizar las existencias y el valor del inventario en el resumen de la tienda
+        ShopSummaryService.record([
+            ShopSummaryService.inventory_delta(product.shop_id, before, (product.price, product.quantity))])
         
-        # Confirmar los cambios y actualizar el producto en la base de datos
-        db.session.commit()
+        # Confirmar los cambios y actualizar el producto en la base de datos (y en el índice de búsqueda de su shard)
+        with shards.use(shard):
+            _commit_product()
+
+        # Invalidar la entrada del producto en la caché y actualizar su nombre en el autocompletado
+        cache.invalidate(Product, product_id)
+        if name:
+            autocomplete.add('product', product_id, product.name)
         
         return product
 
@@ -136,41 +315,121 @@ class ProductService:
 
         Raises:
             ValueError: Si el producto no se encuentra.
+            ShopMovingError: Si la tienda del producto se está moviendo de shard.
         """
-        # Buscar el producto por su ID
-        product = Product.query.get(product_id)
+        # Buscar el producto por su ID (en todos los shards, si los hay)
+        shard, product = shards.locate(Product, product_id)
         
         # Si el producto no existe, lanzar un error
         if not product:
             raise ValueError('Product not found')
+        shards.check_writable(product.shop_id)
         
-        # Eliminar el producto de la base de datos
-        db.session.delete(product)
-        
-        # Confirmar los cambios
-        db.session.commit()
+        # Eliminar el producto de la base de datos y confirmar los cambios en su shard
+        ShopSummaryService.record([
+            ShopSummaryService.inventory_delta(product.shop_id, (product.price, product.quantity), None)])
+        with shards.use(shard):
+            db.session.delete(product)
+            db.session.commit()
+
+        # Invalidar la entrada del producto en la caché y retirarlo del autocompletado
+        cache.invalidate(Product, product_id)
+        autocomplete.remove('product', product_id)
 
     @staticmethod
-    def get_products_by_shop(shop_id):
+    @replica_read
+    def get_products_by_shop(shop_id, sort=None):
         """Obtener la lista de productos ofertados por una Tienda específica.
         
+        Usa una sola consulta (Tienda con sus productos en un LEFT JOIN), que distingue una Tienda
+        inexistente de una Tienda sin productos. Cada orden lo resuelve un índice de Products que
+        empieza por `shop_id`. Con shards son dos consultas: la Tienda en la base global y sus
+        productos en su shard.
+        
         Args:
             shop_id (int): El ID de la Tienda para buscar los productos asociados.
+            sort (str): Orden de los productos: 'price', 'name', 'newest' o None (por ID).
 
         Returns:
-            List[dict]: Lista de diccionarios con los nombres de los productos la Tienda.
+            List[Product]: Productos de la Tienda (lista vacía si no tiene ninguno).
         
         Raises:
-            ValueError: Si la Tienda no se encuentra.
+            ValueError: Si la Tienda no se encuentra o el orden no es válido.
         """
-        # Buscar la Tienda por su ID
-        shop = Shop.query.get(shop_id)
-        if not shop:
-            raise ValueError("Shop not found")
-        
-        # Obtener los productos asociados a la Tienda
-        products = Product.query.filter_by(shop_id=shop.id).all()
+        if sort not in PRODUCT_SORTS:
+            raise ValueError('Invalid sort')
+
+        def load():
+            if shards.enabled:
+                if db.session.scalar(select(Shop.id).where(Shop.id == shop_id)) is None:
+                    raise ValueError("Shop not found")
+                with shards.for_shop(shop_id):
+                    products = db.session.scalars(
+                        select(Product).where(Product.shop_id == shop_id).order_by(*PRODUCT_SORTS[sort])).all()
+                return [cache.payload(product) for product in products]
+
+            # Tienda y productos en una sola consulta: sin filas, la Tienda no existe; con una fila sin producto, está vacía
+            rows = db.session.execute(
+                select(Shop.id, Product)
+                .outerjoin(Product, Product.shop_id == Shop.id)
+                .where(Shop.id == shop_id)
+                .order_by(*PRODUCT_SORTS[sort])).all()
+            if not rows:
+                raise ValueError("Shop not found")
+
+            # Obtener los productos asociados a la Tienda, como valores independientes de la sesión
+            return [cache.payload(product) for _, product in rows if product is not None]
+
+        # Las solicitudes concurrentes de la misma Tienda y orden comparten una sola consulta
+        payloads = singleflight.do(f'products_by_shop:{shop_id}:{sort}', load)
         
-        # Retornar una lista de nombres de productos
-        return products
+        # Retornar los productos incorporados a la sesión actual
+        return [cache.materialize(Product, payload) for payload in payloads]
+
+    @staticmethod
+    @replica_read
+    def get_top_products(window, limit, shop_id=None):
+        """Obtener los productos más vendidos en una ventana de tiempo, global o de una Tienda.
+
+        El ranking se sirve desde memoria (`Leaderboard`); solo se consultan los nombres de los productos
+        del resultado, con una consulta IN (una por shard, o solo la de la Tienda).
+
+        Args:
+            window (str): Ventana de tiempo: '1h', '24h' o '7d'.
+            limit (int): Número máximo de productos.
+            shop_id (int): Restringir a los productos de una Tienda.
 
+        Returns:
+            list: Diccionarios con `product_id`, `name`, `shop_id` y `units_sold`, de más a menos vendido.
+
+        Raises:
+            ValueError: Si la ventana no es válida o la Tienda no se encuentra.
+        """
+        if window not in WINDOWS:
+            raise ValueError(f'Invalid window: {window}')
+        if shop_id is not None and db.session.scalar(select(Shop.id).where(Shop.id == shop_id)) is None:
+            raise ValueError('Shop not found')
+        top = leaderboard.top(window, limit, shop_id)
+        if not top:
+            return []
+
+        # Nombres de los productos del ranking (los eliminados desde la venta se omiten)
+        query = select(Product.id, Product.name).where(Product.id.in_([product_id for product_id, _, _ in top]))
+        names = {}
+        if shop_id is not None:
+            with shards.for_shop(shop_id):
+                names.update(db.session.execute(query).all())
+        else:
+            for _ in shards.each():
+                names.update(db.session.execute(query).all())
+        return [{'product_id': product_id, 'name': names[product_id], 'shop_id': product_shop_id, 'units_sold': units}
+                for product_id, product_shop_id, units in top if product_id in names]
+
+
+def _commit_product():
+    """Confirmar el alta o el cambio de un producto; un nombre repetido en la tienda viola uq_products_shop_name."""
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise DuplicateProductError('A product with this name already exists in the shop')
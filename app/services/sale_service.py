@@ -1,8 +1,24 @@
-from app import db
+from app import autocomplete, db, leaderboard, shards
 from app.models.sale import Sale, StateEnum
 from app.models.product import Product
+from app.models.detail import SaleDetail
+from app.services.sales_report_service import SalesReportService
+from app.services.shop_summary_service import ShopSummaryService
+from app.utils.lookup import chunks
+from app.utils.pagination import decode_cursor, keyset_page
+from app.utils.projection import project_query
+from app.utils.replicas import replica_read
+from datetime import date as date_type
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 import enum
 
+
+class InsufficientStockError(ValueError):
+    """Error lanzado cuando algún producto no tiene existencias suficientes para la venta."""
+
+
 class SaleService:
     """Servicio para manejar las operaciones CRUD y lógicas de las ventas."""
 
@@ -28,14 +44,186 @@ class SaleService:
         new_sale = Sale(date=date, total=total, status=StateEnum(status))
         
         
-        # Agregar la nueva venta a la sesión de base de datos
+        # Agregar la nueva venta a la sesión de base de datos y al resumen diario de ventas
         db.session.add(new_sale)
+        SalesReportService.record_sale(new_sale)
         
         # Confirmar los cambios y guardar la nueva venta en la base de datos
         db.session.commit()
         
         return new_sale
 
+    @staticmethod
+    def checkout(date, items, status=StateEnum.REGISTERED):
+        """Registrar una compra completa (venta, detalles y descuento de existencias) en una sola transacción.
+
+        Con shards, los productos de cada shard se validan y descuentan con sus propias sentencias y los
+        detalles se guardan en el shard de su producto. La transacción abarca todas las bases, pero se
+        confirma en cada una por separado (sin commit en dos fases): un fallo de una base en pleno commit
+        puede dejar la compra a medias.
+        
+        Args:
+            date (date): Fecha de la venta.
+            items (list): Lista de diccionarios con `product_id` y `qnt_prod_sale` de cada línea del carrito.
+            status (enum): Estado de la transacción.
+
+        Returns:
+            Sale: La nueva venta creada, con el total calculado a partir de los precios actuales.
+
+        Raises:
+            ValueError: Si el carrito está vacío, tiene cantidades no válidas o productos inexistentes.
+            InsufficientStockError: Si algún producto no tiene existencias suficientes.
+            ShopMovingError: Si la tienda de algún producto se está moviendo de shard.
+        """
+        # Agrupar las cantidades por producto (un mismo producto puede venir en varias líneas)
+        quantities = {}
+        for item in items:
+            if item['qnt_prod_sale'] <= 0:
+                raise ValueError('Invalid quantity for product {}'.format(item['product_id']))
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['qnt_prod_sale']
+        if not quantities:
+            raise ValueError('Cart is empty')
+
+        # Validar todos los productos y obtener sus precios y tiendas con una sola consulta IN (una por shard)
+        rows, by_shard = [], {}
+        for shard in shards.each():
+            for row in db.session.execute(
+                    select(Product.id, Product.price, Product.shop_id).where(Product.id.in_(quantities))):
+                rows.append(row)
+                by_shard.setdefault(shard, {})[row.id] = quantities[row.id]
+        prices = {row.id: row.price for row in rows}
+        missing = sorted(set(quantities) - set(prices))
+        if missing:
+            raise ValueError('Product not found: {}'.format(', '.join(map(str, missing))))
+        for shop_id in {row.shop_id for row in rows}:
+            shards.check_writable(shop_id)
+
+        # Los IDs globales de los detalles se reservan antes de escribir en la base global
+        details = shards.assign_ids(SaleDetail, [
+            {'qnt_prod_sale': qnt, 'product_id': product_id, 'unit_price': prices[product_id]} for product_id, qnt in quantities.items()])
+
+        try:
+            # Descontar las existencias de todos los productos con un único UPDATE condicional por shard
+            for shard, part in by_shard.items():
+                sold = case(part, value=Product.id)
+                with shards.use(shard):
+                    result = db.session.execute(
+                        update(Product)
+                        .where(Product.id.in_(part), Product.quantity >= sold)
+                        .values(quantity=Product.quantity - sold, version=Product.version + 1)
+                        .execution_options(
+                            synchronize_session=False,
+                            cache_invalidate=list(part),
+                            change_scopes={f'Products:shop:{row.shop_id}' for row in rows if row.id in part}))
+                if result.rowcount != len(part):
+                    raise InsufficientStockError('Insufficient stock')
+
+            # Crear la venta para obtener su ID
+            new_sale = Sale(
+                date=date,
+                total=sum(prices[product_id] * qnt for product_id, qnt in quantities.items()),
+                status=StateEnum(status))
+            db.session.add(new_sale)
+            db.session.flush()
+
+            # Insertar todos los detalles de la venta con un único INSERT de varias filas (por shard)
+            for detail in details:
+                detail['sale_id'] = new_sale.id
+            for shard, part in by_shard.items():
+                with shards.use(shard):
+                    db.session.execute(insert(SaleDetail.__table__), [detail for detail in details if detail['product_id'] in part])
+
+            # Sumar la venta y sus líneas a los resúmenes diarios de los informes
+            SalesReportService.record_sale(new_sale)
+            SalesReportService.record_details(new_sale, [(row.shop_id, quantities[row.id], row.price) for row in rows])
+
+            # Las existencias de cada producto bajan en las unidades vendidas, que se suman a las ventas de su tienda
+            ShopSummaryService.record(
+                [ShopSummaryService.inventory_delta(row.shop_id, (row.price, quantities[row.id]), (row.price, 0)) for row in rows]
+                + [ShopSummaryService.sales_delta(row.shop_id, quantities[row.id], row.price) for row in rows])
+            leaderboard.record(db.session, [(row.shop_id, row.id, quantities[row.id]) for row in rows])
+
+            # Confirmar toda la compra de una sola vez
+            db.session.commit()
+        except InsufficientStockError:
+            db.session.rollback()
+            # Informar qué productos no tienen existencias suficientes
+            short = []
+            for shard, part in by_shard.items():
+                with shards.use(shard):
+                    short += db.session.scalars(
+                        select(Product.id).where(Product.id.in_(part), Product.quantity < case(part, value=Product.id))).all()
+            raise InsufficientStockError('Insufficient stock for product: {}'.format(', '.join(map(str, sorted(short)))))
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Sumar las unidades vendidas a la popularidad de los productos y tiendas en el autocompletado
+        autocomplete.record_sale(quantities, {row.id: row.shop_id for row in rows})
+
+        if shards.enabled:
+            SaleService._load_details(new_sale)
+        return new_sale
+
+    @staticmethod
+    def _load_details(sale, products=False):
+        """Cargar en la venta sus detalles de todos los shards (la carga diferida solo vería uno).
+
+        Con `products`, cada detalle se lee junto con su producto (JOIN, en el mismo shard).
+        """
+        details = []
+        for _ in shards.each():
+            query = SaleDetail.query.filter_by(sale_id=sale.id)
+            if products:
+                query = query.options(joinedload(SaleDetail.product))
+            details += query.all()
+        set_committed_value(sale, 'Detalle_Venta', sorted(details, key=lambda detail: detail.id))
+
+    @staticmethod
+    @replica_read
+    def get_sale_by_id(sale_id, expand=()):
+        """Obtener una venta por su ID, opcionalmente con sus detalles y los productos de estos.
+
+        Las relaciones pedidas se cargan por adelantado, así que el número de consultas no depende del
+        número de detalles: los detalles con `selectinload` (una consulta IN por la venta) y su producto
+        con `joinedload` en esa misma consulta (un IN por productos se partiría en lotes de 500 claves).
+        En total 2 consultas, o 1 más una por shard si hay shards.
+
+        Args:
+            sale_id (int): El ID de la venta.
+            expand (set): Relaciones a incluir: 'details' y/o 'details.product' (ver `parse_expand`).
+
+        Returns:
+            Sale: La venta, o None si no existe.
+        """
+        query = select(Sale).where(Sale.id == sale_id)
+        if 'details' in expand and not shards.enabled:
+            details = selectinload(Sale.Detalle_Venta)
+            if 'details.product' in expand:
+                details = details.joinedload(SaleDetail.product)
+            query = query.options(details)
+        sale = db.session.scalars(query).first()
+        if sale is not None and 'details' in expand and shards.enabled:
+            # Los detalles están repartidos entre los shards: se cargan en cada uno junto con sus productos
+            SaleService._load_details(sale, 'details.product' in expand)
+        return sale
+
+    @staticmethod
+    @replica_read
+    def get_sales_by_ids(sale_ids):
+        """Obtener varias ventas por sus IDs, con una consulta IN por bloque de IDs.
+
+        Args:
+            sale_ids (list): IDs de las ventas a buscar.
+
+        Returns:
+            dict: ID -> Sale, solo de las ventas que existen.
+        """
+        sales = {}
+        for chunk in chunks(sale_ids):
+            sales.update((sale.id, sale) for sale in db.session.scalars(select(Sale).where(Sale.id.in_(chunk))))
+        return sales
+
     @staticmethod
     def update_sale(sale_id, date=None, total=None, status=None):
         """Actualizar los detalles de una venta existente o en proceso.
@@ -59,6 +247,7 @@ class SaleService:
         # Si la venta no existe, lanzar un error
         if not sale:
             raise ValueError('Sale not found')
+        before = SalesReportService.snapshot(sale)
         
         # Si se proporcionó una nueva fecha, actualizarla
         if date:
@@ -72,6 +261,9 @@ class SaleService:
         if status is not None:
             sale.status = StateEnum(status)      
        
+        # Mover la venta en el resumen diario si cambió su fecha, estado o total
+        SalesReportService.record_sale_change(sale, before)
+
         # Confirmar los cambios y actualizar la venta en la base de datos
         db.session.commit()
         
@@ -93,6 +285,13 @@ class SaleService:
         # Si la Venta no existe, lanzar un error
         if not sale:
             raise ValueError('Sale not found')
+
+        if shards.enabled:
+            # Los detalles de la venta están repartidos entre los shards: se cargan de todos antes de eliminarla
+            SaleService._load_details(sale)
+
+        # Restar la venta y sus detalles del resumen diario
+        SalesReportService.record_sale(sale, -1)
         
         # Eliminar la Venta de la base de datos
         db.session.delete(sale)
@@ -101,14 +300,39 @@ class SaleService:
         db.session.commit()
 
     @staticmethod
-    def get_all_sales():
-        """Obtener todas las ventas existentes.
+    @replica_read
+    def get_all_sales(limit, after=None, status=None, date_from=None, date_to=None, fields=None):
+        """Obtener una página de ventas ordenadas por fecha y ID.
         
+        Args:
+            limit (int): Número máximo de ventas de la página.
+            after (str): Cursor opaco de la página anterior, o None para la primera página.
+            status (int): Filtrar por estado de la venta.
+            date_from (date): Fecha mínima (inclusive) de las ventas.
+            date_to (date): Fecha máxima (inclusive) de las ventas.
+            fields (list): Leer solo estas columnas (filas en lugar de instancias), o None para todas.
+
         Returns:
-            List[Sales]: Lista de todas las ventas en la base de datos.
+            Page: Ventas de la página y cursor de la siguiente página.
+
+        Raises:
+            ValueError: Si el cursor o el estado no son válidos.
         """
-        # Devolver todas las ventas almacenadas
-        return Sale.query.all()
+        query = Sale.query
+
+        # Aplicar los filtros opcionales
+        if status is not None:
+            query = query.filter(Sale.status == StateEnum(status))
+        if date_from is not None:
+            query = query.filter(Sale.date >= date_from)
+        if date_to is not None:
+            query = query.filter(Sale.date <= date_to)
+        # La fecha forma parte de la clave de paginación: se lee aunque no se haya solicitado
+        query = project_query(query, Sale, fields, required=('date', 'id'))
+
+        # Continuar a partir de la última (fecha, ID) entregada
+        after = decode_cursor(after, date_type.fromisoformat, int) if after else None
+        return keyset_page(query, [Sale.date, Sale.id], limit, after)
 
     @staticmethod
     def mark_sale_paid(sale_id):
@@ -131,7 +355,9 @@ class SaleService:
             raise ValueError('Sale not found')
         
         # Marcar la Venta como pagada
+        before = SalesReportService.snapshot(sale)
         sale.status = StateEnum.PAID
+        SalesReportService.record_sale_change(sale, before)
         
         # Confirmar los cambios
         db.session.commit()
@@ -159,7 +385,9 @@ class SaleService:
             raise ValueError('Sale not found')
                 
         # Marcar la venta en proceso
+        before = SalesReportService.snapshot(sale)
         sale.status = StateEnum.IN_PROGRESS
+        SalesReportService.record_sale_change(sale, before)
         
         # Confirmar los cambios
         db.session.commit()
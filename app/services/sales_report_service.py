@@ -0,0 +1,251 @@
+from sqlalchemy import delete, func, insert, select
+
+from app import db, shards
+from app.models.detail import SaleDetail
+from app.models.product import Product
+from app.models.sale import Sale, StateEnum
+from app.models.sales_daily import SalesDaily
+from app.models.shop_sales_daily import ShopSalesDaily
+from app.utils.replicas import replica_read
+from app.utils.upsert import increment_rows
+
+# Granularidades de los informes y formato del periodo de cada una
+GRANULARITIES = {
+    'day': lambda day: day.isoformat(),
+    'month': lambda day: day.strftime('%Y-%m'),
+    'year': lambda day: str(day.year),
+}
+
+# Dimensiones opcionales por las que se desglosan los informes, además del periodo
+REPORT_DIMENSIONS = ('status', 'shop')
+
+# Claves y métricas de cada resumen diario
+_SALES_KEY, _SALES_METRICS = ('day', 'status'), ('sales', 'revenue')
+_SHOP_KEY, _SHOP_METRICS = ('day', 'status', 'shop_id'), ('lines', 'units', 'revenue')
+
+
+class SalesReportService:
+    """Servicio de los informes de ventas y de los resúmenes diarios que los sostienen.
+
+    Los resúmenes (`SalesDaily` por día y estado, `ShopSalesDaily` además por tienda) se actualizan con
+    incrementos (upsert que suma) en la misma transacción que cada escritura de ventas y detalles, así que
+    un informe anual lee como mucho unas pocas filas por día en lugar de recorrer todas las ventas.
+    """
+
+    # Mantenimiento incremental, llamado desde las escrituras de ventas y detalles
+
+    @staticmethod
+    def snapshot(sale):
+        """Fecha, estado y total de una venta, para comparar antes y después de modificarla."""
+        return sale.date, sale.status, sale.total
+
+    @staticmethod
+    def record_sale(sale, sign=1):
+        """Sumar una venta nueva al resumen diario, o restarla (`sign=-1`) junto con sus detalles guardados.
+
+        Args:
+            sale (Sale): Venta creada o a punto de eliminarse.
+            sign (int): 1 al crearla, -1 al eliminarla.
+        """
+        increment_rows(db.session, SalesDaily, _SALES_KEY, _SALES_METRICS, [((sale.date, sale.status), (sign, sign * sale.total))])
+        if sign < 0 and sale.id is not None:
+            increment_rows(db.session, ShopSalesDaily, _SHOP_KEY, _SHOP_METRICS, [
+                ((sale.date, sale.status, shop_id), (-lines, -units, -revenue))
+                for shop_id, lines, units, revenue in _sale_totals(sale.id)])
+
+    @staticmethod
+    def record_sale_change(sale, before):
+        """Mover una venta modificada (y sus detalles, si cambió de día o de estado) entre los resúmenes.
+
+        Args:
+            sale (Sale): Venta con los nuevos valores, aún sin confirmar.
+            before (tuple): Valores de la venta antes del cambio, obtenidos con `snapshot`.
+        """
+        after = SalesReportService.snapshot(sale)
+        if after == before:
+            return
+        increment_rows(db.session, SalesDaily, _SALES_KEY, _SALES_METRICS, [
+            (before[:2], (-1, -before[2])),
+            (after[:2], (1, after[2])),
+        ])
+        if before[:2] != after[:2]:
+            deltas = []
+            for shop_id, lines, units, revenue in _sale_totals(sale.id):
+                deltas.append(((*before[:2], shop_id), (-lines, -units, -revenue)))
+                deltas.append(((*after[:2], shop_id), (lines, units, revenue)))
+            increment_rows(db.session, ShopSalesDaily, _SHOP_KEY, _SHOP_METRICS, deltas)
+
+    @staticmethod
+    def record_details(sale, lines, sign=1):
+        """Sumar (o restar, con `sign=-1`) detalles de una venta al resumen diario por tienda.
+
+        Args:
+            sale (Sale): Venta de los detalles.
+            lines (iterable): Tuplas `(shop_id, unidades, precio unitario guardado en el detalle)`.
+            sign (int): 1 al crearlos, -1 al eliminarlos.
+        """
+        increment_rows(db.session, ShopSalesDaily, _SHOP_KEY, _SHOP_METRICS, [
+            _detail_delta(sale, shop_id, units, price, sign) for shop_id, units, price in lines])
+
+    @staticmethod
+    def record_detail_change(before, after):
+        """Mover un detalle modificado entre las filas del resumen por tienda (sin efecto si nada cambió).
+
+        Args:
+            before (tuple): Venta, producto, unidades y precio unitario del detalle antes del cambio.
+            after (tuple): Venta, producto, unidades y precio unitario del detalle después del cambio.
+        """
+        (old_sale, old_product, old_units, old_price), (sale, product, units, price) = before, after
+        increment_rows(db.session, ShopSalesDaily, _SHOP_KEY, _SHOP_METRICS, [
+            _detail_delta(old_sale, old_product.shop_id, old_units, old_price, -1),
+            _detail_delta(sale, product.shop_id, units, price, 1),
+        ])
+
+    # Informes
+
+    @staticmethod
+    @replica_read
+    def get_report(granularity='day', date_from=None, date_to=None, status=None, shop_id=None, group_by=()):
+        """Ventas e importes por periodo a partir de los resúmenes diarios.
+
+        Sin desglose por tienda se leen los totales de las ventas (número de ventas e importe total); con
+        `group_by` que incluya 'shop' o con `shop_id`, lo vendido por cada tienda (detalles, unidades e importe).
+
+        Args:
+            granularity (str): 'day', 'month' o 'year'.
+            date_from (date): Fecha mínima (inclusive).
+            date_to (date): Fecha máxima (inclusive).
+            status (int): Filtrar por estado de la venta.
+            shop_id (int): Filtrar por tienda.
+            group_by (iterable): Dimensiones del desglose además del periodo: 'status' y/o 'shop'.
+
+        Returns:
+            list: Diccionarios con `period`, las dimensiones pedidas y las métricas, ordenados por periodo.
+
+        Raises:
+            ValueError: Si la granularidad, el estado o alguna dimensión no son válidos.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'Invalid granularity: {granularity}')
+        unknown = set(group_by) - set(REPORT_DIMENSIONS)
+        if unknown:
+            raise ValueError('Invalid group_by: {}'.format(', '.join(sorted(unknown))))
+        by_shop = 'shop' in group_by or shop_id is not None
+        model, metrics = (ShopSalesDaily, _SHOP_METRICS) if by_shop else (SalesDaily, _SALES_METRICS)
+
+        # La base suma las dimensiones no pedidas; aquí solo se agregan los días de cada periodo
+        dimensions = [model.day]
+        if 'status' in group_by:
+            dimensions.append(model.status)
+        if 'shop' in group_by:
+            dimensions.append(model.shop_id)
+        query = select(*dimensions, *(func.sum(getattr(model, metric)).label(metric) for metric in metrics)).group_by(*dimensions)
+        if date_from is not None:
+            query = query.where(model.day >= date_from)
+        if date_to is not None:
+            query = query.where(model.day <= date_to)
+        if status is not None:
+            query = query.where(model.status == StateEnum(status))
+        if shop_id is not None:
+            query = query.where(model.shop_id == shop_id)
+
+        # Agregar los días en periodos (un año son como mucho 365 filas por estado y tienda pedidos)
+        period_of = GRANULARITIES[granularity]
+        totals = {}
+        for row in db.session.execute(query):
+            key = (period_of(row.day),
+                   row.status if 'status' in group_by else None,
+                   row.shop_id if 'shop' in group_by else None)
+            current = totals.setdefault(key, dict.fromkeys(metrics, 0))
+            for metric in metrics:
+                current[metric] += getattr(row, metric)
+
+        report = []
+        for (period, row_status, row_shop_id), values in sorted(totals.items(), key=lambda item: _sort_key(item[0])):
+            if not any(values.values()):
+                continue
+            entry = {'period': period, **values}
+            if 'status' in group_by:
+                entry['status'] = row_status
+            if 'shop' in group_by:
+                entry['shop_id'] = row_shop_id
+            report.append(entry)
+        return report
+
+    @staticmethod
+    def rebuild():
+        """Reconstruir desde cero los resúmenes diarios a partir de las ventas y sus detalles.
+
+        Sirve para llenarlos tras la migración o corregirlos si se desincronizaron. Las escrituras
+        confirmadas mientras se reconstruyen pueden quedar fuera: conviene ejecutarlo sin tráfico de escritura.
+
+        Returns:
+            dict: Filas escritas en cada resumen.
+        """
+        db.session.execute(delete(SalesDaily))
+        db.session.execute(delete(ShopSalesDaily))
+
+        sales = [dict(day=row.date, status=row.status, sales=row.sales, revenue=row.revenue) for row in db.session.execute(
+            select(Sale.date, Sale.status, func.count().label('sales'), func.coalesce(func.sum(Sale.total), 0).label('revenue'))
+            .group_by(Sale.date, Sale.status))]
+
+        metrics = (func.count(SaleDetail.id).label('lines'),
+                   func.coalesce(func.sum(SaleDetail.qnt_prod_sale), 0).label('units'),
+                   func.coalesce(func.sum(SaleDetail.qnt_prod_sale * SaleDetail.unit_price), 0).label('revenue'))
+        totals = {}
+        if shards.enabled:
+            # Los detalles están en los shards y las ventas en la base global: se agregan por venta en cada
+            # shard y se asignan al día y estado de su venta
+            keys = {row.id: (row.date, row.status) for row in db.session.execute(select(Sale.id, Sale.date, Sale.status))}
+            for _ in shards.each():
+                for row in db.session.execute(
+                        select(SaleDetail.sale_id, Product.shop_id, *metrics)
+                        .join(Product, SaleDetail.product_id == Product.id)
+                        .group_by(SaleDetail.sale_id, Product.shop_id)):
+                    if row.sale_id in keys:
+                        _accumulate(totals, (*keys[row.sale_id], row.shop_id), (row.lines, row.units, row.revenue))
+        else:
+            for row in db.session.execute(
+                    select(Sale.date, Sale.status, Product.shop_id, *metrics)
+                    .select_from(SaleDetail)
+                    .join(Sale, SaleDetail.sale_id == Sale.id)
+                    .join(Product, SaleDetail.product_id == Product.id)
+                    .group_by(Sale.date, Sale.status, Product.shop_id)):
+                _accumulate(totals, (row.date, row.status, row.shop_id), (row.lines, row.units, row.revenue))
+        shops = [dict(zip(_SHOP_KEY + _SHOP_METRICS, key + values)) for key, values in totals.items()]
+
+        if sales:
+            db.session.execute(insert(SalesDaily.__table__), sales)
+        if shops:
+            db.session.execute(insert(ShopSalesDaily.__table__), shops)
+        db.session.commit()
+        return {'sales_rows': len(sales), 'shop_rows': len(shops)}
+
+
+def _accumulate(totals, key, values):
+    current = totals.get(key)
+    totals[key] = values if current is None else tuple(a + b for a, b in zip(current, values))
+
+
+def _detail_delta(sale, shop_id, units, price, sign):
+    return (sale.date, sale.status, shop_id), (sign, sign * units, sign * units * price)
+
+
+def _sort_key(key):
+    # Los estados (enum) no son ordenables: se ordenan por su valor
+    return tuple(-1 if part is None else getattr(part, 'value', part) for part in key)
+
+
+def _sale_totals(sale_id):
+    """Detalles, unidades e importe de una venta por tienda (de todos los shards, si los hay)."""
+    totals = []
+    for _ in shards.each():
+        totals += db.session.execute(
+            select(Product.shop_id,
+                   func.count(SaleDetail.id),
+                   func.coalesce(func.sum(SaleDetail.qnt_prod_sale), 0),
+                   func.coalesce(func.sum(SaleDetail.qnt_prod_sale * SaleDetail.unit_price), 0))
+            .join(Product, SaleDetail.product_id == Product.id)
+            .where(SaleDetail.sale_id == sale_id)
+            .group_by(Product.shop_id)).all()
+    return totals
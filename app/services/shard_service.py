@@ -0,0 +1,181 @@
+import time
+
+from sqlalchemy import delete, func, insert, select
+
+from app import db, shards
+from app.models.detail import SaleDetail
+from app.models.product import Product
+from app.models.product_token import ProductToken
+from app.models.shop import Shop
+from app.models.shop_shard import ShopShard
+
+
+class ShardService:
+    """Servicio para la administración de los shards: esquema, directorio de tiendas y movimiento de tiendas."""
+
+    @staticmethod
+    def init_shards():
+        """Crear las tablas repartidas en cada shard y fijar en el directorio el shard de las tiendas existentes.
+
+        Debe ejecutarse antes de añadir shards a una instalación con datos: las tiendas sin fila en el
+        directorio cambiarían de shard al cambiar el número de shards.
+
+        Returns:
+            dict: Tiendas fijadas en cada shard.
+
+        Raises:
+            ValueError: Si no hay shards configurados.
+        """
+        ShardService._require_shards()
+        metadata = shards.shard_metadata()
+        for key in shards.keys:
+            metadata.create_all(db.engines[key])
+
+        pinned = set(db.session.scalars(select(ShopShard.shop_id)))
+        counts = dict.fromkeys(shards.keys, 0)
+        for shop_id in db.session.scalars(select(Shop.id)).all():
+            if shop_id not in pinned:
+                shard = shards.default_shard(shop_id)
+                db.session.add(ShopShard(shop_id, shard))
+                counts[shard] += 1
+        db.session.commit()
+        shards.refresh()
+        return counts
+
+    @staticmethod
+    def get_status():
+        """Productos, tiendas del directorio y tiendas en movimiento de cada shard.
+
+        Raises:
+            ValueError: Si no hay shards configurados.
+        """
+        ShardService._require_shards()
+        shards.refresh()
+        directory = shards.directory()
+        status = {}
+        for key in shards.each():
+            status[key] = {
+                'products': db.session.scalar(select(func.count()).select_from(Product)),
+                'shops': sum(1 for shard, _ in directory.values() if shard == key),
+                'moving': sorted(shop_id for shop_id, (shard, moving) in directory.items() if moving and shard == key),
+            }
+        return status
+
+    @staticmethod
+    def move_shop(shop_id, target, batch_size=1000, wait=None, log=None):
+        """Mover los productos, términos de búsqueda y detalles de venta de una tienda a otro shard.
+
+        La tienda sigue disponible para lectura durante todo el proceso; solo sus escrituras se rechazan
+        (`ShopMovingError`) mientras dura:
+
+        1. Se marca la tienda como en movimiento y se espera `wait` segundos, para que todos los procesos
+           relean el directorio y dejen de escribir en ella.
+        2. Se copian sus filas al shard destino por lotes (los listados repartidos ignoran la copia).
+        3. Se apunta la tienda al shard destino y se espera de nuevo, para que todos lean del destino.
+        4. Se borran sus filas del shard origen y se vuelven a permitir las escrituras.
+
+        Si la copia falla, se borra lo copiado y la tienda queda en el shard origen.
+
+        Args:
+            shop_id (int): ID de la tienda.
+            target (str): Bind del shard destino, por ejemplo 'shard_1'.
+            batch_size (int): Productos copiados por transacción.
+            wait (float): Segundos de espera tras cada cambio del directorio; por defecto `SHARD_MAP_TTL`.
+            log (callable): Función que recibe un mensaje de progreso.
+
+        Returns:
+            dict: Tienda, shards de origen y destino y filas copiadas de cada tabla.
+
+        Raises:
+            ValueError: Si no hay shards, el shard o la tienda no existen, o la tienda ya está en el destino
+                o se está moviendo.
+        """
+        ShardService._require_shards()
+        if target not in shards.keys:
+            raise ValueError(f'Unknown shard: {target}')
+        if db.session.scalar(select(Shop.id).where(Shop.id == shop_id)) is None:
+            raise ValueError('Shop not found')
+        shards.refresh()
+        source = shards.shard_for_shop(shop_id)
+        if source == target:
+            raise ValueError(f'Shop {shop_id} is already in {target}')
+        if shards.directory().get(shop_id, (None, False))[1]:
+            raise ValueError(f'Shop {shop_id} is already being moved')
+        wait = shards.map_ttl if wait is None else wait
+        log = log or (lambda message: None)
+
+        log(f'Blocking writes of shop {shop_id} in {source}')
+        ShardService._set_shard(shop_id, source, moving=True)
+        time.sleep(wait)
+        try:
+            log(f'Copying shop {shop_id} from {source} to {target}')
+            copied = ShardService._copy_shop(shop_id, source, target, batch_size)
+        except Exception:
+            ShardService._delete_shop_rows(shop_id, target, batch_size)
+            ShardService._set_shard(shop_id, source, moving=False)
+            raise
+
+        log(f'Switching shop {shop_id} to {target}')
+        ShardService._set_shard(shop_id, target, moving=True)
+        time.sleep(wait)
+
+        log(f'Deleting shop {shop_id} from {source}')
+        ShardService._delete_shop_rows(shop_id, source, batch_size)
+        ShardService._set_shard(shop_id, target, moving=False)
+        return {'shop_id': shop_id, 'source': source, 'target': target, **copied}
+
+    @staticmethod
+    def _require_shards():
+        if not shards.enabled:
+            raise ValueError('No shards configured (DATABASE_SHARD_URLS)')
+
+    @staticmethod
+    def _set_shard(shop_id, shard, moving):
+        """Actualizar la fila de la tienda en el directorio y releerlo en este proceso."""
+        entry = db.session.get(ShopShard, shop_id)
+        if entry is None:
+            entry = ShopShard(shop_id, shard)
+            db.session.add(entry)
+        entry.shard = shard
+        entry.moving = moving
+        db.session.commit()
+        shards.refresh()
+
+    @staticmethod
+    def _product_ids(shop_id, shard):
+        products = Product.__table__
+        with db.engines[shard].connect() as conn:
+            return conn.execute(select(products.c.id).where(products.c.shop_id == shop_id).order_by(products.c.id)).scalars().all()
+
+    @staticmethod
+    def _copy_shop(shop_id, source, target, batch_size):
+        """Copiar las filas de la tienda por lotes de productos, cada lote en su propia transacción."""
+        # Restos de un intento anterior interrumpido
+        ShardService._delete_shop_rows(shop_id, target, batch_size)
+
+        products, tokens, details = Product.__table__, ProductToken.__table__, SaleDetail.__table__
+        tables = (('products', products, products.c.id), ('tokens', tokens, tokens.c.product_id), ('details', details, details.c.product_id))
+        ids = ShardService._product_ids(shop_id, source)
+        copied = {name: 0 for name, _, _ in tables}
+        with db.engines[source].connect() as reader:
+            for start in range(0, len(ids), batch_size):
+                chunk = ids[start:start + batch_size]
+                with db.engines[target].begin() as writer:
+                    for name, table, column in tables:
+                        rows = [dict(row._mapping) for row in reader.execute(select(table).where(column.in_(chunk)))]
+                        if rows:
+                            writer.execute(insert(table), rows)
+                            copied[name] += len(rows)
+        return copied
+
+    @staticmethod
+    def _delete_shop_rows(shop_id, shard, batch_size):
+        """Borrar de un shard las filas de la tienda (detalles, términos y productos), por lotes."""
+        products, tokens, details = Product.__table__, ProductToken.__table__, SaleDetail.__table__
+        ids = ShardService._product_ids(shop_id, shard)
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            with db.engines[shard].begin() as conn:
+                conn.execute(delete(details).where(details.c.product_id.in_(chunk)))
+                conn.execute(delete(tokens).where(tokens.c.product_id.in_(chunk)))
+                conn.execute(delete(products).where(products.c.id.in_(chunk)))
@@ -1,5 +1,13 @@
-from app import db
+from app import autocomplete, cache, db, shards
+from app.models.product import Product
 from app.models.shop import Shop
+from app.services.shop_summary_service import ShopSummaryService
+from app.utils.pagination import decode_cursor, keyset_page
+from app.utils.projection import project_query
+from app.utils.replicas import replica_read
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 
 class ShopService:
@@ -31,34 +39,103 @@ class ShopService:
         # Crear una nueva Tienda
         new_shop = Shop(name=name, logo=logo, description=description, phone=phone, address=address, email=email)
         
-        # Guardar la Tienda en la base de datos
+        # Guardar la Tienda en la base de datos, fijando su shard en el directorio si hay shards
         db.session.add(new_shop)
+        if shards.enabled:
+            db.session.flush()
+            shards.pin(db.session, new_shop.id)
         db.session.commit()
+
+        # Añadir el nombre al índice de autocompletado
+        autocomplete.add('shop', new_shop.id, new_shop.name)
         
         return new_shop
 
     @staticmethod
-    def get_all_shops():
-        """Obtener todas las Tiendas disponibles.
+    @replica_read
+    def get_all_shops(limit, after=None, name=None, fields=None):
+        """Obtener una página de Tiendas ordenadas por ID.
+        
+        Args:
+            limit (int): Número máximo de Tiendas de la página.
+            after (str): Cursor opaco de la página anterior, o None para la primera página.
+            name (str): Filtrar las Tiendas cuyo nombre empieza por este texto.
+            fields (list): Leer solo estas columnas (filas en lugar de instancias), o None para todas.
+
+        Returns:
+            Page: Tiendas de la página y cursor de la siguiente página.
+
+        Raises:
+            ValueError: Si el cursor no es válido.
+        """
+        query = Shop.query
+
+        # Filtrar por prefijo del nombre
+        if name:
+            query = query.filter(Shop.name.startswith(name, autoescape=True))
+        query = project_query(query, Shop, fields)
+
+        # Continuar a partir del último ID entregado
+        after = decode_cursor(after, int) if after else None
+        return keyset_page(query, [Shop.id], limit, after)
+
+    @staticmethod
+    def iter_shops(chunk_size, name=None, fields=None):
+        """Recorrer todas las Tiendas con un cursor del lado del servidor, leyendo en bloques.
         
+        Args:
+            chunk_size (int): Número de filas que se leen de la base de datos en cada bloque.
+            name (str): Filtrar las Tiendas cuyo nombre empieza por este texto.
+            fields (list): Leer solo estas columnas (filas en lugar de instancias), o None para todas.
+
         Returns:
-            List[Shop]: Lista de todas las Tiendas en la base de datos.
+            Iterator[Shop]: Iterador perezoso de Tiendas ordenadas por ID.
         """
-        # Retorna todas las Tiendas
-        return Shop.query.all()
+        query = Shop.query
+        if name:
+            query = query.filter(Shop.name.startswith(name, autoescape=True))
+        query = project_query(query, Shop, fields)
+        return query.order_by(Shop.id).yield_per(chunk_size)
 
     @staticmethod
-    def get_shop_by_id(shop_id):
-        """Obtener una tienda por su ID.
+    @replica_read
+    def get_shop_by_id(shop_id, expand=()):
+        """Obtener una tienda por su ID, opcionalmente con sus productos.
         
         Args:
             shop_id (int): El ID de la Tienda.
+            expand (set): Relaciones a incluir: 'products' (ver `parse_expand`).
 
         Returns:
             Shop: La Tienda correspondiente al ID, o None si no existe.
         """
-        # Buscar la Tienda por su ID
-        return Shop.query.get(shop_id)
+        if 'products' in expand and not shards.enabled:
+            # La Tienda y sus productos en dos consultas (la segunda, un IN con selectinload)
+            return db.session.scalars(select(Shop).where(Shop.id == shop_id).options(selectinload(Shop.Products))).first()
+
+        # Buscar la Tienda por su ID, pasando por la caché de entidades
+        shop = cache.get(Shop, shop_id)
+        if shop is not None and 'products' in expand:
+            # Con shards, los productos se leen del shard de la Tienda
+            with shards.for_shop(shop_id):
+                products = db.session.scalars(select(Product).where(Product.shop_id == shop_id).order_by(Product.id)).all()
+            set_committed_value(shop, 'Products', products)
+        return shop
+
+    @staticmethod
+    @replica_read
+    def get_shops_by_ids(shop_ids):
+        """Obtener varias tiendas por sus IDs, pasando por la caché de entidades.
+
+        Las que no están en caché se leen con una consulta IN por bloque de IDs.
+
+        Args:
+            shop_ids (list): IDs de las Tiendas a buscar.
+
+        Returns:
+            dict: ID -> Shop, solo de las Tiendas que existen.
+        """
+        return cache.get_many(Shop, shop_ids)
 
     @staticmethod
     def update_shop(shop_id, new_name):
@@ -84,6 +161,10 @@ class ShopService:
         
         # Confirmar los cambios en la base de datos
         db.session.commit()
+
+        # Invalidar la entrada de la Tienda en la caché y actualizar su nombre en el autocompletado
+        cache.invalidate(Shop, shop_id)
+        autocomplete.add('shop', shop_id, shop.name)
         
         return shop
 
@@ -96,14 +177,21 @@ class ShopService:
 
         Raises:
             ValueError: Si la Tienda no se encuentra.
+            ShopMovingError: Si la Tienda se está moviendo de shard.
         """
         # Buscar la Tienda por su ID
         shop = Shop.query.get(shop_id)
         if not shop:
             raise ValueError("Shop not found")
         
-        # Eliminar la Tienda
-        db.session.delete(shop)
-        db.session.commit()
+        # Eliminar la Tienda (sus productos se consultan en su shard)
+        with shards.for_shop(shop_id, write=True):
+            db.session.delete(shop)
+            ShopSummaryService.forget(shop_id)
+            db.session.commit()
+
+        # Invalidar la entrada de la Tienda en la caché y retirarla del autocompletado
+        cache.invalidate(Shop, shop_id)
+        autocomplete.remove('shop', shop_id)
 
 
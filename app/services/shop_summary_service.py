@@ -0,0 +1,178 @@
+from sqlalchemy import delete, func, select
+
+from app import db, shards
+from app.models.detail import SaleDetail
+from app.models.product import Product
+from app.models.shop import Shop
+from app.models.shop_summary import ShopSummary
+from app.utils.replicas import replica_read
+from app.utils.upsert import increment_rows, upsert
+
+# Métricas del resumen de una tienda, en el orden de los incrementos
+SUMMARY_METRICS = ('products', 'stock_units', 'inventory_value', 'units_sold', 'revenue')
+
+
+class ShopSummaryService:
+    """Servicio del resumen del panel de cada tienda (`ShopSummary`).
+
+    Las escrituras de productos y detalles construyen sus incrementos con `inventory_delta` y
+    `sales_delta` y los suman con `record`, en su misma transacción. `reconcile` recalcula los
+    resúmenes desde los datos de origen para detectar y corregir desviaciones.
+    """
+
+    # Mantenimiento incremental, llamado desde las escrituras de productos y detalles
+
+    @staticmethod
+    def inventory_delta(shop_id, before, after):
+        """Incremento del resumen por el alta, cambio o baja de un producto.
+
+        Args:
+            shop_id (int): ID de la tienda del producto.
+            before (tuple): `(precio, existencias)` antes del cambio, o None si el producto es nuevo.
+            after (tuple): `(precio, existencias)` después del cambio, o None si el producto se elimina.
+        """
+        old_price, old_quantity = before or (0, 0)
+        price, quantity = after or (0, 0)
+        return shop_id, ((after is not None) - (before is not None),
+                         quantity - old_quantity,
+                         price * quantity - old_price * old_quantity,
+                         0, 0)
+
+    @staticmethod
+    def sales_delta(shop_id, units, price, sign=1):
+        """Incremento del resumen por un detalle de venta registrado (o eliminado, con `sign=-1`).
+
+        `price` es el precio unitario guardado en el detalle, no el precio actual del producto.
+        """
+        return shop_id, (0, 0, 0, sign * units, sign * units * price)
+
+    @staticmethod
+    def record(deltas):
+        """Sumar los incrementos a los resúmenes de las tiendas, con un solo upsert.
+
+        Args:
+            deltas (iterable): Incrementos construidos con `inventory_delta` y `sales_delta`.
+        """
+        increment_rows(db.session, ShopSummary, ('shop_id',), SUMMARY_METRICS,
+                       [((shop_id,), values) for shop_id, values in deltas])
+
+    @staticmethod
+    def forget(shop_id):
+        """Eliminar el resumen de una tienda que se elimina."""
+        db.session.execute(delete(ShopSummary).where(ShopSummary.shop_id == shop_id))
+
+    # Lectura
+
+    @staticmethod
+    @replica_read
+    def get_summary(shop_id):
+        """Obtener el resumen del panel de una tienda con una lectura por clave primaria.
+
+        Args:
+            shop_id (int): ID de la tienda.
+
+        Returns:
+            ShopSummary: Resumen de la tienda (a cero si aún no tiene productos ni ventas).
+
+        Raises:
+            ValueError: Si la tienda no se encuentra.
+        """
+        summary = db.session.get(ShopSummary, shop_id)
+        if summary is None:
+            # Sin fila: distinguir una tienda sin actividad de una tienda inexistente
+            if db.session.scalar(select(Shop.id).where(Shop.id == shop_id)) is None:
+                raise ValueError('Shop not found')
+            summary = ShopSummary(shop_id)
+        return summary
+
+    # Reconciliación
+
+    @staticmethod
+    def reconcile(repair=True):
+        """Comparar los resúmenes con los datos de origen y corregir los que se hayan desviado.
+
+        El inventario se recalcula desde los productos y las ventas desde los detalles de venta (con el
+        precio unitario guardado en cada uno), en todos los shards: no desde otro resumen mantenido con
+        los mismos incrementos, que arrastraría las mismas desviaciones.
+
+        Cada tienda desviada se corrige en su propia transacción, bloqueando su fila del resumen y
+        recalculándola de nuevo: las escrituras concurrentes esperan al bloqueo y suman su incremento
+        sobre el valor corregido.
+
+        Args:
+            repair (bool): Corregir las desviaciones encontradas (False solo las informa).
+
+        Returns:
+            dict: Tiendas comprobadas, desviaciones encontradas (valores guardados y esperados) y corregidas.
+        """
+        shop_ids = set(db.session.scalars(select(Shop.id)))
+        expected = ShopSummaryService._compute()
+        stored = {row[0]: tuple(row[1:]) for row in db.session.execute(
+            select(ShopSummary.shop_id, *(getattr(ShopSummary, metric) for metric in SUMMARY_METRICS)))}
+        db.session.rollback()  # Cada corrección abre su propia transacción
+
+        zeros = (0,) * len(SUMMARY_METRICS)
+        drifted = []
+        for shop_id in sorted(shop_ids | stored.keys()):
+            # El resumen de una tienda eliminada sobra; una tienda sin fila equivale a una fila a cero
+            target = expected.get(shop_id, zeros) if shop_id in shop_ids else None
+            if target is None or stored.get(shop_id, zeros) != target:
+                drifted.append({
+                    'shop_id': shop_id,
+                    'stored': dict(zip(SUMMARY_METRICS, stored[shop_id])) if shop_id in stored else None,
+                    'expected': dict(zip(SUMMARY_METRICS, target)) if target is not None else None,
+                })
+
+        repaired = 0
+        if repair:
+            for entry in drifted:
+                ShopSummaryService._repair(entry['shop_id'])
+                repaired += 1
+        return {'checked': len(shop_ids), 'drifted': drifted, 'repaired': repaired}
+
+    @staticmethod
+    def _repair(shop_id):
+        """Recalcular y sobrescribir el resumen de una tienda (o eliminarlo si la tienda ya no existe)."""
+        try:
+            db.session.scalar(select(ShopSummary.shop_id).where(ShopSummary.shop_id == shop_id).with_for_update())
+            if db.session.scalar(select(Shop.id).where(Shop.id == shop_id)) is None:
+                ShopSummaryService.forget(shop_id)
+            else:
+                values = ShopSummaryService._compute(shop_id).get(shop_id, (0,) * len(SUMMARY_METRICS))
+                upsert(db.session, ShopSummary, [dict(zip(('shop_id',) + SUMMARY_METRICS, (shop_id,) + values))],
+                       index_elements=['shop_id'], update=list(SUMMARY_METRICS))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def _compute(shop_id=None):
+        """Métricas esperadas de una tienda (o de todas), calculadas desde los datos de origen."""
+        totals = {}
+        inventory = select(Product.shop_id,
+                           func.count(Product.id),
+                           func.coalesce(func.sum(Product.quantity), 0),
+                           func.coalesce(func.sum(Product.price * Product.quantity), 0)).group_by(Product.shop_id)
+        sales = select(Product.shop_id,
+                       func.coalesce(func.sum(SaleDetail.qnt_prod_sale), 0),
+                       func.coalesce(func.sum(SaleDetail.qnt_prod_sale * SaleDetail.unit_price), 0)
+                       ).join(Product, SaleDetail.product_id == Product.id).group_by(Product.shop_id)
+        if shop_id is not None:
+            inventory = inventory.where(Product.shop_id == shop_id)
+            sales = sales.where(Product.shop_id == shop_id)
+
+        def add(key, values):
+            current = totals.get(key, (0,) * len(SUMMARY_METRICS))
+            totals[key] = tuple(a + b for a, b in zip(current, values))
+
+        # Con shards, cada shard tiene los productos y detalles de sus tiendas (las copias en movimiento se ignoran)
+        for _ in shards.each():
+            hidden = shards.hidden_shops()
+            for key, count, quantity, value in db.session.execute(inventory):
+                if key not in hidden:
+                    add(key, (count, quantity, value, 0, 0))
+            for key, units, revenue in db.session.execute(sales):
+                if key not in hidden:
+                    add(key, (0, 0, 0, units, revenue))
+        return totals
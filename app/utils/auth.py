@@ -0,0 +1,21 @@
+import hmac
+from functools import wraps
+
+from flask import abort, current_app, request
+
+
+def is_admin_request():
+    """Indicar si la solicitud trae el token de administración válido en la cabecera `X-Admin-Token`."""
+    expected = current_app.config.get('ADMIN_TOKEN')
+    provided = request.headers.get('X-Admin-Token', '')
+    return bool(expected) and hmac.compare_digest(provided.encode(), expected.encode())
+
+
+def admin_required(f):
+    """Decorador que restringe un endpoint a las solicitudes con el token de administración."""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            abort(403)
+        return f(*args, **kwargs)
+    return wrapper
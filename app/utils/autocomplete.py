@@ -0,0 +1,397 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.utils.search import normalize
+
+logger = logging.getLogger(__name__)
+
+# Tipos de entrada del índice; la referencia de una entrada es un entero `id * 2 + tipo`
+KINDS = ('product', 'shop')
+_KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+# Los prefijos de hasta esta longitud abarcan demasiadas entradas para ordenarlas en cada consulta: sus
+# `TOP_K` entradas más populares se precalculan y se mantienen en cada escritura
+SHORT_PREFIX_LENGTH = 2
+TOP_K = 50
+
+
+def _ref(kind, entity_id):
+    return entity_id * 2 + _KIND_CODES[kind]
+
+
+def _keys(name):
+    """Claves de un nombre: el nombre normalizado y cada sufijo que empieza en una palabra."""
+    words = normalize(name).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+def _short_prefixes(keys):
+    return {key[:length] for key in keys for length in range(1, SHORT_PREFIX_LENGTH + 1) if len(key) >= length}
+
+
+class PrefixIndex:
+    """Índice de nombres por prefijo sobre un arreglo ordenado con búsqueda binaria.
+
+    Cada nombre se guarda bajo varias claves (el nombre completo y los sufijos que empiezan en cada
+    palabra), de modo que "colombia" encuentra "Café de Colombia". Una consulta localiza con `bisect`
+    el rango de claves con el prefijo y devuelve las entradas de mayor popularidad del rango; para los
+    prefijos cortos, cuyo rango puede abarcar gran parte del índice, se usan listas precalculadas.
+
+    No depende de Flask ni de la base de datos; las operaciones son seguras entre hilos. Con nombres de
+    2 a 4 palabras ocupa unos 360 bytes por nombre (~340 MB por millón), según
+    `python -m benchmarks.autocomplete_memory`.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []  # claves normalizadas, ordenadas
+        self._refs = []  # referencia de la entrada de cada clave (misma posición)
+        self._names = {}  # referencia -> nombre original
+        self._scores = {}  # referencia -> popularidad
+        self._top = {}  # (prefijo corto, código de tipo o None) -> referencias más populares, ordenadas
+        self._stale = set()  # listas de `_top` que deben recalcularse por una baja
+
+    def __len__(self):
+        return len(self._names)
+
+    def load(self, entries):
+        """Reemplazar el contenido del índice construyéndolo de una vez (más rápido que insertar uno a uno).
+
+        Args:
+            entries (iterable): Tuplas (tipo, id, nombre, popularidad).
+        """
+        names, scores, pairs = {}, {}, []
+        for kind, entity_id, name, score in entries:
+            ref = _ref(kind, entity_id)
+            names[ref] = name
+            scores[ref] = score or 0
+            pairs.extend((key, ref) for key in _keys(name))
+        pairs.sort()
+        keys = [key for key, _ in pairs]
+        refs = [ref for _, ref in pairs]
+        del pairs
+
+        # Precalcular las listas de los prefijos cortos recorriendo una vez el arreglo por cada longitud. Cada
+        # entrada se sustituye por su posición en el orden global de popularidad (productos primero y luego
+        # tiendas), de modo que ordenar enteros da directamente el orden de cada tipo
+        rank = self._rank(names, scores)
+        order = sorted(names, key=lambda ref: (ref % 2, rank(ref)))
+        position = {ref: i for i, ref in enumerate(order)}
+        first_shop = bisect_left(order, 1, key=lambda ref: ref % 2)
+        top = {}
+        for length in range(1, SHORT_PREFIX_LENGTH + 1):
+            start = 0
+            while start < len(keys):
+                prefix = keys[start][:length]
+                if len(prefix) < length:
+                    # Clave más corta que el prefijo (p. ej. "a"): las siguientes, más largas, forman otros grupos
+                    start += 1
+                    continue
+                end = bisect_left(keys, prefix + '\uffff', start)
+                ranked = sorted(set(map(position.__getitem__, refs[start:end])))
+                split = bisect_left(ranked, first_shop)
+                products = [order[i] for i in ranked[:min(split, TOP_K)]]
+                shops = [order[i] for i in ranked[split:split + TOP_K]]
+                top[(prefix, 0)] = products
+                top[(prefix, 1)] = shops
+                top[(prefix, None)] = heapq.nsmallest(TOP_K, products + shops, key=rank)
+                start = end
+
+        with self._lock:
+            self._keys, self._refs = keys, refs
+            self._names, self._scores = names, scores
+            self._top, self._stale = top, set()
+
+    def add(self, kind, entity_id, name, score=None):
+        """Insertar o reemplazar una entrada (conserva su popularidad si no se indica otra)."""
+        ref = _ref(kind, entity_id)
+        with self._lock:
+            if ref in self._names:
+                score = self._scores[ref] if score is None else score
+                self._remove(ref)
+            self._names[ref] = name
+            self._scores[ref] = score or 0
+            keys = _keys(name)
+            for key in keys:
+                position = bisect_left(self._keys, key)
+                self._keys.insert(position, key)
+                self._refs.insert(position, ref)
+            self._rerank(ref, _short_prefixes(keys))
+
+    def remove(self, kind, entity_id):
+        """Eliminar una entrada, si existe."""
+        with self._lock:
+            self._remove(_ref(kind, entity_id))
+
+    def bump(self, kind, entity_id, amount=1):
+        """Sumar popularidad a una entrada existente (una cantidad negativa la resta)."""
+        ref = _ref(kind, entity_id)
+        with self._lock:
+            if ref in self._scores:
+                self._scores[ref] += amount
+                prefixes = _short_prefixes(_keys(self._names[ref]))
+                if amount >= 0:
+                    self._rerank(ref, prefixes)
+                else:
+                    self._demote(ref, prefixes)
+
+    def lookup(self, prefix, limit=10, kind=None):
+        """Entradas cuyo nombre (o alguna de sus palabras) empieza por el prefijo, de más a menos popular.
+
+        Args:
+            prefix (str): Texto escrito por el usuario; se normaliza igual que los nombres.
+            limit (int): Número máximo de resultados.
+            kind (str): Restringir a 'product' o 'shop'.
+
+        Returns:
+            list[dict]: Resultados con `type`, `id`, `name` y `score`.
+        """
+        prefix = ' '.join(normalize(prefix).split())
+        if not prefix:
+            return []
+        code = None if kind is None else _KIND_CODES[kind]
+        with self._lock:
+            if len(prefix) <= SHORT_PREFIX_LENGTH and limit <= TOP_K:
+                top = self._top_list(prefix, code)[:limit]
+            else:
+                top = self._compute_top(prefix, self._range(prefix), self._rank(self._names, self._scores), limit)[(prefix, code)]
+            return [
+                {'type': KINDS[ref % 2], 'id': ref // 2, 'name': self._names[ref], 'score': self._scores[ref]}
+                for ref in top]
+
+    @staticmethod
+    def _rank(names, scores):
+        """Clave de orden: más popular primero y, a igual popularidad, el nombre más corto."""
+        return lambda ref: (-scores[ref], len(names[ref]), names[ref])
+
+    @staticmethod
+    def _compute_top(prefix, refs, rank, limit=TOP_K):
+        """Listas de las entradas más populares de un prefijo: todas, solo productos y solo tiendas."""
+        return {
+            (prefix, code): heapq.nsmallest(limit, refs if code is None else [ref for ref in refs if ref % 2 == code], key=rank)
+            for code in (None, *_KIND_CODES.values())}
+
+    def _range(self, prefix):
+        # Todas las claves con el prefijo forman un rango contiguo del arreglo ordenado
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + '\uffff', start)
+        return set(self._refs[start:end])
+
+    def _top_list(self, prefix, code):
+        if (prefix, code) in self._stale:
+            self._top.update(self._compute_top(prefix, self._range(prefix), self._rank(self._names, self._scores)))
+            self._stale.difference_update((prefix, other) for other in (None, *_KIND_CODES.values()))
+        return self._top.get((prefix, code), [])
+
+    def _rerank(self, ref, prefixes):
+        """Colocar una entrada nueva o más popular en las listas de sus prefijos cortos."""
+        rank = self._rank(self._names, self._scores)
+        for prefix in prefixes:
+            for code in (None, ref % 2):
+                top = self._top.setdefault((prefix, code), [])
+                if ref in top:
+                    top.remove(ref)
+                insort(top, ref, key=rank)
+                del top[TOP_K:]
+
+    def _demote(self, ref, prefixes):
+        """Recolocar una entrada que ha perdido popularidad en las listas de sus prefijos cortos."""
+        rank = self._rank(self._names, self._scores)
+        for prefix in prefixes:
+            for code in (None, ref % 2):
+                top = self._top.get((prefix, code))
+                if top and ref in top:
+                    top.remove(ref)
+                    insort(top, ref, key=rank)
+                    # Si la lista estaba completa, alguna entrada de fuera puede superarla ahora: recalcular al consultar
+                    if len(top) == TOP_K:
+                        self._stale.add((prefix, code))
+
+    def _remove(self, ref):
+        name = self._names.get(ref)
+        if name is None:
+            return
+        keys = _keys(name)
+        for key in keys:
+            position = bisect_left(self._keys, key)
+            while self._refs[position] != ref:
+                position += 1
+            del self._keys[position]
+            del self._refs[position]
+        # Si la lista estaba completa, la siguiente entrada del prefijo no está en ella: recalcular al consultar
+        for prefix in _short_prefixes(keys):
+            for code in (None, ref % 2):
+                top = self._top.get((prefix, code))
+                if top and ref in top:
+                    if len(top) == TOP_K:
+                        self._stale.add((prefix, code))
+                    top.remove(ref)
+        del self._names[ref]
+        del self._scores[ref]
+
+
+class Autocomplete:
+    """Autocompletado de nombres de productos y tiendas servido desde memoria.
+
+    El índice se construye desde la base de datos al arrancar (en segundo plano) o en la primera
+    consulta, y los servicios lo mantienen al día en cada alta, cambio de nombre, baja y venta (tanto
+    en el checkout como al crear, modificar o eliminar detalles de venta). Como cada proceso tiene su
+    propio índice, se reconstruye además cada `AUTOCOMPLETE_REFRESH` segundos para incorporar las
+    escrituras hechas por otros workers.
+
+    La popularidad de un producto son las unidades vendidas; la de una tienda, la suma de las de sus
+    productos.
+    """
+
+    # Lotes de altas a partir de este tamaño reconstruyen el índice en lugar de insertar uno a uno
+    BULK_RELOAD_SIZE = 500
+
+    def __init__(self):
+        self.index = PrefixIndex()
+        self.refresh = 0
+        self._app = None
+        self._db = None
+        self._models = None
+        self._shards = None
+        self._loaded_at = None
+        self._loading = threading.Lock()
+        self._reload_pending = False
+        self._journal = None  # escrituras recibidas durante una reconstrucción, para aplicarlas al terminar
+        self._journal_lock = threading.Lock()
+
+    def init_app(self, app, db, product, shop, detail, shards):
+        """Configurar el autocompletado y lanzar la carga inicial si está habilitada.
+
+        Args:
+            app (Flask): Aplicación.
+            db (SQLAlchemy): Extensión de base de datos.
+            product (Model): Modelo de productos.
+            shop (Model): Modelo de tiendas.
+            detail (Model): Modelo de detalles de venta (fuente de la popularidad).
+            shards (ShardRouter): Reparto por tienda de productos y detalles; se leen shard a shard.
+        """
+        self._app = app
+        self._db = db
+        self._models = (product, shop, detail)
+        self._shards = shards
+        self.refresh = app.config['AUTOCOMPLETE_REFRESH']
+        if app.config['AUTOCOMPLETE_PRELOAD']:
+            self._load_in_background()
+
+    def lookup(self, prefix, limit=10, kind=None):
+        """Consultar el índice, cargándolo antes si aún no se ha construido. Ver `PrefixIndex.lookup`."""
+        if self._loaded_at is None:
+            with self._loading:
+                if self._loaded_at is None:  # la carga inicial pudo terminar mientras se esperaba
+                    self._load()
+        elif self.refresh and time.monotonic() - self._loaded_at > self.refresh:
+            self._load_in_background()
+        return self.index.lookup(prefix, limit, kind)
+
+    def load(self):
+        """Construir el índice desde la base de datos (una consulta por tipo, leída por bloques)."""
+        with self._loading:
+            self._load()
+
+    def _load(self):
+        with self._journal_lock:
+            self._journal = []
+        product, shop, detail = self._models
+        entries, shop_scores = [], {}
+        # Los productos y sus ventas están en el mismo shard: la consulta se repite en cada uno
+        for _ in self._shards.each():
+            sold = (
+                select(detail.product_id, func.sum(detail.qnt_prod_sale).label('sold'))
+                .group_by(detail.product_id)
+                .subquery())
+            query = (
+                select(product.id, product.name, product.shop_id, func.coalesce(sold.c.sold, 0))
+                .outerjoin(sold, sold.c.product_id == product.id))
+            hidden = self._shards.hidden_shops()
+            if hidden:
+                query = query.where(product.shop_id.notin_(hidden))  # Copia de una tienda que se está moviendo
+            for product_id, name, shop_id, score in self._db.session.execute(query.execution_options(yield_per=10000)):
+                score = int(score)  # SUM puede devolver Decimal según el motor
+                entries.append(('product', product_id, name, score))
+                shop_scores[shop_id] = shop_scores.get(shop_id, 0) + score
+        for shop_id, name in self._db.session.execute(select(shop.id, shop.name)):
+            entries.append(('shop', shop_id, name, shop_scores.get(shop_id, 0)))
+        self.index.load(entries)
+
+        # Aplicar las escrituras confirmadas mientras se leía la base de datos
+        with self._journal_lock:
+            journal, self._journal = self._journal, None
+        for method, args in journal:
+            getattr(self.index, method)(*args)
+        self._loaded_at = time.monotonic()
+
+    def _load_in_background(self):
+        """Reconstruir el índice en un hilo aparte; las consultas siguen usando el índice anterior."""
+        if self._loading.locked():
+            self._reload_pending = True  # volver a cargar al terminar la reconstrucción en curso
+            return
+        if self._loaded_at is not None:
+            self._loaded_at = time.monotonic()  # evitar que cada consulta lance otra recarga mientras tanto
+
+        def run():
+            with self._app.app_context():
+                try:
+                    self.load()
+                    while self._reload_pending:
+                        self._reload_pending = False
+                        self.load()
+                except SQLAlchemyError as e:
+                    logger.warning('Autocomplete index not loaded: %s', e)
+                finally:
+                    self._db.session.remove()
+
+        threading.Thread(target=run, name='autocomplete-load', daemon=True).start()
+
+    # Mantenimiento incremental desde los servicios (después de confirmar la transacción)
+
+    def add(self, kind, entity_id, name):
+        """Registrar un alta o un cambio de nombre."""
+        self._apply('add', kind, entity_id, name)
+
+    def add_many(self, kind, rows):
+        """Registrar varias altas o cambios de nombre (por ejemplo, un lote de la importación masiva).
+
+        Args:
+            kind (str): Tipo de las entradas ('product' o 'shop').
+            rows (list): Tuplas (id, nombre).
+        """
+        if len(rows) >= self.BULK_RELOAD_SIZE and self._loaded_at is not None:
+            self._load_in_background()
+            return
+        for entity_id, name in rows:
+            self._apply('add', kind, entity_id, name)
+
+    def remove(self, kind, entity_id):
+        """Registrar una baja."""
+        self._apply('remove', kind, entity_id)
+
+    def record_sale(self, quantities, shops):
+        """Sumar a la popularidad las unidades vendidas en una venta (o restarlas, con cantidades negativas).
+
+        Args:
+            quantities (dict): Unidades vendidas por ID de producto (negativas al eliminar o reducir un detalle).
+            shops (dict): ID de la tienda de cada producto.
+        """
+        for product_id, quantity in quantities.items():
+            if not quantity:
+                continue
+            self._apply('bump', 'product', product_id, quantity)
+            self._apply('bump', 'shop', shops[product_id], quantity)
+
+    def _apply(self, method, *args):
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.append((method, args))
+        if self._loaded_at is not None:
+            getattr(self.index, method)(*args)
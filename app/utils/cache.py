@@ -0,0 +1,369 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.utils.lookup import chunks
+from app.utils.replicas import use_primary
+
+# Marcador para distinguir "no está en caché" de un valor almacenado
+MISSING = object()
+
+
+class LRUCache:
+    """Caché en memoria del proceso, acotada en número de entradas (LRU) y con caducidad (TTL)."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # clave -> (caducidad, valor), de menos a más recientemente usada
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Caché compartida entre procesos sobre un archivo SQLite.
+
+    Hace las veces de un backend compartido (Redis, Memcached) en entornos locales: todos los workers
+    que apuntan al mismo archivo ven las mismas entradas y las mismas invalidaciones.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()  # una conexión por hilo
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS entity_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM entity_cache WHERE key = ? AND expires_at >= ?', (key, time.time())).fetchone()
+        return MISSING if row is None else pickle.loads(row[0])
+
+    def set(self, key, value):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO entity_cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time() + self.ttl))
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM entity_cache WHERE key = ?', (key,))
+
+    def clear(self, prefix=''):
+        self._connection().execute('DELETE FROM entity_cache WHERE substr(key, 1, ?) = ?', (len(prefix), prefix))
+
+
+class EntityCache:
+    """Caché de lectura (read-through) de entidades por clave primaria.
+
+    Guarda los valores de las columnas de cada fila en dos niveles: una LRU con TTL en el proceso y,
+    opcionalmente, un backend compartido. En un acierto la entidad se reconstruye y se incorpora a la
+    sesión con `merge(load=False)`, sin ninguna consulta a la base de datos.
+
+    Las entradas se invalidan tras cada commit que modifique o elimine filas de los modelos registrados,
+    tanto por la unidad de trabajo del ORM como por sentencias UPDATE/DELETE/upsert masivas.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.local = None
+        self.shared = None
+        self._db = None
+        self._tables = {}  # nombre de tabla -> modelo registrado
+        self._loaders = {}  # nombre de tabla -> función que lee una entidad por clave primaria
+        self._batch_loaders = {}  # nombre de tabla -> función que lee varias entidades por claves primarias
+        self._stats_lock = threading.Lock()
+        self.stats = {'hits_local': 0, 'hits_shared': 0, 'misses': 0, 'invalidations': 0}
+
+    def init_app(self, app, db, singleflight):
+        """Configurar los niveles de caché y registrar los eventos de invalidación en la sesión.
+
+        Args:
+            app (Flask): Aplicación.
+            db (SQLAlchemy): Extensión de base de datos.
+            singleflight (SingleFlight): Agrupador con el que se comparten los fallos concurrentes de una misma clave.
+        """
+        self._db = db
+        self.singleflight = singleflight
+        backend = app.config['CACHE_BACKEND']
+        self.enabled = backend != 'none'
+        self.local = LRUCache(app.config['CACHE_MAXSIZE'], app.config['CACHE_TTL'])
+        if backend == 'sqlite':
+            path = app.config['CACHE_SQLITE_PATH'] or os.path.join(app.instance_path, 'cache.sqlite')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.shared = SQLiteCache(path, app.config['CACHE_SHARED_TTL'])
+
+        if not event.contains(db.session, 'before_flush', self._before_flush):
+            event.listen(db.session, 'before_flush', self._before_flush)
+            event.listen(db.session, 'after_flush', self._after_flush)
+            event.listen(db.session, 'do_orm_execute', self._do_orm_execute)
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    def register(self, model, load=None, load_many=None):
+        """Registrar un modelo cuyas filas se cachean por clave primaria.
+
+        Args:
+            model (Model): Modelo a cachear.
+            load (callable): Función `(modelo, clave)` que lee una entidad en un fallo; por defecto `session.get`.
+            load_many (callable): Función `(modelo, claves)` que lee varias entidades en los fallos de `get_many`
+                y devuelve un diccionario clave -> instancia; por defecto una consulta IN.
+        """
+        self._tables[model.__tablename__] = model
+        if load is not None:
+            self._loaders[model.__tablename__] = load
+        if load_many is not None:
+            self._batch_loaders[model.__tablename__] = load_many
+        return model
+
+    @staticmethod
+    def key(model, pk):
+        return f'{model.__tablename__}:{pk}'
+
+    def get(self, model, pk):
+        """Obtener una entidad por su clave primaria, consultando la base de datos solo en un fallo.
+
+        Los fallos concurrentes de la misma clave comparten una única consulta (single-flight), salvo si la
+        sesión actual tiene cambios sin confirmar de la entidad: esos no se comparten con otros hilos.
+
+        Args:
+            model (Model): Modelo registrado en la caché.
+            pk (int): Clave primaria de la entidad.
+
+        Returns:
+            Model: La entidad asociada a la sesión actual, o None si no existe.
+        """
+        key = self.key(model, pk)
+        if self.enabled:
+            payload = self._lookup(key)
+            if payload is not MISSING:
+                return self.materialize(model, payload)
+            self._count('misses')
+
+        if self._private(model, pk):
+            payload = self._load(model, pk, key)
+        else:
+            payload = self.singleflight.do(key, lambda: self._load(model, pk, key))
+        return None if payload is None else self.materialize(model, payload)
+
+    def get_many(self, model, pks):
+        """Obtener varias entidades por clave primaria, leyendo todos los fallos con consultas IN por bloques.
+
+        Args:
+            model (Model): Modelo registrado en la caché.
+            pks (iterable): Claves primarias (las repetidas se buscan una vez).
+
+        Returns:
+            dict: Clave primaria -> entidad asociada a la sesión actual, solo de las que existen.
+        """
+        found, misses = {}, []
+        for pk in dict.fromkeys(pks):
+            payload = self._lookup(self.key(model, pk)) if self.enabled else MISSING
+            if payload is MISSING:
+                misses.append(pk)
+            else:
+                found[pk] = self.materialize(model, payload)
+        if not misses:
+            return found
+
+        if self.enabled:
+            with self._stats_lock:
+                self.stats['misses'] += len(misses)
+        load = self._batch_loaders.get(model.__tablename__, self._select_many)
+        for chunk in chunks(misses):
+            # Como en `_load`: lo que se cachea se lee de la base principal
+            with use_primary() if self.enabled else nullcontext():
+                loaded = load(model, chunk)
+            for pk, instance in loaded.items():
+                if self.enabled and not self._private(model, pk):
+                    self._store(self.key(model, pk), self.payload(instance))
+                found[pk] = instance
+        return found
+
+    def invalidate(self, model, pk):
+        """Eliminar de la caché la entrada de una entidad."""
+        self._delete(self.key(model, pk))
+
+    def clear(self, model=None):
+        """Vaciar la caché completa o solo las entradas de un modelo."""
+        prefix = f'{model.__tablename__}:' if model is not None else ''
+        self.local.clear(prefix)
+        if self.shared is not None:
+            self.shared.clear(prefix)
+
+    def get_stats(self):
+        """Contadores de aciertos y fallos, junto con el número de entradas en memoria."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['local_size'] = len(self.local) if self.local is not None else 0
+        stats['backend'] = 'sqlite' if self.shared is not None else ('memory' if self.enabled else 'none')
+        return stats
+
+    @staticmethod
+    def payload(instance):
+        """Valores de las columnas de una entidad, en un diccionario serializable."""
+        return {attr.key: getattr(instance, attr.key) for attr in instance.__mapper__.column_attrs}
+
+    def materialize(self, model, payload):
+        """Reconstruir una entidad desde su payload e incorporarla a la sesión sin consultar la base de datos."""
+        instance = model.__mapper__.class_manager.new_instance()
+        for attr, value in payload.items():
+            set_committed_value(instance, attr, value)
+        make_transient_to_detached(instance)
+        return self._db.session.merge(instance, load=False)
+
+    def _load(self, model, pk, key):
+        """Leer la entidad de la base de datos y guardar su payload en la caché."""
+        load = self._loaders.get(model.__tablename__, self._db.session.get)
+        if self.enabled:
+            # Lo que se cachea se sirve a todos los clientes: una fila atrasada de una réplica se quedaría hasta CACHE_TTL
+            with use_primary():
+                instance = load(model, pk)
+        else:
+            instance = load(model, pk)
+        if instance is None:
+            return None
+        payload = self.payload(instance)
+        # No cachear cambios aún no confirmados de la sesión que realiza la lectura
+        if self.enabled and not self._private(model, pk):
+            self._store(key, payload)
+        return payload
+
+    def _private(self, model, pk):
+        """Si la sesión actual tiene cambios sin confirmar de la entidad, pendientes o ya enviados en la transacción."""
+        session = self._db.session
+        pending = session.info.get('entity_cache_pending')
+        if pending and (self.key(model, pk) in pending['keys'] or model.__tablename__ in pending['tables']):
+            return True
+        mapper = model.__mapper__
+        instance = session.identity_map.get(mapper.identity_key_from_primary_key((pk,)))
+        if instance is not None and (inspect(instance).modified or instance in session.deleted):
+            return True
+        # Una entidad nueva con esa clave se insertaría al leer (autoflush)
+        return any(isinstance(new, model) and mapper.primary_key_from_instance(new) == [pk] for new in session.new)
+
+    def _select_many(self, model, pks):
+        """Leer varias entidades por clave primaria con una consulta IN."""
+        column = model.__mapper__.primary_key[0]
+        return {getattr(instance, column.key): instance
+                for instance in self._db.session.scalars(select(model).where(column.in_(pks)))}
+
+    def _lookup(self, key):
+        payload = self.local.get(key)
+        if payload is not MISSING:
+            self._count('hits_local')
+            return payload
+        if self.shared is not None:
+            payload = self.shared.get(key)
+            if payload is not MISSING:
+                self._count('hits_shared')
+                self.local.set(key, payload)
+        return payload
+
+    def _store(self, key, payload):
+        self.local.set(key, payload)
+        if self.shared is not None:
+            self.shared.set(key, payload)
+
+    def _delete(self, key):
+        self._count('invalidations')
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    # Eventos de la sesión: se acumulan las claves afectadas y se invalidan al confirmar la transacción
+
+    def _pending(self, session):
+        return session.info.setdefault('entity_cache_pending', {'keys': set(), 'tables': set()})
+
+    def _before_flush(self, session, flush_context, instances):
+        for instance in list(session.dirty) + list(session.deleted):
+            table = getattr(instance, '__tablename__', None)
+            if table in self._tables:
+                pk = inspect(instance).identity
+                if pk is not None:
+                    self._pending(session)['keys'].add(f'{table}:{pk[0]}')
+
+    def _after_flush(self, session, flush_context):
+        # Las filas insertadas en la transacción ya tienen clave primaria, pero siguen sin confirmar
+        for instance in session.new:
+            table = getattr(instance, '__tablename__', None)
+            if table in self._tables:
+                self._pending(session)['keys'].add(f'{table}:{instance.__mapper__.primary_key_from_instance(instance)[0]}')
+
+    def _do_orm_execute(self, orm_execute_state):
+        """Detectar sentencias masivas (UPDATE, DELETE y upsert) sobre tablas cacheadas."""
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+            return
+        options = orm_execute_state.execution_options
+        if orm_execute_state.is_insert and not options.get('upsert'):
+            return  # un INSERT simple no modifica filas que puedan estar en caché
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is None or table.name not in self._tables:
+            return
+        pending = self._pending(orm_execute_state.session)
+        if 'cache_invalidate' in options:
+            # La sentencia indica qué claves primarias modifica: se invalidan solo esas entradas
+            pending['keys'].update(f'{table.name}:{pk}' for pk in options['cache_invalidate'])
+        else:
+            pending['tables'].add(table.name)
+
+    def _after_commit(self, session):
+        pending = session.info.pop('entity_cache_pending', None)
+        if not pending or not self.enabled:
+            return
+        for table in pending['tables']:
+            self.clear(self._tables[table])
+        for key in pending['keys']:
+            self._delete(key)
+
+    def _after_rollback(self, session):
+        session.info.pop('entity_cache_pending', None)
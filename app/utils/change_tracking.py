@@ -0,0 +1,104 @@
+from sqlalchemy import event, inspect, select
+
+from app.utils.upsert import upsert
+
+
+class ChangeTracker:
+    """Contadores de cambios por tabla y por ámbitos derivados (por ejemplo, los productos de una tienda).
+
+    Los contadores se incrementan en la misma transacción que la escritura, tanto si ésta pasa por la
+    unidad de trabajo del ORM como si es una sentencia masiva (UPDATE, DELETE o upsert). Una sentencia
+    masiva puede indicar los ámbitos que afecta con la opción de ejecución `change_scopes`; si no lo
+    hace, se incrementa además el ámbito `<tabla>:bulk`, que forma parte de todos los ETag de esa tabla.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._model = None
+        self._scopes = {}  # nombre de tabla -> función que devuelve los ámbitos derivados de una instancia
+
+    def init_app(self, app, db, model):
+        """Registrar los eventos de la sesión que incrementan los contadores.
+
+        Args:
+            app (Flask): Aplicación.
+            db (SQLAlchemy): Extensión de base de datos.
+            model (Model): Modelo que almacena los contadores.
+        """
+        self._db = db
+        self._model = model
+        if not event.contains(db.session, 'before_flush', self._before_flush):
+            event.listen(db.session, 'before_flush', self._before_flush)
+            event.listen(db.session, 'after_flush', self._bump_pending)
+            event.listen(db.session, 'do_orm_execute', self._do_orm_execute)
+            event.listen(db.session, 'before_commit', self._bump_pending)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    def register(self, model, scopes=None):
+        """Registrar un modelo cuyas escrituras incrementan el contador de su tabla.
+
+        Args:
+            model (Model): Modelo a seguir.
+            scopes (callable): Función opcional que recibe una instancia modificada y devuelve los ámbitos
+                adicionales que deben incrementarse.
+        """
+        self._scopes[model.__tablename__] = scopes
+        return model
+
+    def versions(self, *scopes):
+        """Leer con una sola consulta los valores actuales de varios contadores.
+
+        Returns:
+            tuple: Valores de los contadores, en el mismo orden que los ámbitos (0 si aún no existen).
+        """
+        model = self._model
+        values = dict(self._db.session.execute(select(model.scope, model.value).where(model.scope.in_(scopes))).all())
+        return tuple(values.get(scope, 0) for scope in scopes)
+
+    # Eventos de la sesión: se acumulan los ámbitos afectados y se incrementan antes de confirmar
+
+    def _pending(self, session):
+        return session.info.setdefault('change_scopes', set())
+
+    def _before_flush(self, session, flush_context, instances):
+        pending = self._pending(session)
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            table = getattr(instance, '__tablename__', None)
+            if table not in self._scopes:
+                continue
+            if instance in session.dirty and not session.is_modified(instance):
+                continue
+            pending.add(table)
+            if self._scopes[table] is not None:
+                pending.update(self._scopes[table](instance))
+
+    def _do_orm_execute(self, orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+            return
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is None or table.name not in self._scopes:
+            return
+        pending = self._pending(orm_execute_state.session)
+        pending.add(table.name)
+        scopes = orm_execute_state.execution_options.get('change_scopes')
+        if scopes is not None:
+            pending.update(scopes)
+        elif self._scopes[table.name] is not None:
+            pending.add(f'{table.name}:bulk')
+
+    def _bump_pending(self, session, *args):
+        """Incrementar los contadores acumulados, en orden para evitar bloqueos cruzados entre transacciones."""
+        pending = session.info.pop('change_scopes', None)
+        if pending:
+            upsert(session, self._model, [{'scope': scope, 'value': 1} for scope in sorted(pending)],
+                   index_elements=['scope'], increment=['value'])
+
+    def _after_rollback(self, session):
+        session.info.pop('change_scopes', None)
+
+
+def product_scopes(product):
+    """Ámbitos derivados de un producto: los productos de su tienda (y de la anterior si cambió de tienda)."""
+    history = inspect(product).attrs.shop_id.load_history()
+    shop_ids = set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+    return {f'Products:shop:{shop_id}' for shop_id in shop_ids if shop_id is not None}
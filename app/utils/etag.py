@@ -0,0 +1,43 @@
+import hashlib
+from functools import wraps
+
+from flask import Response, request
+from flask_restx.utils import unpack
+from werkzeug.http import quote_etag
+
+
+def make_etag(*parts):
+    """Construir un ETag fuerte a partir de las partes que identifican una versión del recurso."""
+    return hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def conditional(etag_for):
+    """Decorador de GET condicional: responde 304 si el ETag del recurso coincide con `If-None-Match`.
+
+    El ETag se calcula antes de ejecutar el método, por lo que un recurso sin cambios se responde sin
+    ejecutar la consulta del listado ni serializar nada. Debe colocarse por encima de `marshal_with`.
+
+    Args:
+        etag_for (callable): Función que recibe los argumentos de la ruta y devuelve el ETag actual del
+            recurso, o None si no puede calcularse (por ejemplo, si el recurso no existe).
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            etag = etag_for(**kwargs)
+            if etag is None:
+                return f(*args, **kwargs)
+            if request.if_none_match.contains_weak(etag):
+                return Response(status=304, headers={'ETag': quote_etag(etag)})
+
+            resp = f(*args, **kwargs)
+            if isinstance(resp, Response):
+                if resp.status_code == 200:
+                    resp.set_etag(etag)
+                return resp
+            data, code, headers = unpack(resp)
+            if code == 200:
+                headers = dict(headers or {}, ETag=quote_etag(etag))
+            return data, code, headers
+        return wrapper
+    return decorator
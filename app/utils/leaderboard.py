@@ -0,0 +1,342 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import insort
+
+from sqlalchemy import and_, delete, event, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.utils.replicas import use_primary
+from app.utils.upsert import increment_rows
+
+logger = logging.getLogger(__name__)
+
+# Ventanas del ranking: resolución de sus buckets (segundos) y número de buckets que abarca cada una
+WINDOWS = {
+    '1h': (60, 60),
+    '24h': (3600, 24),
+    '7d': (3600, 168),
+}
+RESOLUTIONS = sorted({resolution for resolution, _ in WINDOWS.values()})
+
+# Número máximo de productos de un ranking; las listas de cada ventana se mantienen con este tamaño
+TOP_K = 100
+
+# Segundos entre dos eliminaciones de los buckets que ya quedaron fuera de todas las ventanas
+PRUNE_INTERVAL = 3600
+
+_KEY_COLUMNS = ('resolution', 'bucket', 'shop_id', 'product_id')
+
+
+def _bucket(timestamp, resolution):
+    return int(timestamp // resolution)
+
+
+class _Window:
+    """Totales de una ventana deslizante y las listas de sus productos más vendidos (global y por tienda)."""
+
+    def __init__(self, resolution, span):
+        self.resolution = resolution
+        self.span = span
+        self.start = None  # primer bucket dentro de la ventana
+        self.totals = {}  # producto -> unidades en la ventana
+        self.by_shop = {}  # tienda -> {producto -> unidades}
+        self.top = {}  # tienda (None para todas) -> productos ordenados de más a menos vendido
+        self.stale = set()  # listas de `top` que deben recalcularse porque algún producto bajó
+
+    def change(self, shop_id, product_id, units):
+        """Sumar unidades (o restarlas, si son negativas) a un producto de la ventana."""
+        for key, totals in ((None, self.totals), (shop_id, self.by_shop.setdefault(shop_id, {}))):
+            total = totals.get(product_id, 0) + units
+            if total:
+                totals[product_id] = total
+            else:
+                totals.pop(product_id, None)
+            top = self.top.get(key)
+            if top is None or key in self.stale:
+                continue
+            if units > 0:
+                # Subir el producto en la lista (o entrar en ella, si supera al último)
+                if product_id in top:
+                    top.remove(product_id)
+                if total > 0:
+                    insort(top, product_id, key=self._rank(totals))
+                    del top[TOP_K:]
+            elif product_id in top:
+                # Al bajar, otro producto fuera de una lista completa podría adelantarlo: recalcular al consultar
+                if len(top) == TOP_K:
+                    self.stale.add(key)
+                else:
+                    top.remove(product_id)
+                    if total > 0:
+                        insort(top, product_id, key=self._rank(totals))
+
+    def ranking(self, shop_id):
+        """Productos de la ventana (o de una tienda) de más a menos vendido, hasta `TOP_K`."""
+        totals = self.totals if shop_id is None else self.by_shop.get(shop_id, {})
+        if shop_id not in self.top or shop_id in self.stale:
+            rank = self._rank(totals)
+            self.top[shop_id] = heapq.nsmallest(TOP_K, (product_id for product_id, units in totals.items() if units > 0), key=rank)
+            self.stale.discard(shop_id)
+        return [(product_id, totals[product_id]) for product_id in self.top[shop_id]]
+
+    @staticmethod
+    def _rank(totals):
+        # Más unidades primero y, a igualdad, el ID más bajo
+        return lambda product_id: (-totals.get(product_id, 0), product_id)
+
+
+class SlidingTopN:
+    """Contadores de ventas por producto en buckets de tiempo, con ventanas deslizantes y su top-N.
+
+    Cada venta se suma al bucket de su momento en cada resolución, y cada ventana (`WINDOWS`) mantiene
+    los totales de sus buckets: al avanzar el reloj se restan los buckets que salen de ella, y al sumar
+    una venta se recoloca el producto en las listas de más vendidos (`TOP_K`), así que una consulta
+    devuelve una lista ya ordenada. Las ventanas abarcan el bucket en curso y los anteriores completos:
+    su duración real está entre la nominal menos un bucket y la nominal.
+
+    No depende de Flask ni de la base de datos; las operaciones son seguras entre hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._buckets = {resolution: {} for resolution in RESOLUTIONS}  # resolución -> bucket -> {(tienda, producto) -> unidades}
+        self._windows = {name: _Window(*spec) for name, spec in WINDOWS.items()}
+        self._shops = {}  # producto -> tienda
+
+    def load(self, rows, now=None):
+        """Reemplazar todos los contadores.
+
+        Args:
+            rows (iterable): Tuplas (resolución, bucket, tienda, producto, unidades).
+            now (float): Momento actual (segundos desde la época); por defecto el reloj del sistema.
+        """
+        buckets = {resolution: {} for resolution in RESOLUTIONS}
+        for resolution, bucket, shop_id, product_id, units in rows:
+            if resolution in buckets and units:
+                buckets[resolution].setdefault(bucket, {})[(shop_id, product_id)] = units
+        with self._lock:
+            self._buckets = buckets
+            self._windows = {name: _Window(*spec) for name, spec in WINDOWS.items()}
+            self._shops = {product_id: shop_id for counts in buckets.values() for bucket in counts.values() for shop_id, product_id in bucket}
+            self._advance(time.time() if now is None else now)
+
+    def add(self, timestamp, lines):
+        """Sumar las unidades de unos detalles de venta registrados en un momento dado.
+
+        Args:
+            timestamp (float): Momento del registro (segundos desde la época).
+            lines (iterable): Tuplas (tienda, producto, unidades); las unidades negativas restan.
+        """
+        with self._lock:
+            for shop_id, product_id, units in lines:
+                for resolution in RESOLUTIONS:
+                    self._add(resolution, _bucket(timestamp, resolution), shop_id, product_id, units)
+
+    def replace(self, resolution, bucket, counts):
+        """Sustituir el contenido de un bucket por el leído de la base de datos.
+
+        Args:
+            resolution (int): Resolución del bucket.
+            bucket (int): Número del bucket.
+            counts (dict): Unidades por (tienda, producto).
+        """
+        with self._lock:
+            current = self._buckets[resolution].get(bucket, {})
+            for key in current.keys() | counts.keys():
+                difference = counts.get(key, 0) - current.get(key, 0)
+                if difference:
+                    self._add(resolution, bucket, *key, difference)
+
+    def buckets(self, resolution, since):
+        """Números de los buckets guardados de una resolución a partir de uno dado."""
+        with self._lock:
+            return {bucket for bucket in self._buckets[resolution] if bucket >= since}
+
+    def top(self, window, limit=TOP_K, shop_id=None, now=None):
+        """Productos más vendidos de una ventana, de más a menos unidades.
+
+        Args:
+            window (str): Ventana ('1h', '24h' o '7d').
+            limit (int): Número máximo de productos (como mucho `TOP_K`).
+            shop_id (int): Restringir a los productos de una tienda.
+            now (float): Momento actual (segundos desde la época); por defecto el reloj del sistema.
+
+        Returns:
+            list: Tuplas (producto, tienda, unidades) con unidades positivas.
+        """
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+            return [(product_id, self._shops.get(product_id, shop_id), units)
+                    for product_id, units in self._windows[window].ranking(shop_id)[:limit]]
+
+    def _add(self, resolution, bucket, shop_id, product_id, units):
+        counts = self._buckets[resolution].setdefault(bucket, {})
+        total = counts.get((shop_id, product_id), 0) + units
+        if total:
+            counts[(shop_id, product_id)] = total
+        else:
+            counts.pop((shop_id, product_id), None)
+        self._shops[product_id] = shop_id
+        for window in self._windows.values():
+            if window.resolution == resolution and window.start is not None and bucket >= window.start:
+                window.change(shop_id, product_id, units)
+
+    def _advance(self, now):
+        """Desplazar las ventanas hasta el momento actual, restando los buckets que salen de ellas."""
+        for window in self._windows.values():
+            buckets = self._buckets[window.resolution]
+            start = _bucket(now, window.resolution) - window.span + 1
+            if window.start is None:
+                window.start = start
+                for bucket, counts in buckets.items():
+                    if bucket >= start:
+                        for (shop_id, product_id), units in counts.items():
+                            window.change(shop_id, product_id, units)
+            elif start > window.start:
+                for bucket in sorted(bucket for bucket in buckets if window.start <= bucket < start):
+                    for (shop_id, product_id), units in buckets[bucket].items():
+                        window.change(shop_id, product_id, -units)
+                window.start = start
+
+        # Descartar los buckets que ya no están en ninguna ventana
+        for resolution, buckets in self._buckets.items():
+            oldest = min(window.start for window in self._windows.values() if window.resolution == resolution)
+            for bucket in [bucket for bucket in buckets if bucket < oldest]:
+                del buckets[bucket]
+
+
+class Leaderboard:
+    """Ranking de los productos más vendidos por ventanas de tiempo, servido desde memoria.
+
+    Las escrituras de detalles de venta registran sus unidades con `record`, que las suma a los buckets
+    guardados (`ProductSalesBucket`) en su misma transacción y, al confirmarla, a los contadores en
+    memoria (`SlidingTopN`). Los contadores se cargan de la base de datos en la primera consulta, así
+    que el ranking sobrevive a los reinicios; como cada proceso tiene los suyos, cada
+    `LEADERBOARD_REFRESH` segundos se releen los buckets recientes, que incluyen las ventas registradas
+    por otros workers. Los buckets guardados que quedan fuera de todas las ventanas se eliminan en esa
+    misma relectura, como mucho una vez por hora.
+
+    Las ventas se cuentan en el momento en que se registra el detalle (las ventas solo guardan el día):
+    una baja o una corrección resta sus unidades en ese momento, no en el de la venta original.
+    """
+
+    def __init__(self):
+        self.counters = SlidingTopN()
+        self.refresh = 0
+        self._db = None
+        self._model = None
+        self._loaded = False
+        self._loading = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._refreshed_at = None
+        self._since = {}  # resolución -> primer bucket que se relee en la siguiente relectura
+        self._pruned_at = None
+
+    def init_app(self, app, db, model):
+        """Configurar el ranking y registrar los eventos de la sesión que lo actualizan al confirmar.
+
+        Args:
+            app (Flask): Aplicación.
+            db (SQLAlchemy): Extensión de base de datos.
+            model (Model): Modelo de los buckets guardados (en la base global).
+        """
+        self._db = db
+        self._model = model
+        self.refresh = app.config['LEADERBOARD_REFRESH']
+        if not event.contains(db.session, 'after_commit', self._after_commit):
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    def record(self, session, lines, timestamp=None):
+        """Registrar las unidades de unos detalles de venta en la transacción de la sesión.
+
+        Args:
+            session (Session): Sesión de la escritura; los contadores en memoria se actualizan al confirmarla.
+            lines (iterable): Tuplas (tienda, producto, unidades); las unidades negativas restan (bajas).
+            timestamp (float): Momento del registro; por defecto el reloj del sistema.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        lines = [line for line in lines if line[2]]
+        if not lines:
+            return
+        increment_rows(session, self._model, _KEY_COLUMNS, ('units',), [
+            ((resolution, _bucket(timestamp, resolution), shop_id, product_id), (units,))
+            for shop_id, product_id, units in lines for resolution in RESOLUTIONS])
+        session.info.setdefault('leaderboard_pending', []).append((timestamp, lines))
+
+    def top(self, window, limit=TOP_K, shop_id=None):
+        """Consultar el ranking, cargándolo antes si aún no se ha leído. Ver `SlidingTopN.top`."""
+        if not self._loaded:
+            with self._loading:
+                if not self._loaded:  # la carga pudo terminar mientras se esperaba
+                    self.load()
+        elif self.refresh and time.monotonic() - self._refreshed_at > self.refresh:
+            # Una sola relectura a la vez; las consultas concurrentes usan los contadores actuales
+            if self._refreshing.acquire(blocking=False):
+                try:
+                    self._refresh()
+                except SQLAlchemyError as e:
+                    logger.warning('Leaderboard not refreshed: %s', e)
+                finally:
+                    self._refreshing.release()
+        return self.counters.top(window, limit, shop_id)
+
+    def load(self):
+        """Cargar los contadores con los buckets guardados que están dentro de alguna ventana."""
+        now = time.time()
+        since = self._oldest_buckets(now)
+        self.counters.load(self._read(since), now)
+        self._mark_refreshed(now)
+        self._loaded = True
+
+    def _refresh(self):
+        """Releer de la base de datos los buckets que pudieron cambiar desde la relectura anterior."""
+        now = time.time()
+        rows = self._read(self._since)
+        buckets = {(resolution, bucket): {} for resolution, since in self._since.items()
+                   for bucket in self.counters.buckets(resolution, since)}
+        for resolution, bucket, shop_id, product_id, units in rows:
+            buckets.setdefault((resolution, bucket), {})[(shop_id, product_id)] = units
+        for (resolution, bucket), counts in buckets.items():
+            self.counters.replace(resolution, bucket, counts)
+        self._mark_refreshed(now)
+
+        if self._pruned_at is None or now - self._pruned_at > PRUNE_INTERVAL:
+            self._pruned_at = now
+            model = self._model
+            with self._db.engine.begin() as conn:
+                for resolution, bucket in self._oldest_buckets(now).items():
+                    conn.execute(delete(model).where(model.resolution == resolution, model.bucket < bucket))
+
+    def _read(self, since):
+        """Buckets guardados a partir de un bucket dado de cada resolución (de la base principal: una réplica
+        retrasada desharía en memoria las ventas que este proceso acaba de registrar)."""
+        model = self._model
+        with use_primary():
+            return self._db.session.execute(
+                select(model.resolution, model.bucket, model.shop_id, model.product_id, model.units).where(
+                    or_(*(and_(model.resolution == resolution, model.bucket >= bucket) for resolution, bucket in since.items())))).all()
+
+    def _mark_refreshed(self, now):
+        # Un bucket anterior al actual aún puede recibir escrituras de transacciones que empezaron antes
+        self._since = {resolution: _bucket(now, resolution) - 1 for resolution in RESOLUTIONS}
+        self._refreshed_at = time.monotonic()
+
+    @staticmethod
+    def _oldest_buckets(now):
+        """Primer bucket de cada resolución que está dentro de alguna ventana."""
+        return {resolution: min(_bucket(now, resolution) - span + 1 for res, span in WINDOWS.values() if res == resolution)
+                for resolution in RESOLUTIONS}
+
+    # Eventos de la sesión: las unidades registradas pasan a memoria al confirmar la transacción
+
+    def _after_commit(self, session):
+        pending = session.info.pop('leaderboard_pending', None)
+        if pending and self._loaded:
+            for timestamp, lines in pending:
+                self.counters.add(timestamp, lines)
+
+    def _after_rollback(self, session):
+        session.info.pop('leaderboard_pending', None)
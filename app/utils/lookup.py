@@ -0,0 +1,78 @@
+from flask import current_app
+from flask_restx import fields
+
+# IDs por consulta IN: las listas más largas se leen en varias consultas (SQLite antiguo admite 999 parámetros)
+CHUNK_SIZE = 500
+
+
+def parse_ids(value):
+    """Convertir el parámetro `?ids=` (IDs separados por comas) en una lista de enteros.
+
+    Args:
+        value (str): IDs separados por comas.
+
+    Returns:
+        list: IDs en el orden recibido, con repeticiones.
+
+    Raises:
+        ValueError: Si algún ID no es un entero o la lista está vacía o supera `LOOKUP_MAX_IDS`.
+    """
+    parts = [part.strip() for part in value.split(',') if part.strip()]
+    try:
+        ids = [int(part) for part in parts]
+    except ValueError:
+        raise ValueError('Invalid ids: expected comma-separated integers')
+    return check_ids(ids)
+
+
+def check_ids(ids):
+    """Validar el tamaño de una lista de IDs pedida por un cliente.
+
+    Raises:
+        ValueError: Si la lista está vacía o supera `LOOKUP_MAX_IDS`.
+    """
+    if not ids:
+        raise ValueError('No ids given')
+    limit = current_app.config['LOOKUP_MAX_IDS']
+    if len(ids) > limit:
+        raise ValueError(f'Too many ids: at most {limit} per request')
+    return ids
+
+
+def chunks(ids, size=CHUNK_SIZE):
+    """Recorrer los IDs distintos en bloques de como mucho `size`, para consultas IN acotadas."""
+    unique = list(dict.fromkeys(ids))
+    for start in range(0, len(unique), size):
+        yield unique[start:start + size]
+
+
+def lookup_response(ids, entities, serializer, names=None):
+    """Respuesta de una búsqueda por lista de IDs: una entrada por ID pedido, en el mismo orden.
+
+    Args:
+        ids (list): IDs pedidos (con repeticiones, si las hay).
+        entities (dict): Entidades encontradas por ID.
+        serializer (RowSerializer): Serializador de las entidades.
+        names (list): Campos de salida, o None para todos.
+
+    Returns:
+        dict: `items` (cada uno con `id`, `found` y `data`, nulo si no existe) y `missing` (IDs no encontrados).
+    """
+    dumped = dict(zip(entities, serializer.dump(list(entities.values()), names)))
+    return {
+        'items': [{'id': pk, 'found': pk in dumped, 'data': dumped.get(pk)} for pk in ids],
+        'missing': [pk for pk in dict.fromkeys(ids) if pk not in dumped],
+    }
+
+
+def lookup_model(ns, name, model):
+    """Modelo de salida (documentación de Swagger) de la búsqueda por lista de IDs de un recurso."""
+    item = ns.model(f'{name}LookupItem', {
+        'id': fields.Integer(description='ID pedido'),
+        'found': fields.Boolean(description='Si el recurso existe'),
+        'data': fields.Nested(model, allow_null=True, description='El recurso, o null si no existe'),
+    })
+    return ns.model(f'{name}Lookup', {
+        'items': fields.List(fields.Nested(item), description='Un elemento por ID pedido, en el mismo orden'),
+        'missing': fields.List(fields.Integer, description='IDs pedidos que no existen'),
+    })
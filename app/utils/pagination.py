@@ -0,0 +1,140 @@
+import base64
+import heapq
+import json
+from collections import namedtuple
+from itertools import islice
+from urllib.parse import urlencode
+
+from flask import current_app, request
+from flask_restx import reqparse
+from sqlalchemy import and_, or_
+
+# Resultado de una consulta paginada: los elementos de la página y el cursor opaco de la siguiente (o None)
+Page = namedtuple('Page', ['items', 'next_cursor'])
+
+# Parámetros comunes de paginación; cada controlador lo copia y añade sus propios filtros
+pagination_parser = reqparse.RequestParser()
+pagination_parser.add_argument('limit', type=int, location='args', help='Número máximo de elementos por página')
+pagination_parser.add_argument('after', type=str, location='args', help='Cursor de la página siguiente (cabecera Link)')
+
+
+def encode_cursor(values):
+    """Codificar los valores de la clave de paginación en un cursor opaco.
+
+    Args:
+        values (list): Valores de las columnas clave del último elemento de la página.
+
+    Returns:
+        str: Cursor en base64 apto para URL.
+    """
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *converters):
+    """Decodificar un cursor opaco generado por `encode_cursor`.
+
+    Args:
+        cursor (str): Cursor recibido en el parámetro `after`.
+        *converters (callable): Conversión a aplicar a cada valor de la clave, en orden.
+
+    Returns:
+        tuple: Valores de la clave ya convertidos.
+
+    Raises:
+        ValueError: Si el cursor no es válido.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(converters):
+            raise ValueError
+        return tuple(convert(value) for convert, value in zip(converters, values))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_page(query, key_columns, limit, after=None):
+    """Obtener una página de resultados usando paginación por clave (keyset).
+
+    En lugar de OFFSET se filtra por los valores de la clave del último elemento entregado,
+    por lo que el coste de cada página es constante sin importar su profundidad.
+
+    Args:
+        query (Query): Consulta base (con los filtros ya aplicados).
+        key_columns (list): Columnas que forman la clave de orden; la última debe ser única (el ID).
+        limit (int): Número máximo de elementos de la página.
+        after (tuple): Valores de la clave a partir de los cuales continuar, o None para la primera página.
+
+    Returns:
+        Page: Elementos de la página y cursor de la siguiente página (None si es la última).
+    """
+    if after is not None:
+        query = query.filter(_after_clause(key_columns, after))
+
+    # Se pide un elemento extra para saber si existe una página siguiente
+    rows = query.order_by(*key_columns).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], column.key) for column in key_columns)
+    return Page(rows, next_cursor)
+
+
+def merge_pages(pages, key_columns, limit):
+    """Combinar las páginas de una misma consulta en varios shards en una sola página ordenada por la clave.
+
+    Cada página ya viene ordenada y con como máximo `limit` elementos: se mezclan con `heapq.merge` y
+    se conservan los `limit` primeros. Hay página siguiente si sobran elementos o si algún shard tenía
+    más; su cursor es la clave del último elemento entregado, con la que cada shard continúa por su cuenta.
+
+    Args:
+        pages (list): Páginas de `keyset_page`, una por shard.
+        key_columns (list): Columnas de la clave de orden, las mismas de `keyset_page`.
+        limit (int): Número máximo de elementos de la página.
+
+    Returns:
+        Page: Elementos de la página combinada y cursor de la siguiente página.
+    """
+    if len(pages) == 1:
+        return pages[0]
+    names = [column.key for column in key_columns]
+
+    def key(row):
+        return tuple(getattr(row, name) for name in names)
+
+    items = list(islice(heapq.merge(*(page.items for page in pages), key=key), limit))
+    more = sum(len(page.items) for page in pages) > limit or any(page.next_cursor for page in pages)
+    return Page(items, encode_cursor(key(items[-1])) if more and items else None)
+
+
+def _after_clause(key_columns, values):
+    """Construir `(c1, c2, ...) > (v1, v2, ...)` expandido para que el motor pueda usar el índice."""
+    column, value = key_columns[0], values[0]
+    if len(key_columns) == 1:
+        return column > value
+    return or_(column > value, and_(column == value, _after_clause(key_columns[1:], values[1:])))
+
+
+def page_limit(limit):
+    """Normalizar el tamaño de página solicitado según la configuración de la aplicación."""
+    if not limit or limit < 1:
+        return current_app.config['PAGE_SIZE_DEFAULT']
+    return min(limit, current_app.config['PAGE_SIZE_MAX'])
+
+
+def next_link_headers(next_cursor):
+    """Construir la cabecera `Link` con la URL de la siguiente página.
+
+    Args:
+        next_cursor (str): Cursor de la siguiente página, o None si no hay más resultados.
+
+    Returns:
+        dict: Cabeceras a añadir a la respuesta.
+    """
+    if next_cursor is None:
+        return {}
+    args = request.args.to_dict(flat=False)
+    args['after'] = [next_cursor]
+    return {'Link': f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'}
@@ -0,0 +1,64 @@
+def parse_fields(value, model):
+    """Validar el parámetro `?fields=` de un listado contra los campos de su modelo de salida.
+
+    Args:
+        value (str): Nombres de campos separados por comas, o None/vacío para todos los campos.
+        model (Model): Modelo de flask-restx con el que se serializa el listado.
+
+    Returns:
+        list: Campos solicitados, siempre con `id` en primer lugar, o None si no se pidió una proyección.
+
+    Raises:
+        ValueError: Si algún campo no existe en el modelo.
+    """
+    if not value:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in model]
+    if unknown:
+        raise ValueError('Unknown field: {}'.format(', '.join(unknown)))
+    return list(dict.fromkeys(['id', *names]))
+
+
+def parse_expand(value, allowed):
+    """Validar el parámetro `?expand=` de un recurso contra las relaciones que puede incluir.
+
+    Cada relación se indica con su ruta separada por puntos (p. ej. `details.product`); pedir una
+    relación anidada incluye también las anteriores de su ruta.
+
+    Args:
+        value (str): Rutas separadas por comas, o None/vacío para no incluir ninguna relación.
+        allowed (iterable): Rutas que admite el recurso.
+
+    Returns:
+        frozenset: Rutas incluidas (vacío si no se pidió ninguna).
+
+    Raises:
+        ValueError: Si alguna ruta no está admitida.
+    """
+    paths = [path.strip() for path in (value or '').split(',') if path.strip()]
+    unknown = [path for path in paths if path not in allowed]
+    if unknown:
+        raise ValueError('Unknown expand: {}'.format(', '.join(unknown)))
+    return frozenset(path.rsplit('.', depth)[0] for path in paths for depth in range(path.count('.') + 1))
+
+
+def project_query(query, entity, names, required=('id',)):
+    """Restringir las columnas que lee la consulta a los campos solicitados.
+
+    La consulta devuelve filas (no instancias del ORM) con solo esas columnas, más las `required`
+    que necesita la paginación por clave.
+
+    Args:
+        query (Query): Consulta sobre la entidad, con los filtros ya aplicados.
+        entity (Model): Modelo cuyas columnas tienen los mismos nombres que los campos de salida.
+        names (list): Campos solicitados, como los devuelve `parse_fields`, o None para no proyectar.
+        required (tuple): Columnas que deben leerse aunque no se hayan solicitado.
+
+    Returns:
+        Query: La consulta proyectada, o la original si `names` es None.
+    """
+    if names is None:
+        return query
+    columns = dict.fromkeys([*required, *names])
+    return query.with_entities(*(getattr(entity, name) for name in columns))
@@ -0,0 +1,215 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.elements import TextClause
+
+# Prefijo de los binds (SQLALCHEMY_BINDS) que son réplicas de lectura de la base principal
+REPLICA_PREFIX = 'replica'
+
+# Métodos HTTP de solo lectura, cuyas consultas pueden ir a una réplica
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Rutas de lectura marcadas con `replica_read` y bloques forzados a la base principal con `use_primary`
+_replica_read = ContextVar('replica_read', default=False)
+_primary = ContextVar('primary', default=False)
+
+
+def replica_read(f):
+    """Decorador de los métodos de servicio de solo lectura: sus consultas pueden ir a una réplica.
+
+    Dentro de una solicitud, lo que decide es el método HTTP (las solicitudes de escritura leen siempre
+    de la base principal); fuera de ellas (comandos de la CLI, tareas) solo van a una réplica las
+    lecturas hechas dentro de un método con este decorador.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        token = _replica_read.set(True)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _replica_read.reset(token)
+    return wrapper
+
+
+@contextmanager
+def use_primary():
+    """Leer de la base principal dentro del bloque, aunque la solicitud pudiera usar una réplica."""
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+class RoutingSession(Session):
+    """Sesión que envía las lecturas a una réplica y las escrituras a la base principal.
+
+    Una sesión que ha escrito (flush o sentencia INSERT/UPDATE/DELETE) lee de la principal hasta que
+    se cierra, para ver sus propios cambios. Cada sesión usa una única réplica mientras dura.
+
+    Con shards (`ShardRouter`), las sentencias sobre tablas repartidas van al shard del contexto y, en
+    el flush, cada instancia se escribe en el shard del que se cargó; las réplicas son solo de la base global.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            shards = current_app.extensions.get('shards')
+            if shards is not None and shards.keys and shards.is_sharded(mapper, clause):
+                return shards.engine(kwargs.get('shard'))
+            router = current_app.extensions.get('replicas')
+            if router is not None and router.keys:
+                if self._flushing or _is_write(clause):
+                    self.info['replica_wrote'] = True
+                elif not self.info.get('replica_wrote') and router.reads_from_replica():
+                    engine = router.engine_for(self)
+                    if engine is not None:
+                        return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+    @property
+    def connection_callable(self):
+        # La unidad de trabajo pide la conexión de cada instancia solo si este atributo no es None
+        shards = current_app.extensions.get('shards')
+        return self._connection_for_instance if shards is not None and shards.keys else None
+
+    def _connection_for_instance(self, mapper, instance):
+        shards = current_app.extensions['shards']
+        if shards.is_sharded(mapper):
+            return self.connection(bind_arguments={'bind': self._db.engines[shards.shard_of_instance(instance)]})
+        return self.connection(bind_arguments={'mapper': mapper})
+
+
+def _is_write(clause):
+    if clause is None:
+        return False
+    # Las sentencias de texto pueden escribir; SELECT ... FOR UPDATE bloquea filas de la principal
+    return getattr(clause, 'is_dml', False) or isinstance(clause, TextClause) or getattr(clause, '_for_update_arg', None) is not None
+
+
+class ReplicaRouter:
+    """Enrutado de lecturas a réplicas de la base de datos, con lectura de las propias escrituras.
+
+    Las réplicas son los binds `replica_*` de `SQLALCHEMY_BINDS` (`DATABASE_REPLICA_URLS`). Las consultas
+    de las solicitudes GET y de los métodos de servicio con `replica_read` van a una réplica elegida al
+    azar; todo lo demás, a la principal. Tras una solicitud de escritura, la respuesta fija una cookie
+    con la que las lecturas de ese cliente siguen yendo a la principal durante `REPLICA_STICKY_SECONDS`,
+    el margen para que la réplica reciba sus cambios.
+
+    Una réplica que falla la comprobación de conexión (`SELECT 1`, como máximo cada
+    `REPLICA_CHECK_INTERVAL` segundos) o pierde la conexión queda fuera durante `REPLICA_RETRY_SECONDS`,
+    y mientras tanto sus lecturas van a otra réplica o a la principal.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.sticky_seconds = 0
+        self.cookie_name = 'read_primary_until'
+        self._check_interval = 0
+        self._retry_seconds = 0
+        self._checked = {}  # bind -> momento de la última comprobación correcta
+        self._down_until = {}  # bind -> momento hasta el que la réplica queda fuera
+        self._binds = {}  # motor -> bind
+        self.stats = {'replica_sessions': 0, 'sticky_reads': 0, 'fallbacks': 0, 'failures': 0}
+
+    def init_app(self, app, db):
+        """Detectar las réplicas configuradas y registrar el hook que fija la cookie de lectura en la principal.
+
+        Args:
+            app (Flask): Aplicación.
+            db (SQLAlchemy): Extensión de base de datos (ya inicializada con la aplicación).
+        """
+        app.extensions['replicas'] = self
+        self.keys = sorted(key for key in app.config['SQLALCHEMY_BINDS'] if key.startswith(REPLICA_PREFIX))
+        if not self.keys:
+            return
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        self.cookie_name = app.config['REPLICA_STICKY_COOKIE']
+        self._check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        self._retry_seconds = app.config['REPLICA_RETRY_SECONDS']
+        with app.app_context():
+            for key in self.keys:
+                engine = db.engines[key]
+                self._binds[engine] = key
+                if not event.contains(engine, 'handle_error', self._handle_error):
+                    event.listen(engine, 'handle_error', self._handle_error)
+        app.after_request(self._after_request)
+
+    def reads_from_replica(self):
+        """Si las lecturas en el contexto actual pueden ir a una réplica."""
+        if _primary.get():
+            return False
+        if not has_request_context():
+            return _replica_read.get()
+        if request.method not in SAFE_METHODS:
+            return False
+        until = request.cookies.get(self.cookie_name)
+        if until and _float(until) > time.time():
+            self.stats['sticky_reads'] += 1
+            return False
+        return True
+
+    def engine_for(self, session):
+        """Réplica de la sesión (la misma mientras dure), o None si no hay ninguna disponible."""
+        engines = session._db.engines
+        key = session.info.get('replica_bind')
+        if key is not None and self._available(key, engines[key]):
+            return engines[key]
+        candidates = [key for key in self.keys if self._available(key, engines[key])]
+        if not candidates:
+            self.stats['fallbacks'] += 1
+            return None
+        key = session.info['replica_bind'] = random.choice(candidates)
+        self.stats['replica_sessions'] += 1
+        return engines[key]
+
+    def get_stats(self):
+        """Contadores de sesiones servidas por réplicas, lecturas fijadas a la principal y fallos."""
+        now = time.monotonic()
+        stats = dict(self.stats)
+        stats['replicas'] = {key: 'down' if self._down_until.get(key, 0) > now else 'up' for key in self.keys}
+        return stats
+
+    def _available(self, key, engine):
+        now = time.monotonic()
+        if self._down_until.get(key, 0) > now:
+            return False
+        if now - self._checked.get(key, float('-inf')) < self._check_interval:
+            return True
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql('SELECT 1')
+        except Exception:
+            self._mark_down(key)
+            return False
+        self._checked[key] = now
+        return True
+
+    def _mark_down(self, key):
+        self.stats['failures'] += 1
+        self._down_until[key] = time.monotonic() + self._retry_seconds
+        self._checked.pop(key, None)
+
+    def _handle_error(self, context):
+        key = self._binds.get(context.engine)
+        if key is not None and context.is_disconnect:
+            self._mark_down(key)
+
+    def _after_request(self, response):
+        # Tras una escritura, el cliente lee de la principal hasta que la réplica tenga sus cambios
+        if request.method not in SAFE_METHODS and response.status_code < 400 and self.sticky_seconds:
+            response.set_cookie(self.cookie_name, f'{time.time() + self.sticky_seconds:.3f}',
+                                max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+def _float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
@@ -0,0 +1,210 @@
+import re
+import unicodedata
+from collections import Counter
+
+from sqlalchemy import case, delete, event, func, insert, inspect, select, union_all
+from sqlalchemy.dialects.mysql import match as mysql_match
+
+# Los términos se normalizan a minúsculas ASCII, por lo que solo contienen letras y dígitos
+_WORD_RE = re.compile(r'[a-z0-9]+')
+# Bloques Unicode de marcas diacríticas combinables (acentos, tildes, diéresis...) que quedan tras NFKD
+_COMBINING_RE = re.compile('[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]')
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+# Peso de un término según el campo en el que aparece
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+
+def normalize(text):
+    """Pasar un texto a minúsculas y eliminar los acentos y diacríticos."""
+    if not text or text.isascii():
+        return (text or '').lower()
+    return _COMBINING_RE.sub('', unicodedata.normalize('NFKD', text)).lower()
+
+
+def tokenize(text):
+    """Dividir un texto en términos normalizados, descartando los de una sola letra."""
+    return [token[:MAX_TOKEN_LENGTH] for token in _WORD_RE.findall(normalize(text)) if len(token) > 1]
+
+
+def product_tokens(name, description):
+    """Términos de un producto con su peso: la suma de los pesos de los campos en los que aparecen."""
+    weights = Counter()
+    for token in set(tokenize(name)):
+        weights[token] += NAME_WEIGHT
+    for token in set(tokenize(description)):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+class SearchIndex:
+    """Índice invertido de términos de productos, mantenido en la misma transacción que las escrituras.
+
+    Las altas, modificaciones del nombre o la descripción y las bajas hechas a través de la unidad de
+    trabajo del ORM actualizan el índice automáticamente. Las escrituras masivas (upsert de la
+    importación) deben llamar a `reindex` con las filas afectadas.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._model = None
+        self._source = None
+        self.backend = 'index'
+        self.min_prefix = 2
+        self.max_expansions = 50
+
+    def init_app(self, app, db, model):
+        """Registrar los eventos de la sesión que mantienen el índice.
+
+        Args:
+            app (Flask): Aplicación.
+            db (SQLAlchemy): Extensión de base de datos.
+            model (Model): Modelo que almacena el índice invertido.
+        """
+        self._db = db
+        self._model = model
+        self.backend = app.config['SEARCH_BACKEND']
+        self.min_prefix = app.config['SEARCH_MIN_PREFIX']
+        self.max_expansions = app.config['SEARCH_MAX_EXPANSIONS']
+        if not event.contains(db.session, 'before_flush', self._before_flush):
+            event.listen(db.session, 'before_flush', self._before_flush)
+            event.listen(db.session, 'after_flush', self._after_flush)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    def register(self, model):
+        """Registrar el modelo indexado (debe tener las columnas `id`, `name` y `description`)."""
+        self._source = model
+        return model
+
+    def match(self, terms):
+        """Subconsulta (product_id, score) con los productos que contienen todos los términos.
+
+        El último término se busca como prefijo (búsqueda mientras se escribe) si tiene al menos
+        `SEARCH_MIN_PREFIX` caracteres; los demás, como palabra completa.
+
+        Args:
+            terms (list): Términos normalizados de la búsqueda, como los devuelve `tokenize`.
+
+        Returns:
+            Subquery: Productos coincidentes con su puntuación (mayor es más relevante).
+        """
+        if self.backend == 'fulltext' and self._db.session.get_bind().dialect.name == 'mysql':
+            return self._match_fulltext(terms)
+
+        model = self._model
+        branches = []
+        for position, term in enumerate(terms):
+            if position == len(terms) - 1 and len(term) >= self.min_prefix:
+                condition = model.token.in_(self._expand(term))
+                weight = case((model.token == term, model.weight * 2), else_=model.weight)  # Prima a la palabra exacta
+            else:
+                condition = model.token == term
+                weight = model.weight * 2
+            branches.append(
+                select(model.product_id, func.max(weight).label('weight')).where(condition).group_by(model.product_id))
+
+        matches = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery()
+        return (
+            select(matches.c.product_id, func.sum(matches.c.weight).label('score'))
+            .group_by(matches.c.product_id)
+            .having(func.count() == len(branches))
+            .subquery())
+
+    def _expand(self, prefix):
+        """Términos del índice que empiezan por el prefijo, como máximo `SEARCH_MAX_EXPANSIONS`.
+
+        Acotar la expansión evita que un prefijo muy corto arrastre a la consulta las entradas de miles de
+        términos distintos; se conservan los primeros en orden alfabético, empezando por el propio prefijo.
+        """
+        model = self._model
+        # Todos los términos con ese prefijo están entre el prefijo y el prefijo seguido de 'z'
+        statement = (
+            select(model.token)
+            .where(model.token.between(prefix, prefix + 'z' * (MAX_TOKEN_LENGTH - len(prefix))))
+            .distinct()
+            .order_by(model.token)
+            .limit(self.max_expansions))
+        return list(self._db.session.scalars(statement))
+
+    def _match_fulltext(self, terms):
+        """Búsqueda sobre el índice FULLTEXT nativo de MySQL, en modo booleano."""
+        source = self._source
+        last = terms[-1] + ('*' if len(terms[-1]) >= self.min_prefix else '')
+        against = ' '.join(['+' + term for term in terms[:-1]] + ['+' + last])
+        relevance = mysql_match(source.name, source.description, against=against).in_boolean_mode()
+        return select(source.id.label('product_id'), relevance.label('score')).where(relevance).subquery()
+
+    def reindex(self, session, rows):
+        """Reemplazar los términos de varios productos.
+
+        Args:
+            session (Session): Sesión en cuya transacción se escribe el índice.
+            rows (list): Tuplas (id, name, description) de los productos.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        self._delete(session, [row[0] for row in rows])
+        self._insert(session, rows)
+
+    def rebuild(self, session, batch_size):
+        """Reconstruir el índice completo a partir de la tabla de productos.
+
+        Returns:
+            int: Número de productos indexados.
+        """
+        source = self._source
+        session.execute(delete(self._model).execution_options(synchronize_session=False))
+        result = session.execute(
+            select(source.id, source.name, source.description).execution_options(yield_per=batch_size))
+        count = 0
+        for rows in result.partitions():
+            self._insert(session, rows)
+            count += len(rows)
+        return count
+
+    def _delete(self, session, product_ids):
+        model = self._model
+        session.execute(delete(model).where(model.product_id.in_(product_ids)).execution_options(synchronize_session=False))
+
+    def _insert(self, session, rows):
+        entries = [
+            {'token': token, 'product_id': product_id, 'weight': weight}
+            for product_id, name, description in rows
+            for token, weight in product_tokens(name, description).items()]
+        if entries:
+            # INSERT de Core sobre la tabla: evita el coste por fila de la inserción masiva del ORM
+            session.execute(insert(self._model.__table__), entries)
+
+    # Eventos de la sesión: se eliminan los términos obsoletos antes del flush y se insertan los nuevos después
+
+    def _before_flush(self, session, flush_context, instances):
+        source = self._source
+        pending = session.info.setdefault('search_pending', set())
+        stale = set()
+        for instance in session.new:
+            if isinstance(instance, source):
+                pending.add(instance)
+        for instance in session.dirty:
+            if not isinstance(instance, source) or instance in session.deleted:
+                continue
+            attrs = inspect(instance).attrs
+            if attrs.name.history.has_changes() or attrs.description.history.has_changes():
+                stale.add(instance.id)
+                pending.add(instance)
+        for instance in session.deleted:
+            if isinstance(instance, source):
+                stale.add(instance.id)
+                pending.discard(instance)
+        if stale:
+            self._delete(session, stale)
+
+    def _after_flush(self, session, flush_context):
+        pending = session.info.pop('search_pending', None)
+        if pending:
+            self._insert(session, [(instance.id, instance.name, instance.description) for instance in pending])
+
+    def _after_rollback(self, session):
+        session.info.pop('search_pending', None)
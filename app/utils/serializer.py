@@ -0,0 +1,150 @@
+from datetime import date
+
+from flask_restx import fields
+
+# Tipos de campo cuyo valor leído de la base de datos ya tiene el formato de salida
+_PASSTHROUGH = (fields.Raw, fields.Integer, fields.String, fields.Boolean)
+
+# Número máximo de funciones compiladas por modelo (una por combinación de campos y de columnas de la fila)
+MAX_COMPILED = 256
+
+
+class Label(fields.String):
+    """Campo de salida que traduce un valor (por ejemplo, un miembro de un Enum) a su etiqueta de texto.
+
+    La traducción se hace al serializar, sin modificar el objeto de origen.
+
+    Args:
+        labels (dict): Etiqueta de cada valor.
+        unknown (str): Etiqueta de los valores que no están en `labels`.
+    """
+
+    def __init__(self, labels, unknown=None, **kwargs):
+        super().__init__(**kwargs)
+        self.labels = labels
+        self.unknown = unknown
+
+    def format(self, value):
+        return self.labels.get(value, self.unknown)
+
+
+class RowSerializer:
+    """Serializador de listados que compila un modelo de salida de flask-restx en una función por fila.
+
+    `marshal` recorre el modelo campo a campo para cada objeto; aquí el modelo se recorre una sola vez y
+    se genera una función que construye el diccionario de salida con un literal, leyendo las columnas
+    por posición de las filas de una consulta (`Row`) o por atributo de las instancias del ORM. Solo
+    admite modelos planos: campos anidados, listas o atributos calculados se siguen serializando con
+    `marshal`.
+
+    Args:
+        model (Model): Modelo de salida de flask-restx.
+
+    Raises:
+        TypeError: Si el modelo tiene campos que no pueden compilarse.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._sources = {name: _source(name, field) for name, field in model.items()}
+        self._compiled = {}  # (campos, columnas de la fila) -> función compilada
+
+    def columns(self, names=None):
+        """Columnas que hay que leer para serializar los campos indicados (todos si `names` es None)."""
+        return [self._sources[name] for name in (names or self.model)]
+
+    def dump(self, rows, names=None):
+        """Serializar una lista de filas con los campos indicados (todos si `names` es None)."""
+        if not rows:
+            return []
+        return list(map(self.compile(names, _layout(rows[0])), rows))
+
+    def dumper(self, names=None):
+        """Función que serializa una fila; se compila con la primera fila que recibe (para el streaming)."""
+        compiled = None
+
+        def dump(row):
+            nonlocal compiled
+            if compiled is None:
+                compiled = self.compile(names, _layout(row))
+            return compiled(row)
+        return dump
+
+    def compile(self, names=None, layout=None):
+        """Obtener (compilando si hace falta) la función que serializa una fila.
+
+        Args:
+            names (list): Campos de salida, o None para todos los del modelo.
+            layout (tuple): Nombres de las columnas de la fila en orden, o None si las filas son objetos.
+
+        Returns:
+            callable: Función que recibe una fila y devuelve su diccionario de salida.
+        """
+        key = (tuple(names) if names else None, layout)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            if len(self._compiled) >= MAX_COMPILED:
+                self._compiled.clear()
+            compiled = self._compiled[key] = self._generate(names or list(self.model), layout)
+        return compiled
+
+    def _generate(self, names, layout):
+        namespace = {}
+        items = []
+        for i, name in enumerate(names):
+            field, source = self.model[name], self._sources[name]
+            if layout is None:
+                access = f'row.{source}'
+            elif source in layout:
+                access = f'row[{layout.index(source)}]'
+            else:
+                raise ValueError(f'Column {source} is not in the row')
+
+            convert = _converter(field)
+            if convert is not None:
+                namespace[f'_c{i}'] = convert
+                access = f'_c{i}({access})'
+            items.append(f'{name!r}: {access}')
+
+        source = 'def serialize(row):\n    return {' + ', '.join(items) + '}\n'
+        exec(compile(source, f'<serializer {getattr(self.model, "name", "model")}>', 'exec'), namespace)
+        return namespace['serialize']
+
+
+def _layout(row):
+    """Columnas de una fila de consulta (`Row`), o None si es una instancia del ORM."""
+    keys = getattr(row, '_fields', None)
+    return tuple(keys) if keys is not None else None
+
+
+def _source(name, field):
+    """Columna de origen de un campo de salida."""
+    if isinstance(field, (fields.Nested, fields.List)) or not isinstance(field, fields.Raw):
+        raise TypeError(f'Field {name} cannot be compiled')
+    attribute = field.attribute or name
+    if not isinstance(attribute, str) or not attribute.isidentifier():
+        raise TypeError(f'Field {name} cannot be compiled')
+    return attribute
+
+
+def _converter(field):
+    """Función que da formato al valor de una columna, o None si el valor se copia tal cual.
+
+    Reproduce `Raw.output`: un valor None se sustituye por el valor por defecto del campo.
+    """
+    default = field._v('default')
+    missing = field.format(default) if default else default
+
+    if type(field) in _PASSTHROUGH:
+        if missing is None:
+            return None
+        return lambda value: missing if value is None else value
+    if isinstance(field, Label):
+        labels, unknown = field.labels, field.unknown
+        return lambda value: missing if value is None else labels.get(value, unknown)
+    if isinstance(field, fields.Date):
+        fmt = field.format
+        return lambda value: missing if value is None else value.isoformat() if type(value) is date else fmt(value)
+
+    fmt = field.format
+    return lambda value: missing if value is None else fmt(value)
@@ -0,0 +1,390 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app
+from sqlalchemy import MetaData, event, func, inspect, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.util import find_tables
+
+# Prefijo de los binds (SQLALCHEMY_BINDS) que son shards de los datos por tienda
+SHARD_PREFIX = 'shard'
+
+# Tablas repartidas entre los shards según la tienda; el resto (tiendas, ventas, contadores...) está en la base global
+SHARDED_TABLES = ('Products', 'ProductTokens', 'Detalle_Venta')
+
+# Shard de las consultas sobre tablas repartidas en el contexto actual
+_shard = ContextVar('shard', default=None)
+
+
+class ShopMovingError(RuntimeError):
+    """Error lanzado al escribir datos de una tienda que se está moviendo entre shards."""
+
+
+class ShardRouter:
+    """Reparto horizontal de los datos por tienda entre varias bases de datos (shards).
+
+    Los shards son los binds `shard_*` de `SQLALCHEMY_BINDS` (`DATABASE_SHARD_URLS`). Los productos,
+    sus términos de búsqueda y los detalles de venta de una tienda viven en el shard de la tienda; las
+    tiendas, las ventas, los contadores de cambios y el directorio de shards, en la base global. El
+    shard de una tienda es el de su fila en el directorio (`ShopShards`), el de `SHARD_MAP` o, en su
+    defecto, `shop_id % número de shards`; el directorio se lee como máximo cada `SHARD_MAP_TTL` segundos.
+
+    Las consultas sobre tablas repartidas van al shard elegido con `use`/`for_shop`. Los listados sin
+    tienda se reparten entre todos los shards en paralelo (`fan_out`) y se combinan por su clave de
+    orden. Los IDs de productos y detalles son globales: se reservan por bloques de `SHARD_ID_BLOCK` en
+    la tabla `IdSequences` de la base global.
+
+    Sin shards configurados no cambia nada: todas las consultas van a la base principal.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.pins = {}
+        self.map_ttl = 30
+        self.id_block = 1000
+        self._db = None
+        self._models = None
+        self._workers = 8
+        self._executor = None
+        self._directory = {}  # shop_id -> (shard, moving)
+        self._directory_at = None
+        self._directory_lock = threading.Lock()
+        self._blocks = {}  # tabla -> [siguiente ID, fin del bloque]
+        self._id_lock = threading.Lock()
+
+    def init_app(self, app, db, directory, sequence):
+        """Detectar los shards configurados.
+
+        Args:
+            app (Flask): Aplicación.
+            db (SQLAlchemy): Extensión de base de datos (ya inicializada con la aplicación).
+            directory (Model): Modelo del directorio de shards por tienda.
+            sequence (Model): Modelo de las secuencias de IDs globales.
+        """
+        app.extensions['shards'] = self
+        self._db = db
+        self._models = (directory, sequence)
+        self.keys = sorted((key for key in app.config['SQLALCHEMY_BINDS'] if key.startswith(SHARD_PREFIX)),
+                           key=lambda key: int(key[len(SHARD_PREFIX) + 1:]))
+        if not self.keys:
+            return
+        self.pins = {int(shop_id): shard for shop_id, shard in app.config['SHARD_MAP'].items()}
+        unknown = set(self.pins.values()) - set(self.keys)
+        if unknown:
+            raise ValueError(f"SHARD_MAP references unknown shards: {', '.join(sorted(unknown))}")
+        self.map_ttl = app.config['SHARD_MAP_TTL']
+        self.id_block = app.config['SHARD_ID_BLOCK']
+        self._workers = app.config['SHARD_FANOUT_WORKERS']
+
+    def register(self, *models):
+        """Registrar los modelos repartidos, para recordar de qué shard se cargó cada instancia."""
+        for model in models:
+            if not event.contains(model, 'load', _remember_shard):
+                event.listen(model, 'load', _remember_shard)
+        if not event.contains(self._db.session, 'do_orm_execute', _route_instance_load):
+            event.listen(self._db.session, 'do_orm_execute', _route_instance_load)
+
+    @property
+    def enabled(self):
+        return bool(self.keys)
+
+    # Selección del shard
+
+    @contextmanager
+    def use(self, key):
+        """Enviar al shard `key` las consultas sobre tablas repartidas dentro del bloque."""
+        token = _shard.set(key)
+        try:
+            yield key
+        finally:
+            _shard.reset(token)
+
+    @contextmanager
+    def for_shop(self, shop_id, write=False):
+        """Enviar al shard de una tienda las consultas sobre tablas repartidas dentro del bloque.
+
+        Raises:
+            ShopMovingError: Si `write` y la tienda se está moviendo de shard.
+        """
+        if write:
+            self.check_writable(shop_id)
+        with self.use(self.shard_for_shop(shop_id) if self.keys else None) as key:
+            yield key
+
+    def each(self):
+        """Recorrer los shards de uno en uno con la sesión actual (una vez, sin shard, si no hay shards)."""
+        for key in self.keys or [None]:
+            with self.use(key):
+                yield key
+
+    def current(self):
+        """Shard del contexto actual (el único, si solo hay uno).
+
+        Raises:
+            RuntimeError: Si no se ha elegido ningún shard.
+        """
+        key = _shard.get()
+        if key is None:
+            if len(self.keys) != 1:
+                raise RuntimeError('No shard selected for a query on a sharded table')
+            key = self.keys[0]
+        return key
+
+    def engine(self, key=None):
+        """Motor del shard `key` o, por defecto, del contexto actual."""
+        return self._db.engines[key or self.current()]
+
+    def is_sharded(self, mapper=None, clause=None):
+        """Si la sentencia (por su entidad principal o sus tablas) se ejecuta sobre una tabla repartida."""
+        if mapper is not None:
+            # Session.get_bind también recibe clases mapeadas, no solo mappers
+            return inspect(mapper).local_table.name in SHARDED_TABLES
+        if clause is None:
+            return False
+        table = getattr(clause, 'table', None)
+        if table is not None:
+            return table.name in SHARDED_TABLES
+        return any(getattr(table, 'name', None) in SHARDED_TABLES for table in find_tables(clause, include_crud=True))
+
+    def shard_of_instance(self, instance):
+        """Shard en el que se escribe una instancia: del que se cargó o el del contexto actual.
+
+        El shard queda anotado en la instancia, para que sus recargas (atributos expirados tras el
+        commit) vayan al mismo shard aunque se hagan fuera del bloque.
+        """
+        info = inspect(instance).info
+        if 'shard' not in info:
+            info['shard'] = self.current()
+        return info['shard']
+
+    # Directorio de tiendas
+
+    def default_shard(self, shop_id):
+        """Shard de una tienda sin fila en el directorio: el de `SHARD_MAP` o `shop_id % número de shards`."""
+        return self.pins.get(shop_id) or self.keys[shop_id % len(self.keys)]
+
+    def shard_for_shop(self, shop_id):
+        """Shard que contiene los datos de una tienda."""
+        entry = self.directory().get(shop_id)
+        return entry[0] if entry else self.default_shard(shop_id)
+
+    def check_writable(self, shop_id):
+        """Comprobar que la tienda no se está moviendo de shard (sus escrituras se perderían).
+
+        Raises:
+            ShopMovingError: Si la tienda se está moviendo.
+        """
+        if self.keys:
+            entry = self.directory().get(shop_id)
+            if entry and entry[1]:
+                raise ShopMovingError(f'Shop {shop_id} is being moved to another shard, retry later')
+
+    def hidden_shops(self):
+        """Tiendas en movimiento cuyos datos hay que ignorar en el shard actual (son la copia, no el original)."""
+        key = _shard.get()
+        return {shop_id for shop_id, (shard, moving) in self.directory().items() if moving and shard != key}
+
+    def directory(self):
+        """Directorio de shards por tienda, releído de la base global cada `SHARD_MAP_TTL` segundos."""
+        if not self.keys:
+            return {}
+        if self._directory_at is None or time.monotonic() - self._directory_at > self.map_ttl:
+            with self._directory_lock:
+                if self._directory_at is None or time.monotonic() - self._directory_at > self.map_ttl:
+                    model = self._models[0]
+                    # Conexión propia a la base principal: fuera de la transacción de la sesión y de las réplicas
+                    with self._db.engine.connect() as conn:
+                        rows = conn.execute(select(model.shop_id, model.shard, model.moving)).all()
+                    self._directory = {shop_id: (shard, moving) for shop_id, shard, moving in rows}
+                    self._directory_at = time.monotonic()
+        return self._directory
+
+    def refresh(self):
+        """Releer el directorio en la próxima consulta."""
+        self._directory_at = None
+
+    def pin(self, session, shop_id):
+        """Fijar en el directorio el shard de una tienda nueva, para que no cambie al añadir shards."""
+        if self.keys:
+            session.add(self._models[0](shop_id=shop_id, shard=self.default_shard(shop_id)))
+
+    # Lecturas repartidas
+
+    def fan_out(self, fn):
+        """Ejecutar una consulta en todos los shards en paralelo.
+
+        Cada shard se consulta en un hilo con su propio contexto de aplicación y su propia sesión, por lo
+        que `fn` debe devolver valores independientes de la sesión (filas, no instancias del ORM).
+
+        Args:
+            fn (callable): Función sin argumentos que consulta el shard del contexto actual.
+
+        Returns:
+            list: Resultado de `fn` en cada shard, en el orden de los shards.
+        """
+        if len(self.keys) <= 1:
+            with self.use(self.keys[0] if self.keys else None):
+                return [fn()]
+        if self._executor is None:
+            with self._id_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix='shard-fan-out')
+        app = current_app._get_current_object()
+
+        def run(key):
+            with app.app_context(), self.use(key):
+                try:
+                    return fn()
+                finally:
+                    self._db.session.remove()
+        return list(self._executor.map(run, self.keys))
+
+    def iter_merged(self, make_query, key, shop_id=None):
+        """Recorrer con la sesión actual una consulta en todos los shards, combinando sus resultados en orden.
+
+        Las consultas se ejecutan al pedir la primera fila, como la iteración de una consulta normal.
+
+        Args:
+            make_query (callable): Función sin argumentos que construye la consulta de un shard, ya ordenada.
+            key (callable): Clave de orden de las filas, la misma por la que se ordena la consulta.
+            shop_id (int): Consultar solo el shard de esta tienda.
+
+        Returns:
+            Iterator: Filas de todos los shards en orden.
+        """
+        def rows(shard):
+            with self.use(shard):
+                result = iter(make_query())  # La consulta se ejecuta aquí, con el shard seleccionado
+            yield from result
+        if shop_id is not None and self.keys:
+            return rows(self.shard_for_shop(shop_id))
+        if len(self.keys) <= 1:
+            return rows(self.keys[0] if self.keys else None)
+        return heapq.merge(*(rows(shard) for shard in self.keys), key=key)
+
+    def locate(self, model, pk):
+        """Buscar por clave primaria una entidad repartida en los shards, con la sesión actual.
+
+        Returns:
+            tuple: (shard, instancia), o (None, None) si no existe.
+        """
+        for shard in self.keys or [None]:
+            with self.use(shard):
+                instance = self._db.session.get(model, pk)
+            if instance is not None:
+                return shard, instance
+        return None, None
+
+    def get(self, model, pk):
+        """Entidad repartida por clave primaria, o None (cargador de la caché de entidades)."""
+        return self.locate(model, pk)[1]
+
+    def get_many(self, model, pks):
+        """Entidades repartidas por claves primarias, con una consulta IN por shard (cargador de la caché de entidades).
+
+        Cada shard se consulta solo por las claves que aún no se han encontrado en los anteriores.
+
+        Returns:
+            dict: Clave primaria -> instancia, solo de las entidades encontradas.
+        """
+        column = model.__mapper__.primary_key[0]
+        found = {}
+        for shard in self.keys or [None]:
+            remaining = [pk for pk in pks if pk not in found]
+            if not remaining:
+                break
+            with self.use(shard):
+                for instance in self._db.session.scalars(select(model).where(column.in_(remaining))):
+                    found.setdefault(getattr(instance, column.key), instance)
+        return found
+
+    # IDs globales
+
+    def assign_ids(self, model, rows):
+        """Asignar IDs globales a las filas (diccionarios o instancias) que se van a insertar en un shard.
+
+        Sin shards no hace nada: la base de datos asigna los IDs. Debe llamarse antes de escribir en la
+        base global en la misma transacción (en SQLite la reserva esperaría al bloqueo de la sesión).
+        """
+        if not self.keys or not rows:
+            return rows
+        for row, new_id in zip(rows, self._next_ids(model.__tablename__, len(rows))):
+            if isinstance(row, dict):
+                row['id'] = new_id
+            else:
+                row.id = new_id
+        return rows
+
+    def _next_ids(self, table, count):
+        with self._id_lock:
+            block = self._blocks.setdefault(table, [0, 0])
+            ids = []
+            while len(ids) < count:
+                if block[0] >= block[1]:
+                    size = max(self.id_block, count - len(ids))
+                    block[0] = self._reserve(table, size)
+                    block[1] = block[0] + size
+                take = min(count - len(ids), block[1] - block[0])
+                ids.extend(range(block[0], block[0] + take))
+                block[0] += take
+            return ids
+
+    def _reserve(self, table, size):
+        """Reservar en la base global un bloque de IDs consecutivos y devolver el primero."""
+        model = self._models[1]
+        for _ in range(3):
+            with self._db.engine.begin() as conn:
+                reserved = conn.execute(
+                    update(model).where(model.name == table).values(next_value=model.next_value + size))
+                if reserved.rowcount:
+                    return conn.execute(select(model.next_value).where(model.name == table)).scalar_one() - size
+            # Primera reserva de la tabla: la secuencia empieza tras el mayor ID existente en los shards
+            start = 1 + max(self._max_id(shard, table) for shard in self.keys)
+            try:
+                with self._db.engine.begin() as conn:
+                    conn.execute(insert(model).values(name=table, next_value=start + size))
+                return start
+            except IntegrityError:
+                continue  # Otro proceso creó la secuencia a la vez: se reserva sobre la suya
+        raise RuntimeError(f'Could not reserve ids for {table}')
+
+    def _max_id(self, shard, table):
+        column = self._db.metadata.tables[table].c.id
+        with self._db.engines[shard].connect() as conn:
+            return conn.execute(select(func.max(column))).scalar() or 0
+
+    # Esquema
+
+    def shard_metadata(self):
+        """Copia de las tablas repartidas sin las claves foráneas hacia tablas de la base global."""
+        metadata = MetaData()
+        for name in SHARDED_TABLES:
+            self._db.metadata.tables[name].to_metadata(metadata)
+        for table in metadata.tables.values():
+            for constraint in list(table.foreign_key_constraints):
+                if constraint.elements[0].target_fullname.split('.')[0] not in SHARDED_TABLES:
+                    table.constraints.discard(constraint)
+                    for element in constraint.elements:
+                        element.parent.foreign_keys.discard(element)
+                        table.foreign_keys.discard(element)
+        return metadata
+
+
+def _route_instance_load(orm_execute_state):
+    # Las recargas de atributos expirados y las cargas diferidas de relaciones van al shard de la instancia
+    if not orm_execute_state.is_select:
+        return
+    options = orm_execute_state.load_options
+    state = options._refresh_state or options._lazy_loaded_from
+    if state is not None and 'shard' in state.info:
+        orm_execute_state.bind_arguments['shard'] = state.info['shard']
+
+
+def _remember_shard(instance, context):
+    shard = _shard.get()
+    if shard is not None:
+        inspect(instance).info['shard'] = shard
@@ -0,0 +1,86 @@
+import threading
+
+
+class _Call:
+    """Consulta en curso para una clave: los seguidores esperan su evento y comparten su resultado."""
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Agrupación (coalescing) de lecturas idénticas concurrentes dentro de un worker.
+
+    La primera solicitud de una clave (el líder) ejecuta la consulta; las que llegan mientras tanto
+    esperan y reciben el mismo resultado. Si el líder tarda más que el tiempo de espera configurado,
+    el seguidor deja de esperar y ejecuta la consulta por su cuenta.
+
+    El resultado se comparte entre hilos, por lo que debe ser independiente de la sesión de base de
+    datos (valores de columnas, no instancias del ORM).
+    """
+
+    def __init__(self):
+        self.timeout = 5.0
+        self._lock = threading.Lock()
+        self._calls = {}  # clave -> _Call en curso
+        self.stats = {'leaders': 0, 'collapsed': 0, 'timeouts': 0}
+
+    def init_app(self, app):
+        """Leer el tiempo de espera por defecto de la configuración de la aplicación."""
+        self.timeout = app.config['SINGLEFLIGHT_TIMEOUT']
+
+    def do(self, key, fn, timeout=None):
+        """Ejecutar `fn` para la clave, o esperar al resultado de la ejecución en curso con la misma clave.
+
+        Args:
+            key (str): Identificador de la lectura (dos llamadas con la misma clave son intercambiables).
+            fn (callable): Función sin argumentos que realiza la lectura.
+            timeout (float): Segundos que un seguidor espera al líder; por defecto `SINGLEFLIGHT_TIMEOUT`.
+
+        Returns:
+            object: El resultado de `fn`, propio o compartido.
+
+        Raises:
+            Exception: La excepción lanzada por `fn` en el líder se propaga también a sus seguidores.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['leaders'] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.event.set()
+            return call.result
+
+        if not call.event.wait(self.timeout if timeout is None else timeout):
+            # El líder no respondió a tiempo: ejecutar la lectura de forma independiente
+            with self._lock:
+                self.stats['timeouts'] += 1
+            return fn()
+
+        with self._lock:
+            self.stats['collapsed'] += 1
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def get_stats(self):
+        """Contadores de lecturas ejecutadas (líderes), agrupadas y esperas agotadas."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
@@ -0,0 +1,60 @@
+import json
+
+from flask import Response, current_app, request, stream_with_context
+
+JSON_MIMETYPE = 'application/json'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson():
+    """Indicar si el cliente prefiere recibir NDJSON según la cabecera Accept."""
+    return request.accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def wants_stream(stream=None):
+    """Indicar si la solicitud pide el modo streaming (`?stream=1` o `Accept: application/x-ndjson`).
+
+    Args:
+        stream (bool): Valor del parámetro `stream` ya convertido por el parser de la ruta (`inputs.boolean`).
+    """
+    return bool(stream) or wants_ndjson()
+
+
+def stream_response(rows, serialize):
+    """Construir una respuesta que serializa y envía las filas a medida que se leen de la base de datos.
+
+    Las filas se escriben en bloques de `STREAM_CHUNK_SIZE` elementos, de modo que la memoria
+    del worker queda acotada por el tamaño del bloque y no por el de la tabla.
+
+    Args:
+        rows (iterable): Iterador de filas a serializar (normalmente un cursor con `yield_per`).
+        serialize (callable): Función que convierte una fila en el diccionario de salida.
+
+    Returns:
+        Response: Respuesta en NDJSON (una fila por línea) o un arreglo JSON transmitido por partes.
+    """
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+    ndjson = wants_ndjson()
+
+    def generate():
+        chunk = []
+        first = True
+        if not ndjson:
+            yield '['
+        for row in rows:
+            line = json.dumps(serialize(row), separators=(',', ':'))
+            if ndjson:
+                chunk.append(line + '\n')
+            else:
+                chunk.append(line if first else ',' + line)
+                first = False
+            if len(chunk) >= chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+        if not ndjson:
+            yield ']'
+
+    # stream_with_context mantiene la sesión de base de datos activa mientras se genera la respuesta
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE if ndjson else JSON_MIMETYPE)
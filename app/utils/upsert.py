@@ -0,0 +1,78 @@
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+
+def upsert(session, model, rows, index_elements, update=(), increment=(), **execution_options):
+    """Insertar o actualizar varias filas en una sola ejecución.
+
+    Usa `ON CONFLICT ... DO UPDATE` en SQLite/PostgreSQL y `ON DUPLICATE KEY UPDATE` en MySQL. La
+    sentencia se compila una sola vez (queda en la caché de SQLAlchemy) y se ejecuta con `executemany`,
+    que los drivers agrupan en INSERT multi-fila.
+
+    Args:
+        session (Session): Sesión con la que se ejecuta la sentencia.
+        model (Model): Modelo (o tabla) destino.
+        rows (list): Lista de diccionarios con los valores de cada fila.
+        index_elements (list): Columnas de la restricción única que detecta el conflicto.
+        update (list): Columnas que se sobrescriben con el valor insertado cuando la fila ya existe.
+        increment (list): Columnas a las que se suma el valor insertado cuando la fila ya existe.
+        **execution_options: Opciones de ejecución adicionales de la sentencia (por ejemplo `change_scopes`).
+
+    Returns:
+        CursorResult: Resultado de la ejecución.
+
+    Raises:
+        NotImplementedError: Si el motor de base de datos no soporta upsert.
+    """
+    table = getattr(model, '__table__', model)
+    dialect = session.get_bind(mapper=model if table is not model else None, clause=table).dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(table)
+        values = _upsert_values(table, statement.excluded, update, increment)
+        statement = statement.on_conflict_do_update(index_elements=index_elements, set_=values)
+    elif dialect == 'mysql':
+        statement = mysql.insert(table)
+        values = _upsert_values(table, statement.inserted, update, increment)
+        statement = statement.on_duplicate_key_update(values)
+    else:
+        raise NotImplementedError(f'Upsert not supported for dialect {dialect}')
+
+    # La opción `upsert` permite a la caché de entidades distinguirlo de un INSERT simple
+    return session.execute(statement.execution_options(upsert=True, **execution_options), rows)
+
+
+def increment_rows(session, model, key_columns, metric_columns, deltas):
+    """Sumar incrementos a filas de contadores o resúmenes, creándolas si no existen, con un solo upsert.
+
+    Los incrementos de una misma clave se combinan antes de escribir, las filas con todos los incrementos
+    a cero se omiten y el resto se escribe ordenado por clave, para que dos transacciones concurrentes
+    bloqueen las filas en el mismo orden.
+
+    Args:
+        session (Session): Sesión con la que se ejecuta la sentencia.
+        model (Model): Modelo (o tabla) destino.
+        key_columns (tuple): Columnas de la clave primaria de las filas.
+        metric_columns (tuple): Columnas que se incrementan.
+        deltas (iterable): Pares `(clave, incrementos)`, con los valores en el orden de las columnas.
+    """
+    totals = {}
+    for key, values in deltas:
+        current = totals.get(tuple(key))
+        totals[tuple(key)] = tuple(values) if current is None else tuple(a + b for a, b in zip(current, values))
+    rows = [dict(zip(key_columns + metric_columns, key + values))
+            for key, values in sorted(totals.items(), key=lambda item: _key_order(item[0])) if any(values)]
+    if rows:
+        upsert(session, model, rows, index_elements=list(key_columns), increment=list(metric_columns))
+
+
+def _key_order(key):
+    # Los enum no son ordenables: se ordenan por su valor
+    return tuple(getattr(part, 'value', part) for part in key)
+
+
+def _upsert_values(table, inserted, update, increment):
+    """Construir las asignaciones de la parte UPDATE del upsert."""
+    values = {column: inserted[column] for column in update}
+    values.update({column: table.c[column] + inserted[column] for column in increment})
+    return values
@@ -0,0 +1,63 @@
+from functools import wraps
+
+from flask import request
+from flask_restx import abort
+from pydantic import ValidationError
+
+
+def schema_model(ns, name, schema):
+    """Registrar en el namespace la documentación de Swagger de un esquema de entrada de pydantic.
+
+    El JSON Schema que genera pydantic se adapta a Swagger 2.0: los esquemas anidados se insertan en
+    su lugar y los campos opcionales (`X | None`) se documentan como `X`.
+
+    Args:
+        ns (Namespace): Namespace donde se registra el modelo.
+        name (str): Nombre público del modelo en la documentación.
+        schema (type): Clase del esquema de pydantic.
+
+    Returns:
+        SchemaModel: Modelo de documentación, para usarlo con `ns.expect`.
+    """
+    definition = schema.model_json_schema()
+    return ns.schema_model(name, _swagger(definition, definition.pop('$defs', {})))
+
+
+def _swagger(node, defs):
+    if isinstance(node, list):
+        return [_swagger(item, defs) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if '$ref' in node:
+        return _swagger(defs[node['$ref'].rsplit('/', 1)[-1]], defs)
+    if 'anyOf' in node:
+        options = [option for option in node['anyOf'] if option.get('type') != 'null']
+        if len(options) == 1:
+            node = {key: value for key, value in node.items() if key != 'anyOf' and not (key == 'default' and value is None)}
+            node.update(options[0])
+    return {key: _swagger(value, defs) for key, value in node.items()}
+
+
+def validate_body(schema):
+    """Decorador que valida el cuerpo JSON de la solicitud con un esquema de pydantic.
+
+    El cuerpo se valida y convierte en una sola pasada (sin `request.get_json()`), y el método recibe
+    la instancia del esquema en el argumento `payload`. Un cuerpo no válido se responde con 400 y el
+    mismo formato de errores que la validación de flask-restx.
+
+    Args:
+        schema (type): Clase del esquema de pydantic.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not request.is_json:
+                abort(415, "Did not attempt to load JSON data because the request Content-Type was not 'application/json'.")
+            try:
+                payload = schema.model_validate_json(request.get_data())
+            except ValidationError as e:
+                errors = {'.'.join(map(str, error['loc'])) or 'body': error['msg'] for error in e.errors()}
+                abort(400, 'Input payload validation failed', errors=errors)
+            return f(*args, payload=payload, **kwargs)
+        return wrapper
+    return decorator
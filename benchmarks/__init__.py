@@ -0,0 +1 @@
+"""Scripts de medición de rendimiento de la API (`python -m benchmarks.<script>`)."""
@@ -0,0 +1,441 @@
+"""Carga reproducible de todos los endpoints de la API sobre una base SQLite local.
+
+Crea la aplicación con `create_app` contra un archivo SQLite, lo puebla de forma determinista a la
+escala indicada (tiendas, productos, ventas y detalles) y recorre todas las rutas de los namespaces
+de productos, tiendas, ventas y detalles con el cliente de pruebas WSGI. Para cada escenario mide el
+rendimiento (solicitudes por segundo), la latencia p50/p95/p99, las sentencias SQL por solicitud y el
+pico de memoria residente del proceso, y guarda el resultado en JSON para comparar ejecuciones entre
+commits (`--compare`).
+
+La base poblada se reutiliza entre ejecuciones con la misma escala y semilla (`--reseed` la vuelve a
+crear). Los escenarios de escritura se ejecutan después de los de lectura y en un orden fijo; las
+bajas eliminan las entidades creadas por las altas, de modo que la base no cambia de tamaño.
+
+Uso:
+    python -m benchmarks.api --scale small --requests 200
+    python -m benchmarks.api --scale large --output large.json --compare large-anterior.json
+    python -m benchmarks.api --scale tiny --only products.
+
+Escalas (tiendas / productos / ventas / detalles):
+    - tiny: 10 / 1 000 / 2 000 / 5 000 (segundos).
+    - small: 100 / 100 000 / 200 000 / 500 000.
+    - large: 1 000 / 1 000 000 / 2 000 000 / 5 000 000 (varios minutos de carga y ~1 GB de disco).
+
+Resultados de referencia (escala small, SQLite, CPython 3.11, un núcleo; carga en ~25 s, pico de 145 MB):
+    - Lecturas por ID y listados paginados: p50 de 1,7 a 3,5 ms, 2 sentencias por solicitud.
+    - Búsqueda: p50 ~57 ms (~72 ms con prefijo); productos de una tienda ordenados: p50 ~90 ms.
+    - Página profunda de ventas (cursor sobre fecha e ID): p50 ~24 ms.
+    - Escrituras: p50 de 3 a 8 ms (checkout ~6,5 ms con 8 sentencias); importación de 100 filas ~41 ms.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event, insert, select, update
+
+try:
+    import resource
+except ImportError:  # Windows: sin pico de memoria residente
+    resource = None
+
+SCALES = {
+    'tiny': {'shops': 10, 'products': 1000, 'sales': 2000, 'details': 5000},
+    'small': {'shops': 100, 'products': 100000, 'sales': 200000, 'details': 500000},
+    'large': {'shops': 1000, 'products': 1000000, 'sales': 2000000, 'details': 5000000},
+}
+
+# Filas por sentencia al poblar la base
+SEED_BATCH_SIZE = 10000
+
+# Vocabulario de los nombres y descripciones de los productos (las búsquedas usan las mismas palabras)
+_WORDS = [
+    'camisa', 'pantalón', 'zapato', 'bolso', 'reloj', 'lámpara', 'mesa', 'silla', 'cuaderno', 'taza',
+    'café', 'té', 'galleta', 'jabón', 'crema', 'perfume', 'cable', 'cargador', 'audífono', 'teclado',
+    'algodón', 'cuero', 'madera', 'acero', 'vidrio', 'orgánico', 'artesanal', 'clásico', 'deportivo', 'infantil',
+    'rojo', 'azul', 'verde', 'negro', 'blanco', 'grande', 'pequeño', 'premium', 'básico', 'edición',
+]
+_FIRST_DATE = datetime.date(2023, 1, 1)
+_DAYS = 730
+
+
+def build_app(path, profile='dev'):
+    """Crear la aplicación con el perfil de configuración indicado contra un archivo SQLite.
+
+    La configuración se lee del entorno al importar la aplicación, por eso este módulo no importa
+    `app` al cargarse. El autocompletado no se precarga para no competir con las mediciones.
+    """
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(path)}'
+    os.environ.setdefault('AUTOCOMPLETE_PRELOAD', 'false')
+    os.environ.setdefault('SQLALCHEMY_ECHO', 'false')
+    from app import create_app
+    return create_app(profile)
+
+
+def seed(app, scale, seed=42):
+    """Poblar la base de forma determinista con INSERT de Core por lotes."""
+    from app import db, search_index
+    from app.models.detail import SaleDetail
+    from app.models.product import Product
+    from app.models.product_sales_bucket import ProductSalesBucket
+    from app.models.sale import Sale, StateEnum
+    from app.models.shop import Shop
+    from app.services.sales_report_service import SalesReportService
+    from app.services.shop_summary_service import ShopSummaryService
+    from app.utils.leaderboard import RESOLUTIONS
+
+    rng = random.Random(seed)
+    statuses = list(StateEnum)
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as conn:
+            # Solo durante la carga: sin diario ni sincronización a disco
+            conn.exec_driver_sql('PRAGMA journal_mode=OFF')
+            conn.exec_driver_sql('PRAGMA synchronous=OFF')
+            _insert(conn, Shop, scale['shops'], lambda i: {
+                'name': f'Tienda {i}', 'logo': f'tienda-{i}.png', 'description': f'Tienda número {i}',
+                'phone': f'{i:012d}', 'address': f'Calle {i}', 'email': f'tienda{i}@example.com'})
+            _insert(conn, Product, scale['products'], lambda i: {
+                'name': ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(2, 4))) + f' {i}',
+                'image': f'producto-{i}.png',
+                'description': ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(4, 10))),
+                'price': rng.randint(100, 100000), 'quantity': rng.randint(0, 1000),
+                'shop_id': rng.randint(1, scale['shops'])})
+            _insert(conn, Sale, scale['sales'], lambda i: {
+                'date': _FIRST_DATE + datetime.timedelta(days=rng.randrange(_DAYS)),
+                'total': rng.randint(100, 1000000), 'status': rng.choice(statuses)})
+            _insert(conn, SaleDetail, scale['details'], lambda i: {
+                'qnt_prod_sale': rng.randint(1, 5), 'sale_id': rng.randint(1, scale['sales']),
+                'product_id': rng.randint(1, scale['products']), 'unit_price': 0})
+            # Cada detalle guarda el precio de su producto (el que se cobró)
+            details = SaleDetail.__table__
+            conn.execute(update(details).values(
+                unit_price=select(Product.price).where(Product.id == details.c.product_id).scalar_subquery()))
+
+            # Repartir los detalles en la semana anterior a la carga para el ranking de más vendidos
+            now, buckets = time.time(), {}
+            for product_id, shop_id, units in conn.execute(
+                    select(SaleDetail.product_id, Product.shop_id, SaleDetail.qnt_prod_sale)
+                    .join(Product, SaleDetail.product_id == Product.id)):
+                moment = now - rng.random() * 7 * 86400
+                for resolution in RESOLUTIONS:
+                    key = (resolution, int(moment // resolution), shop_id, product_id)
+                    buckets[key] = buckets.get(key, 0) + units
+            rows = [dict(zip(('resolution', 'bucket', 'shop_id', 'product_id', 'units'), key + (units,))) for key, units in buckets.items()]
+            for start in range(0, len(rows), SEED_BATCH_SIZE):
+                conn.execute(insert(ProductSalesBucket.__table__), rows[start:start + SEED_BATCH_SIZE])
+        count = search_index.rebuild(db.session, SEED_BATCH_SIZE)
+        db.session.commit()
+        SalesReportService.rebuild()
+        ShopSummaryService.reconcile()
+    return count
+
+
+def _insert(conn, model, count, row):
+    for start in range(1, count + 1, SEED_BATCH_SIZE):
+        conn.execute(insert(model.__table__), [row(i) for i in range(start, min(count + 1, start + SEED_BATCH_SIZE))])
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Scenario:
+    """Una ruta de la API con la forma de construir cada solicitud y los códigos de estado esperados."""
+
+    def __init__(self, name, method, request, expected=(200,)):
+        self.name = name
+        self.method = method
+        self.request = request  # (rng, estado) -> (ruta, argumentos del cliente de pruebas)
+        self.expected = expected
+
+
+def scenarios(scale):
+    """Escenarios de todas las rutas, primero las lecturas y después las escrituras en orden fijo."""
+    from app.utils.pagination import encode_cursor
+
+    shops, products, sales = scale['shops'], scale['products'], scale['sales']
+
+    def product_id(rng, state):
+        return rng.randint(1, products)
+
+    def ids(rng, count, top):
+        # Lista de IDs de una búsqueda por lista (cesta, historial de pedidos), con alguno inexistente
+        return [rng.randint(1, top + top // 100 + 1) for _ in range(count)]
+
+    def day(rng):
+        return (_FIRST_DATE + datetime.timedelta(days=rng.randrange(_DAYS))).isoformat()
+
+    def product_body(rng, state):
+        state['serial'] += 1
+        return {'name': f'Producto de carga {state["serial"]}', 'image': f'carga-{state["serial"]}.png',
+                'description': ' '.join(rng.choice(_WORDS) for _ in range(6)), 'price': rng.randint(100, 100000),
+                'quantity': rng.randint(0, 1000), 'shop_id': rng.randint(1, shops)}
+
+    def shop_body(rng, state):
+        state['serial'] += 1
+        n = state['serial']
+        return {'name': f'Tienda de carga {n}', 'logo': f'carga-{n}.png', 'description': 'Tienda de carga',
+                'phone': f'9{n:011d}', 'address': f'Avenida {n}', 'email': f'carga{n}@example.com'}
+
+    def import_csv(rng, state):
+        out = io.StringIO()
+        writer = csv.DictWriter(out, ['name', 'image', 'description', 'price', 'quantity', 'shop_id'])
+        writer.writeheader()
+        for i in range(100):
+            writer.writerow({'name': f'Importado {i}', 'image': f'importado-{i}.png', 'description': 'Importado',
+                             'price': rng.randint(100, 100000), 'quantity': rng.randint(0, 1000), 'shop_id': 1 + i % shops})
+        return out.getvalue()
+
+    def created(kind):
+        # Las modificaciones y las bajas recorren las entidades creadas por las altas
+        def pick(state):
+            ids = state['created'][kind]
+            return ids[state['cursor'][kind] % len(ids)] if ids else 0
+        return pick
+
+    def take(kind):
+        def pop(state):
+            ids = state['created'][kind]
+            return ids.pop() if ids else 0
+        return pop
+
+    created_product, created_shop, created_sale, created_detail = (
+        created('products'), created('shops'), created('sales'), created('details'))
+
+    return [
+        # Productos
+        Scenario('products.list', 'GET', lambda rng, s: ('/products/?limit=100', {})),
+        Scenario('products.list_deep', 'GET', lambda rng, s: (
+            f'/products/?limit=100&after={encode_cursor([rng.randint(1, products)])}', {})),
+        Scenario('products.list_filtered', 'GET', lambda rng, s: (
+            f'/products/?shop_id={rng.randint(1, shops)}&min_price=1000&max_price=50000&in_stock=true', {})),
+        Scenario('products.list_fields', 'GET', lambda rng, s: ('/products/?limit=100&fields=id,name,price', {})),
+        Scenario('products.stream_shop', 'GET', lambda rng, s: (f'/products/?stream=1&shop_id={rng.randint(1, shops)}', {})),
+        Scenario('products.search', 'GET', lambda rng, s: (f'/products/search?q={rng.choice(_WORDS)}&limit=20', {})),
+        Scenario('products.search_prefix', 'GET', lambda rng, s: (
+            f'/products/search?q={rng.choice(_WORDS)} {rng.choice(_WORDS)[:3]}&limit=20', {})),
+        Scenario('products.get', 'GET', lambda rng, s: (f'/products/{product_id(rng, s)}', {})),
+        Scenario('products.lookup', 'GET', lambda rng, s: (f'/products/?ids={",".join(map(str, ids(rng, 50, products)))}', {})),
+        Scenario('products.lookup_post', 'POST', lambda rng, s: ('/products/lookup', {'json': {'ids': ids(rng, 200, products)}})),
+        Scenario('products.top', 'GET', lambda rng, s: (f'/products/top?window={rng.choice(["1h", "24h", "7d"])}&n=50', {})),
+        Scenario('products.top_shop', 'GET', lambda rng, s: (
+            f'/products/top?window={rng.choice(["24h", "7d"])}&shop_id={rng.randint(1, shops)}&n=50', {})),
+        Scenario('products.shop_products', 'GET', lambda rng, s: (
+            f'/products/{rng.randint(1, shops)}/products?sort={rng.choice(["price", "name", "newest"])}', {})),
+        # Tiendas
+        Scenario('shops.list', 'GET', lambda rng, s: ('/shops/?limit=100', {})),
+        Scenario('shops.list_prefix', 'GET', lambda rng, s: (f'/shops/?name=Tienda {rng.randint(1, 9)}', {})),
+        Scenario('shops.stream', 'GET', lambda rng, s: ('/shops/?stream=1', {})),
+        Scenario('shops.get', 'GET', lambda rng, s: (f'/shops/{rng.randint(1, shops)}', {})),
+        Scenario('shops.get_products', 'GET', lambda rng, s: (f'/shops/{rng.randint(1, shops)}?expand=products', {})),
+        Scenario('shops.lookup', 'GET', lambda rng, s: (f'/shops/?ids={",".join(map(str, ids(rng, 20, shops)))}', {})),
+        Scenario('shops.summary', 'GET', lambda rng, s: (f'/shops/{rng.randint(1, shops)}/summary', {})),
+        # Ventas
+        Scenario('sales.list', 'GET', lambda rng, s: ('/sales/?limit=100', {})),
+        Scenario('sales.list_deep', 'GET', lambda rng, s: (
+            f'/sales/?limit=100&after={encode_cursor([day(rng), rng.randint(1, sales)])}', {})),
+        Scenario('sales.list_filtered', 'GET', lambda rng, s: (
+            f'/sales/?status={rng.randint(0, 3)}&date_from={_FIRST_DATE.isoformat()}&date_to={day(rng)}&limit=100', {})),
+        Scenario('sales.get_expanded', 'GET', lambda rng, s: (f'/sales/{rng.randint(1, sales)}?expand=details.product', {})),
+        Scenario('sales.lookup', 'POST', lambda rng, s: ('/sales/lookup', {'json': {'ids': ids(rng, 100, sales)}})),
+        Scenario('sales.report_year', 'GET', lambda rng, s: (
+            f'/sales/reports?granularity=month&group_by=status&date_from={_FIRST_DATE.isoformat()}&date_to=2023-12-31', {})),
+        Scenario('sales.report_shops', 'GET', lambda rng, s: ('/sales/reports?granularity=year&group_by=shop', {})),
+        # Detalles
+        Scenario('detail.list', 'GET', lambda rng, s: ('/detail/?limit=100', {})),
+        Scenario('detail.by_sale', 'GET', lambda rng, s: (f'/detail/?sale_id={rng.randint(1, sales)}', {})),
+        Scenario('detail.by_product', 'GET', lambda rng, s: (f'/detail/?product_id={product_id(rng, s)}', {})),
+
+        # Escrituras: altas, modificaciones de lo creado, importación y bajas de lo creado
+        Scenario('shops.create', 'POST', lambda rng, s: ('/shops/', {'json': shop_body(rng, s)}), (201,)),
+        Scenario('shops.update', 'PUT', lambda rng, s: (f'/shops/{created_shop(s)}', {'json': shop_body(rng, s)})),
+        Scenario('products.create', 'POST', lambda rng, s: ('/products/', {'json': product_body(rng, s)}), (201,)),
+        Scenario('products.update', 'PUT', lambda rng, s: (
+            f'/products/{created_product(s)}', {'json': product_body(rng, s)})),
+        Scenario('products.import', 'POST', lambda rng, s: (
+            '/products/import', {'data': import_csv(rng, s), 'content_type': 'text/csv'})),
+        Scenario('sales.create', 'POST', lambda rng, s: (
+            '/sales/', {'json': {'date': day(rng), 'total': rng.randint(100, 100000), 'status': 1}}), (201,)),
+        Scenario('sales.checkout', 'POST', lambda rng, s: ('/sales/checkout', {'json': {
+            'date': day(rng), 'items': [{'product_id': product_id(rng, s), 'qnt_prod_sale': 1} for _ in range(3)]}}),
+            (201, 409)),
+        Scenario('sales.update', 'PUT', lambda rng, s: (
+            f'/sales/{created_sale(s)}', {'json': {'date': day(rng), 'total': rng.randint(100, 100000), 'status': 2}})),
+        Scenario('detail.create', 'POST', lambda rng, s: ('/detail/', {'json': {
+            'qnt_prod_sale': 1, 'sale_id': rng.randint(1, sales), 'product_id': product_id(rng, s)}}), (201,)),
+        Scenario('detail.update', 'PUT', lambda rng, s: (f'/detail/{created_detail(s)}', {'json': {
+            'qnt_prod_sale': 2, 'sale_id': rng.randint(1, sales), 'product_id': product_id(rng, s)}})),
+        Scenario('detail.delete', 'DELETE', lambda rng, s: (f'/detail/{take("details")(s)}', {})),
+        Scenario('sales.delete', 'DELETE', lambda rng, s: (f'/sales/{take("sales")(s)}', {})),
+        Scenario('products.delete', 'DELETE', lambda rng, s: (f'/products/{take("products")(s)}', {})),
+        Scenario('shops.delete', 'DELETE', lambda rng, s: (f'/shops/{take("shops")(s)}', {})),
+    ]
+
+
+def run_scenario(client, scenario, state, requests, warmup, counter, seed=42):
+    """Ejecutar un escenario y resumir sus mediciones."""
+    rng = random.Random(f'{seed}:{scenario.name}')
+    kind = scenario.name.split('.')[0]
+    kind = {'detail': 'details'}.get(kind, kind)
+    timings, statements, statuses = [], 0, {}
+    for i in range(warmup + requests):
+        path, kwargs = scenario.request(rng, state)
+        before = counter[0]
+        started = time.perf_counter()
+        response = client.open(path, method=scenario.method, **kwargs)
+        response.get_data()  # Consumir también las respuestas en streaming
+        elapsed = time.perf_counter() - started
+        if scenario.name.endswith('.create') and response.status_code == 201:
+            state['created'][kind].append(response.get_json()['id'])
+        if scenario.name.endswith('.update'):
+            state['cursor'][kind] += 1
+        if i < warmup:
+            continue
+        timings.append(elapsed)
+        statements += counter[0] - before
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    total = sum(timings)
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / total, 1) if total else None,
+        'latency_ms': {name: round(percentile(timings, fraction) * 1000, 3)
+                       for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))},
+        'queries_per_request': round(statements / requests, 2),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'unexpected': sum(count for code, count in statuses.items() if code not in scenario.expected),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso hasta el momento, o None si el sistema no lo ofrece."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scale, requests, warmup, path=None, reseed=False, only=None, seed_value=42, profile='dev'):
+    path = path or os.path.join(
+        tempfile.gettempdir(),
+        'benchmark-api-{shops}-{products}-{sales}-{details}-{seed}.sqlite'.format(seed=seed_value, **scale))
+    fresh = reseed or not os.path.exists(path)
+    if fresh and os.path.exists(path):
+        os.remove(path)
+
+    app = build_app(path, profile)
+    seed_seconds = None
+    if fresh:
+        started = time.perf_counter()
+        seed(app, scale, seed_value)
+        seed_seconds = round(time.perf_counter() - started, 1)
+
+    from app import db
+
+    counter = [0]
+    with app.app_context():
+        engine = db.engine
+
+    def count_statement(*args):
+        counter[0] += 1
+
+    event.listen(engine, 'after_cursor_execute', count_statement)
+    client = app.test_client()
+    state = {'serial': int(time.time()), 'created': {'products': [], 'shops': [], 'sales': [], 'details': []},
+             'cursor': {'products': 0, 'shops': 0, 'sales': 0, 'details': 0}}
+    results = {}
+    try:
+        for scenario in scenarios(scale):
+            if only and not any(scenario.name.startswith(prefix) for prefix in only):
+                continue
+            results[scenario.name] = run_scenario(client, scenario, state, requests, warmup, counter, seed_value)
+    finally:
+        event.remove(engine, 'after_cursor_execute', count_statement)
+
+    return {
+        'commit': git_commit(),
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': path,
+        'profile': profile,
+        'scale': scale,
+        'seed': seed_value,
+        'seed_seconds': seed_seconds,
+        'requests_per_scenario': requests,
+        'warmup': warmup,
+        'peak_rss_mb': peak_rss_mb(),
+        'scenarios': results,
+    }
+
+
+def compare(current, baseline):
+    """Cambio relativo de la latencia p50/p99 y del rendimiento respecto a una ejecución anterior."""
+    diff = {}
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        diff[name] = {
+            'p50': _ratio(result['latency_ms']['p50'], before['latency_ms']['p50']),
+            'p99': _ratio(result['latency_ms']['p99'], before['latency_ms']['p99']),
+            'throughput': _ratio(result['throughput_rps'], before['throughput_rps']),
+            'queries_per_request': round(result['queries_per_request'] - before['queries_per_request'], 2),
+        }
+    return diff
+
+
+def _ratio(current, before):
+    return round(current / before, 2) if current and before else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='tiny', help='Tamaño de la base poblada')
+    for name in ('shops', 'products', 'sales', 'details'):
+        parser.add_argument(f'--{name}', type=int, help=f'Número de {name} (sustituye al de la escala)')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de los datos y de las solicitudes')
+    parser.add_argument('--requests', type=int, default=200, help='Solicitudes medidas por escenario')
+    parser.add_argument('--warmup', type=int, default=20, help='Solicitudes de calentamiento por escenario')
+    parser.add_argument('--database', help='Archivo SQLite (por defecto uno por escala y semilla en el directorio temporal)')
+    parser.add_argument('--profile', choices=('dev', 'prod'), default='dev', help='Perfil de configuración de la aplicación')
+    parser.add_argument('--reseed', action='store_true', help='Volver a poblar la base aunque ya exista')
+    parser.add_argument('--only', action='append', help='Ejecutar solo los escenarios con este prefijo (p. ej. products.)')
+    parser.add_argument('--output', help='Archivo JSON donde guardar el resultado')
+    parser.add_argument('--compare', help='Resultado JSON de una ejecución anterior con el que comparar')
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    scale.update({name: getattr(args, name) for name in scale if getattr(args, name)})
+    result = run(scale, args.requests, args.warmup, args.database, args.reseed, args.only, args.seed, args.profile)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        result['compared_to'] = {'file': args.compare, 'commit': baseline.get('commit')}
+        result['comparison'] = compare(result, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
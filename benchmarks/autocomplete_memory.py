@@ -0,0 +1,131 @@
+"""Memoria y latencia del índice de autocompletado en memoria.
+
+Construye un `PrefixIndex` con nombres sintéticos (sin base de datos) y mide la memoria que ocupa
+(con `tracemalloc`), el tiempo de construcción, la latencia de las consultas por prefijo y el coste
+de las altas y bajas incrementales. Antes comprueba que las listas precalculadas de los prefijos
+cortos que construye `load` coinciden con las calculadas desde cero (con nombres de una sola letra
+junto a otros que empiezan por ella, que antes dejaban sin lista prefijos como "al").
+
+Uso:
+    python -m benchmarks.autocomplete_memory --names 1000000
+
+Resultados de referencia (1 000 000 nombres de 2 a 4 palabras, CPython 3.11, un núcleo):
+    - Memoria retenida: ~340 MB (~357 bytes por nombre, ~3 claves por nombre); pico de 525 MB al construir.
+    - Construcción completa: ~20-25 s (se hace en segundo plano, sin bloquear las consultas).
+    - Consulta: p99 < 0,05 ms con prefijos de 1-2 letras (listas precalculadas) y < 2,5 ms con 3 o más.
+    - Alta y baja incremental de un nombre: ~9 ms (desplazamiento del arreglo ordenado).
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from app.utils.autocomplete import KINDS, SHORT_PREFIX_LENGTH, PrefixIndex
+
+# Vocabulario de los nombres sintéticos: palabras de 3 a 10 letras, con y sin acentos
+_LETTERS = 'abcdefghijklmnopqrstuvwxyzáéíóúñ'
+
+
+def synthetic_names(count, words_per_name=(2, 4), vocabulary=20000, seed=42):
+    rng = random.Random(seed)
+    words = [''.join(rng.choice(_LETTERS) for _ in range(rng.randint(3, 10))).capitalize() for _ in range(vocabulary)]
+    for _ in range(count):
+        yield ' '.join(rng.choice(words) for _ in range(rng.randint(*words_per_name)))
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def verify(names, seed=42):
+    """Comparar las listas de prefijos cortos de `load` con las calculadas desde cero.
+
+    Returns:
+        list: Prefijos cuya lista no coincide (vacía si todo es correcto).
+    """
+    rng = random.Random(seed)
+    entries = [('shop', 1, 'A', 5), ('product', 2, 'Alpha', 3), ('product', 3, 'Ámbar azul', 1), ('shop', 4, 'b', 0)]
+    entries += [(KINDS[i % 2], 10 + i, name, rng.randint(0, 50)) for i, name in enumerate(synthetic_names(names, seed=seed))]
+    index = PrefixIndex()
+    index.load(entries)
+
+    rank = index._rank(index._names, index._scores)
+    prefixes = {key[:length] for key in index._keys for length in range(1, SHORT_PREFIX_LENGTH + 1) if len(key) >= length}
+    wrong = []
+    for prefix in sorted(prefixes):
+        expected = index._compute_top(prefix, index._range(prefix), rank)
+        if any(index._top.get(key) != refs for key, refs in expected.items()):
+            wrong.append(prefix)
+    return wrong
+
+
+def run(names, lookups, seed=42):
+    rng = random.Random(seed)
+    entries = [
+        ('product' if i % 50 else 'shop', i, name, rng.randint(0, 1000))
+        for i, name in enumerate(synthetic_names(names, seed=seed))]
+
+    # Tiempo de construcción, sin la sobrecarga de tracemalloc
+    index = PrefixIndex()
+    started = time.perf_counter()
+    index.load(entries)
+    build_seconds = time.perf_counter() - started
+
+    # Memoria retenida por el índice, sin contar la lista de entradas de origen
+    index = PrefixIndex()
+    tracemalloc.start()
+    index.load(entries)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Latencia de consultas con prefijos de 1 a 6 letras tomados de nombres reales
+    samples = {}
+    for length in range(1, 7):
+        prefixes = [rng.choice(entries)[2][:length] for _ in range(lookups)]
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.lookup(prefix, 10)
+            timings.append(time.perf_counter() - started)
+        samples[length] = timings
+
+    # Coste de las escrituras incrementales (alta y baja de un nombre)
+    timings = []
+    for i, name in enumerate(synthetic_names(1000, seed=seed + 1)):
+        started = time.perf_counter()
+        index.add('product', names + i, name)
+        index.remove('product', names + i)
+        timings.append(time.perf_counter() - started)
+
+    return {
+        'names': names,
+        'keys': len(index._keys),
+        'build_seconds': round(build_seconds, 2),
+        'retained_mb': round(retained / 2 ** 20, 1),
+        'peak_mb': round(peak / 2 ** 20, 1),
+        'bytes_per_name': round(retained / names),
+        'lookup_ms': {
+            f'prefix_len_{length}': {
+                'p50': round(percentile(timings, 0.50) * 1000, 3),
+                'p99': round(percentile(timings, 0.99) * 1000, 3)}
+            for length, timings in samples.items()},
+        'add_remove_ms_p50': round(percentile(timings, 0.50) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=1000000, help='Número de nombres del índice')
+    parser.add_argument('--lookups', type=int, default=1000, help='Consultas por longitud de prefijo')
+    args = parser.parse_args()
+    wrong = verify(min(args.names, 20000))
+    if wrong:
+        sys.exit('Short-prefix lists built by load() differ for: {}'.format(', '.join(wrong[:20])))
+    print(json.dumps(run(args.names, args.lookups), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Sentencias SQL de las consultas con relaciones incluidas (`?expand=`) según el número de filas relacionadas.
+
+Crea la aplicación con el perfil de pruebas (SQLite en memoria), registra ventas con 1, 10, 100 y
+1 000 detalles y tiendas con el mismo número de productos, y cuenta las sentencias que ejecuta
+`GET /sales/<id>?expand=details.product` y `GET /shops/<id>?expand=products` con el cliente de
+pruebas WSGI. Con la carga por adelantado (`selectinload`), el número de sentencias no depende del
+número de filas relacionadas: el script termina con error si no es el mismo en todos los tamaños.
+
+Uso:
+    python -m benchmarks.expand_queries --sizes 1,10,100,1000
+
+Resultados de referencia (SQLite en memoria, CPython 3.11, un núcleo):
+    - Venta con sus detalles y productos: 4 sentencias en todos los tamaños (ETag incluido); ~70 ms con 1 000 detalles.
+    - Tienda con sus productos: 4 sentencias en todos los tamaños (ETag incluido); ~45 ms con 1 000 productos.
+"""
+import argparse
+import datetime
+import json
+import sys
+import time
+
+from sqlalchemy import event, insert
+
+from app import create_app, db
+from app.models.detail import SaleDetail
+from app.models.product import Product
+from app.models.sale import Sale, StateEnum
+from app.models.shop import Shop
+
+
+def load(sizes):
+    """Una tienda con `n` productos y una venta con `n` detalles por cada tamaño; devuelve sus IDs."""
+    ids = {}
+    for n in sizes:
+        shop_id = db.session.execute(insert(Shop).returning(Shop.id), [{
+            'name': f'Tienda {n}', 'logo': f'tienda-{n}.png', 'description': 'Tienda', 'phone': str(n),
+            'address': f'Calle {n}', 'email': f'tienda{n}@example.com'}]).scalar_one()
+        product_ids = db.session.execute(insert(Product).returning(Product.id), [
+            {'name': f'Producto {n}-{i}', 'image': 'producto.png', 'description': 'Producto', 'price': 100 + i,
+             'quantity': 10, 'shop_id': shop_id} for i in range(n)]).scalars().all()
+        sale_id = db.session.execute(insert(Sale).returning(Sale.id), [{
+            'date': datetime.date(2024, 1, 1), 'total': 0, 'status': StateEnum.REGISTERED}]).scalar_one()
+        db.session.execute(insert(SaleDetail), [
+            {'qnt_prod_sale': 1, 'sale_id': sale_id, 'product_id': product_id, 'unit_price': 100 + i}
+            for i, product_id in enumerate(product_ids)])
+        ids[n] = (sale_id, shop_id)
+    db.session.commit()
+    return ids
+
+
+def run(sizes):
+    app = create_app('test')
+    statements = [0]
+    with app.app_context():
+        db.create_all()
+        ids = load(sizes)
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.__setitem__(0, statements[0] + 1))
+    client = app.test_client()
+
+    results = {}
+    for name, url in (('sale_details_products', '/sales/{0}?expand=details.product'), ('shop_products', '/shops/{1}?expand=products')):
+        rows = {}
+        for n in sizes:
+            statements[0] = 0
+            started = time.perf_counter()
+            response = client.get(url.format(*ids[n]))
+            elapsed = time.perf_counter() - started
+            assert response.status_code == 200, response.data
+            rows[n] = {'statements': statements[0], 'ms': round(elapsed * 1000, 2)}
+        results[name] = {'flat': len({row['statements'] for row in rows.values()}) == 1, 'sizes': rows}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1,10,100,1000', help='Filas relacionadas por recurso, separadas por comas')
+    args = parser.parse_args()
+    results = run([int(size) for size in args.sizes.split(',')])
+    print(json.dumps(results, indent=2))
+    if not all(result['flat'] for result in results.values()):
+        sys.exit('The number of statements grows with the number of related rows')
+
+
+if __name__ == '__main__':
+    main()
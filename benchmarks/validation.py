@@ -0,0 +1,128 @@
+"""Coste por solicitud de validar el cuerpo de las escrituras: jsonschema de flask-restx frente a pydantic.
+
+Compara, con el mismo cuerpo, la validación aislada (leer el JSON y validarlo con el jsonschema del
+modelo de flask-restx, como hace `@ns.expect(model, validate=True)`, frente a
+`schema.model_validate_json`) y el tiempo de una solicitud completa a través de una API mínima, sin
+base de datos, con cada una de las dos variantes del endpoint.
+
+Uso:
+    python -m benchmarks.validation --requests 5000
+
+Resultados de referencia (CPython 3.11, un núcleo):
+    - Producto: validación 0,084 ms frente a 0,005 ms (~18x); solicitud completa 0,55 ms frente a 0,38 ms.
+    - Checkout con 10 líneas: validación 0,42 ms frente a 0,012 ms (~34x); solicitud 0,87 ms frente a 0,43 ms.
+"""
+import argparse
+import json
+import time
+
+from flask import Flask, request
+from flask_restx import Api, Namespace, Resource, fields
+
+from app.schemas.product import ProductSchema
+from app.schemas.sale import CheckoutSchema
+from app.utils.validation import validate_body
+
+PRODUCT = {'name': 'Producto', 'image': 'producto.png', 'description': 'Descripción del producto',
+           'price': 1500, 'quantity': 20, 'shop_id': 1}
+CHECKOUT = {'date': '2024-05-01', 'status': 1,
+            'items': [{'product_id': i, 'qnt_prod_sale': 2} for i in range(1, 11)]}
+
+
+def build_app():
+    ns = Namespace('bench')
+
+    # Modelos de flask-restx equivalentes a los de entrada anteriores
+    product_model = ns.model('Products', {
+        'name': fields.String(required=True),
+        'image': fields.String(required=True),
+        'description': fields.String(required=True),
+        'price': fields.Integer(required=True),
+        'quantity': fields.Integer(required=True),
+        'shop_id': fields.Integer(required=True),
+    })
+    checkout_item_model = ns.model('CheckoutItem', {
+        'product_id': fields.Integer(required=True),
+        'qnt_prod_sale': fields.Integer(required=True, min=1),
+    })
+    checkout_model = ns.model('Checkout', {
+        'date': fields.Date(required=True),
+        'status': fields.Integer(),
+        'items': fields.List(fields.Nested(checkout_item_model), required=True, min_items=1),
+    })
+
+    @ns.route('/jsonschema/product')
+    class JsonschemaProduct(Resource):
+        @ns.expect(product_model, validate=True)
+        def post(self):
+            data = request.get_json()
+            return {'name': data['name']}
+
+    @ns.route('/pydantic/product')
+    class PydanticProduct(Resource):
+        @validate_body(ProductSchema)
+        def post(self, payload):
+            return {'name': payload.name}
+
+    @ns.route('/jsonschema/checkout')
+    class JsonschemaCheckout(Resource):
+        @ns.expect(checkout_model, validate=True)
+        def post(self):
+            data = request.get_json()
+            return {'items': len(data['items'])}
+
+    @ns.route('/pydantic/checkout')
+    class PydanticCheckout(Resource):
+        @validate_body(CheckoutSchema)
+        def post(self, payload):
+            return {'items': len(payload.items)}
+
+    app = Flask(__name__)
+    api = Api(app)
+    api.add_namespace(ns, path='/bench')
+    return app, api, {'product': product_model, 'checkout': checkout_model}
+
+
+def timed(fn, repeat):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def run(requests):
+    app, api, models = build_app()
+    client = app.test_client()
+    results = {}
+    for name, body, schema in [('product', PRODUCT, ProductSchema), ('checkout', CHECKOUT, CheckoutSchema)]:
+        data = json.dumps(body)
+        model = models[name]
+
+        # Validación aislada: lo que hace flask-restx (leer el JSON y validarlo con jsonschema) frente a pydantic
+        with app.test_request_context('/bench'):
+            old = timed(lambda: model.validate(json.loads(data), api.refresolver, api.format_checker), requests)
+            new = timed(lambda: schema.model_validate_json(data), requests)
+
+        # Solicitud completa a través de la API, con el mismo cuerpo
+        post = lambda path: client.post(path, data=data, content_type='application/json')
+        assert post(f'/bench/jsonschema/{name}').status_code == post(f'/bench/pydantic/{name}').status_code == 200
+        old_request = timed(lambda: post(f'/bench/jsonschema/{name}'), requests)
+        new_request = timed(lambda: post(f'/bench/pydantic/{name}'), requests)
+
+        results[name] = {
+            'validation_ms': {'jsonschema': round(old * 1000, 4), 'pydantic': round(new * 1000, 4), 'speedup': round(old / new, 1)},
+            'request_ms': {'jsonschema': round(old_request * 1000, 3), 'pydantic': round(new_request * 1000, 3)},
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000, help='Solicitudes por endpoint')
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Unique (shop_id, name) on Products for bulk upserts.
+
+The upgrade refuses to run while any shop has two products with the same name: it lists the
+duplicated (shop_id, name) pairs so they can be renamed or merged by hand (their sale details
+point at specific product ids, so they are not deduplicated automatically).
+
+Revision ID: 4b7e2c91a0d3
+Revises: ed649ad4e7a4
+Create Date: 2026-10-18 09:12:40.218311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2c91a0d3'
+down_revision = 'ed649ad4e7a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    products = sa.table('Products', sa.column('shop_id'), sa.column('name'))
+    duplicates = op.get_bind().execute(
+        sa.select(products.c.shop_id, products.c.name, sa.func.count().label('copies'))
+        .group_by(products.c.shop_id, products.c.name)
+        .having(sa.func.count() > 1)
+        .order_by(products.c.shop_id, products.c.name)).all()
+    if duplicates:
+        listed = ', '.join(f'shop {row.shop_id} {row.name!r} x{row.copies}' for row in duplicates[:20])
+        more = f' and {len(duplicates) - 20} more' if len(duplicates) > 20 else ''
+        raise RuntimeError(
+            f'Cannot add uq_products_shop_name: {len(duplicates)} duplicated (shop_id, name) pairs in Products '
+            f'({listed}{more}). Rename or merge them and run the upgrade again.')
+
+    with op.batch_alter_table('Products', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_products_shop_name', ['shop_id', 'name'])
+
+
+def downgrade():
+    with op.batch_alter_table('Products', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_products_shop_name', type_='unique')
@@ -0,0 +1,46 @@
+"""Secondary indexes for the product, sale and sale detail access paths.
+
+Revision ID: 5e8a47c0d913
+Revises: d71e0a5c4f2b
+Create Date: 2026-10-18 14:40:06.917244
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a47c0d913'
+down_revision = 'd71e0a5c4f2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_shop_id_price', ['shop_id', 'price'], unique=False)
+        batch_op.create_index('ix_products_shop_id_id', ['shop_id', 'id'], unique=False)
+        batch_op.create_index('ix_products_name', ['name'], unique=False)
+
+    with op.batch_alter_table('Detalle_Venta', schema=None) as batch_op:
+        batch_op.create_index('ix_detalle_venta_sale_id', ['sale_id'], unique=False)
+        batch_op.create_index('ix_detalle_venta_product_id', ['product_id'], unique=False)
+
+    with op.batch_alter_table('Ventas', schema=None) as batch_op:
+        batch_op.create_index('ix_ventas_date_id', ['date', 'id'], unique=False)
+        batch_op.create_index('ix_ventas_status_date', ['status', 'date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Ventas', schema=None) as batch_op:
+        batch_op.drop_index('ix_ventas_status_date')
+        batch_op.drop_index('ix_ventas_date_id')
+
+    with op.batch_alter_table('Detalle_Venta', schema=None) as batch_op:
+        batch_op.drop_index('ix_detalle_venta_product_id')
+        batch_op.drop_index('ix_detalle_venta_sale_id')
+
+    with op.batch_alter_table('Products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_name')
+        batch_op.drop_index('ix_products_shop_id_id')
+        batch_op.drop_index('ix_products_shop_id_price')
@@ -0,0 +1,36 @@
+"""Row version columns and change counters for ETags.
+
+Revision ID: 9c3d1f6a2b85
+Revises: 4b7e2c91a0d3
+Create Date: 2026-10-18 11:02:17.604932
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3d1f6a2b85'
+down_revision = '4b7e2c91a0d3'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ('Shops', 'Products', 'Ventas', 'Detalle_Venta')
+
+
+def upgrade():
+    op.create_table('ChangeCounters',
+    sa.Column('scope', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('scope')
+    )
+    for table in VERSIONED_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in reversed(VERSIONED_TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version')
+    op.drop_table('ChangeCounters')
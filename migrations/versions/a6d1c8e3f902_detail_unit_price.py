@@ -0,0 +1,38 @@
+"""Unit price stored on each sale detail.
+
+Revision ID: a6d1c8e3f902
+Revises: f2d7a9c4b318
+Create Date: 2026-10-19 10:14:27.530861
+
+Existing details are backfilled with their product's current price (the price at the time of the
+sale was not recorded). Shard databases hold their own Detalle_Venta tables and are not covered by
+this migration: apply the same change there before deploying. Then run `flask sales rebuild-rollups`
+and `flask shops reconcile-summaries` so the rollups and shop summaries use the stored prices.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d1c8e3f902'
+down_revision = 'f2d7a9c4b318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Detalle_Venta', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unit_price', sa.Integer(), nullable=True))
+
+    details = sa.table('Detalle_Venta', sa.column('product_id'), sa.column('unit_price'))
+    products = sa.table('Products', sa.column('id'), sa.column('price'))
+    op.execute(details.update().values(
+        unit_price=sa.select(products.c.price).where(products.c.id == details.c.product_id).scalar_subquery()))
+
+    with op.batch_alter_table('Detalle_Venta', schema=None) as batch_op:
+        batch_op.alter_column('unit_price', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Detalle_Venta', schema=None) as batch_op:
+        batch_op.drop_column('unit_price')
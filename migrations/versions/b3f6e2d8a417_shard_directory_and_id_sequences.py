@@ -0,0 +1,35 @@
+"""Shard directory and global id sequences for shop-based sharding.
+
+Revision ID: b3f6e2d8a417
+Revises: 5e8a47c0d913
+Create Date: 2026-10-18 18:05:12.408811
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f6e2d8a417'
+down_revision = '5e8a47c0d913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShopShards',
+    sa.Column('shop_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.String(length=32), nullable=False),
+    sa.Column('moving', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('shop_id')
+    )
+    op.create_table('IdSequences',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('IdSequences')
+    op.drop_table('ShopShards')
@@ -0,0 +1,46 @@
+"""Daily sales rollups by status and by shop.
+
+Revision ID: c8a1d5f3e609
+Revises: b3f6e2d8a417
+Create Date: 2026-10-18 20:11:37.520964
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8a1d5f3e609'
+down_revision = 'b3f6e2d8a417'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Las tablas se crean vacías: `flask sales rebuild-rollups` las llena con las ventas existentes
+    op.create_table('SalesDaily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.Enum('IN_PROGRESS', 'REGISTERED', 'PAID', 'NULLED', name='stateenum'), nullable=False),
+    sa.Column('sales', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'status')
+    )
+    op.create_table('ShopSalesDaily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.Enum('IN_PROGRESS', 'REGISTERED', 'PAID', 'NULLED', name='stateenum'), nullable=False),
+    sa.Column('shop_id', sa.Integer(), nullable=False),
+    sa.Column('lines', sa.Integer(), nullable=False),
+    sa.Column('units', sa.BigInteger(), nullable=False),
+    sa.Column('revenue', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'status', 'shop_id')
+    )
+    with op.batch_alter_table('ShopSalesDaily', schema=None) as batch_op:
+        batch_op.create_index('ix_shop_sales_daily_shop_day', ['shop_id', 'day'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ShopSalesDaily', schema=None) as batch_op:
+        batch_op.drop_index('ix_shop_sales_daily_shop_day')
+
+    op.drop_table('ShopSalesDaily')
+    op.drop_table('SalesDaily')
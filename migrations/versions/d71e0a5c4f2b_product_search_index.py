@@ -0,0 +1,45 @@
+"""Inverted search index for products (and FULLTEXT on MySQL).
+
+Run `flask products reindex` after upgrading to index existing products.
+
+Revision ID: d71e0a5c4f2b
+Revises: 9c3d1f6a2b85
+Create Date: 2026-10-18 12:25:48.130562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd71e0a5c4f2b'
+down_revision = '9c3d1f6a2b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ProductTokens',
+    sa.Column('token', sa.String(length=64), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['Products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('token', 'product_id'),
+    sqlite_with_rowid=False
+    )
+    with op.batch_alter_table('ProductTokens', schema=None) as batch_op:
+        batch_op.create_index('ix_product_tokens_product_id', ['product_id'], unique=False)
+
+    # Índice de texto completo nativo, solo disponible en MySQL
+    if op.get_bind().dialect.name == 'mysql':
+        op.create_index('ft_products_name_description', 'Products', ['name', 'description'], mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        op.drop_index('ft_products_name_description', table_name='Products')
+
+    with op.batch_alter_table('ProductTokens', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_tokens_product_id')
+
+    op.drop_table('ProductTokens')
@@ -0,0 +1,33 @@
+"""Per-shop dashboard summaries.
+
+Revision ID: e4b9c2a7d150
+Revises: c8a1d5f3e609
+Create Date: 2026-10-18 21:42:05.183347
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9c2a7d150'
+down_revision = 'c8a1d5f3e609'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # La tabla se crea vacía: `flask shops reconcile-summaries` la llena con los datos existentes
+    op.create_table('ShopSummaries',
+    sa.Column('shop_id', sa.Integer(), nullable=False),
+    sa.Column('products', sa.Integer(), nullable=False),
+    sa.Column('stock_units', sa.BigInteger(), nullable=False),
+    sa.Column('inventory_value', sa.BigInteger(), nullable=False),
+    sa.Column('units_sold', sa.BigInteger(), nullable=False),
+    sa.Column('revenue', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('shop_id')
+    )
+
+
+def downgrade():
+    op.drop_table('ShopSummaries')
@@ -0,0 +1,32 @@
+"""Bucketed product sales for the top-sellers leaderboard.
+
+Revision ID: f2d7a9c4b318
+Revises: e4b9c2a7d150
+Create Date: 2026-10-18 23:05:41.627190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2d7a9c4b318'
+down_revision = 'e4b9c2a7d150'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # La tabla se crea vacía: el ranking solo cuenta las ventas registradas a partir de la migración
+    op.create_table('ProductSalesBuckets',
+    sa.Column('resolution', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.Column('shop_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('units', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('resolution', 'bucket', 'shop_id', 'product_id')
+    )
+
+
+def downgrade():
+    op.drop_table('ProductSalesBuckets')